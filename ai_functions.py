@@ -1,52 +1,429 @@
+import hashlib
 import json
 import os
+import threading
 from concurrent.futures import ThreadPoolExecutor
-from typing import Any, Dict, List, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+from string import Formatter
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple, Union
 
 from dotenv import load_dotenv
 from langchain_core.prompts import PromptTemplate
 from langchain_openai import OpenAI
 from litellm import completion
 
+from batch_mode import BatchClient, current_batch_job
+from cancellation import cancellation_scope, check_cancelled, current_token
+from endpoint_capabilities import EndpointCapabilities, endpoint_missing, get_capabilities, invalidate
+from fake_llm import FakeLLM
+from http_pool import configure_litellm_sessions, get_openai_client
+from json_extraction import JSONExtractionError, parse_json_response, record_parse, repair_prompt
+from llm_cache import CachedLLM, cache_bypass, cache_bypassed, get_response_cache
+from model_profiles import get_profile
+from provider_health import FailoverLLM, routing_mode
+from rate_limiter import RateLimitedLLM
+from resource_store import get_resource_snapshot, render
+from style_retrieval import retrieval_top_k
+
 load_dotenv()
 
-# Initialize LLM lazily to avoid key requirements at import time
-llm = None
+# Shared pool for reviewer fan-out; sized for every concurrent job's reviewer panel
+_reviewer_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("REVIEWER_POOL_SIZE", "12")),
+    thread_name_prefix="reviewer",
+)
+
+
+class PrefixedPrompt(str):
+    """
+    A formatted prompt whose first prefix_len characters are identical across calls.
+
+    Behaves as a plain string everywhere; clients that support prompt caching use
+    the boundary to mark the static prefix (e.g. Anthropic cache_control blocks).
+    """
+    prefix_len: int
+
+    def __new__(cls, static: str, dynamic: str):
+        prompt = super().__new__(cls, static + dynamic)
+        prompt.prefix_len = len(static)
+        return prompt
+
+    @property
+    def static_prefix(self) -> str:
+        return str.__str__(self)[:self.prefix_len]
+
+    @property
+    def dynamic_suffix(self) -> str:
+        return str.__str__(self)[self.prefix_len:]
+
+
+@lru_cache(maxsize=64)
+def _template_segments(template: str) -> Tuple[Tuple[str, Optional[str]], ...]:
+    """Parse a template once into (literal, field) pairs; registry prompts are the same str objects every call."""
+    return tuple((literal, field_name) for literal, field_name, _spec, _conversion in Formatter().parse(template))
+
+
+@lru_cache(maxsize=64)
+def _context_segments(template: str) -> Tuple[str, Tuple[str, ...]]:
+    """Split a HookHouse prompt once into its static instructions and the text around later {context} markers."""
+    static, marker, tail = template.partition("{context}")
+    return static, tuple(tail.split("{context}")) if marker else ()
+
+
+def _format_prefixed(prompt_template: PromptTemplate, static_fields: Tuple[str, ...] = (), **values) -> PrefixedPrompt:
+    """Format a PromptTemplate, keeping everything before the first per-call field as the static prefix."""
+    static_parts: List[str] = []
+    dynamic_parts: List[str] = []
+    target = static_parts
+    for literal, field_name in _template_segments(prompt_template.template):
+        target.append(literal)
+        if field_name is None:
+            continue
+        if field_name not in static_fields:
+            target = dynamic_parts
+        target.append(str(values[field_name]))
+    return PrefixedPrompt("".join(static_parts), "".join(dynamic_parts))
+
+
+def _fill_context(prompt_template: str, context: str) -> PrefixedPrompt:
+    """Substitute {context} into a HookHouse prompt; the instructions before it form the static prefix."""
+    static, tail_parts = _context_segments(prompt_template)
+    if not tail_parts:
+        return PrefixedPrompt(static, "")
+    return PrefixedPrompt(static, context + context.join(tail_parts))
+
+
+def _supports_cache_control(model: str) -> bool:
+    """Models that accept explicit cache_control breakpoints through LiteLLM."""
+    if os.getenv("LLM_PROMPT_CACHING", "true").lower() not in ("1", "true", "yes"):
+        return False
+    return "anthropic/" in model or "claude" in model
+
+
+def _close_stream(stream: Any) -> None:
+    """Close a provider stream (and its HTTP response) if it supports it."""
+    for target in (stream, getattr(stream, "completion_stream", None), getattr(stream, "response", None)):
+        close = getattr(target, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+            return
 
 
 class LiteLLMWrapper:
     """Wrapper for LiteLLM API calls."""
-    def __init__(self, model: str, temperature: float, max_tokens: int, api_key: Optional[str] = None, base_url: Optional[str] = None):
+    def __init__(self, model: str, temperature: float, max_tokens: int, api_key: Optional[str] = None, base_url: Optional[str] = None, stop: Tuple[str, ...] = (), json_mode: bool = False):
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
         self.api_key = api_key
         self.base_url = base_url
-
-    def invoke(self, prompt: str) -> str:
+        self.stop = list(stop) or None
+        self.json_mode = json_mode
+
+    def _messages(self, prompt: str) -> List[Dict[str, Any]]:
+        if isinstance(prompt, PrefixedPrompt) and prompt.prefix_len and _supports_cache_control(self.model):
+            # Mark the static prefix as cacheable; the per-call tail stays a separate block
+            content = [{"type": "text", "text": prompt.static_prefix, "cache_control": {"type": "ephemeral"}}]
+            if prompt.dynamic_suffix:
+                content.append({"type": "text", "text": prompt.dynamic_suffix})
+            return [{"role": "user", "content": content}]
+        return [{"role": "user", "content": str(prompt)}]
+
+    def _completion_kwargs(self, prompt: str) -> Dict[str, Any]:
         kwargs = {
             "model": self.model,
-            "messages": [{"role": "user", "content": prompt}],
+            "messages": self._messages(prompt),
             "max_tokens": self.max_tokens,
             "temperature": self.temperature,
         }
+        if self.stop:
+            kwargs["stop"] = self.stop
+        if self.json_mode:
+            kwargs["response_format"] = {"type": "json_object"}
         if self.api_key and self.api_key != "your_openrouter_api_key_here":
             kwargs["api_key"] = self.api_key
         if self.base_url:
             kwargs["api_base"] = self.base_url
+        return kwargs
 
+    def invoke(self, prompt: str) -> str:
+        configure_litellm_sessions()
         try:
-            response = completion(**kwargs)
+            response = completion(**self._completion_kwargs(prompt))
             return response.choices[0].message.content
         except Exception as exc:
             raise ValueError(f"LiteLLM call failed: {exc}") from exc
 
+    def stream(self, prompt: str) -> Iterator[str]:
+        configure_litellm_sessions()
+        try:
+            response = completion(stream=True, **self._completion_kwargs(prompt))
+            try:
+                for chunk in response:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        yield delta
+            finally:
+                # Reached early when the consumer closes us (e.g. a cancelled job): drop the HTTP stream
+                _close_stream(response)
+        except Exception as exc:
+            raise ValueError(f"LiteLLM call failed: {exc}") from exc
+
+
+class OpenAICompatibleLLM:
+    """
+    Client for an OpenAI-compatible server that calls the endpoint the server was probed to support.
+
+    Capabilities (chat vs text completions, streaming, context window) are negotiated
+    once per base URL and model by endpoint_capabilities. When the server cannot be
+    probed, fallback_endpoints are tried in order on every call, as before.
+    """
+    fallback_endpoints: Tuple[str, ...] = ("chat", "completions")
+    display_name = "OpenAI-compatible server"
+
+    def __init__(self, model: str, temperature: float, max_tokens: int, api_key: str, base_url: str, stop: Tuple[str, ...] = ()):
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.api_key = api_key
+        self.base_url = base_url
+        self.stop = list(stop) or None
+
+    @property
+    def client(self):
+        return get_openai_client(self.base_url, self.api_key)
+
+    def _request(self, endpoint: str, prompt: str, capabilities: Optional[EndpointCapabilities], **extra) -> Dict[str, Any]:
+        kwargs = {
+            "model": self.model,
+            "max_tokens": capabilities.clamp_max_tokens(self.max_tokens) if capabilities else self.max_tokens,
+            "temperature": self.temperature,
+            "stop": self.stop,
+            **extra,
+        }
+        if endpoint == "chat":
+            kwargs["messages"] = [{"role": "user", "content": str(prompt)}]
+        else:
+            kwargs["prompt"] = str(prompt)
+        return kwargs
+
+    def _create(self, client, endpoint: str, **kwargs):
+        return client.chat.completions.create(**kwargs) if endpoint == "chat" else client.completions.create(**kwargs)
+
+    @staticmethod
+    def _text(endpoint: str, completion) -> str:
+        return completion.choices[0].message.content if endpoint == "chat" else completion.choices[0].text
+
+    @staticmethod
+    def _delta(endpoint: str, chunk) -> Optional[str]:
+        if not chunk.choices:
+            return None
+        return chunk.choices[0].delta.content if endpoint == "chat" else chunk.choices[0].text
+
+    def _connection_error(self, errors: List[Exception]) -> ValueError:
+        endpoints = " and ".join(self.fallback_endpoints)
+        return ValueError(
+            f"{self.display_name} connection failed. Tried {endpoints} endpoints. "
+            f"Original errors: {', '.join(str(error) for error in errors)}"
+        )
+
+    def invoke(self, prompt: str) -> str:
+        capabilities = get_capabilities(self.base_url, self.api_key, self.model)
+        if capabilities is None:
+            errors = []
+            for endpoint in self.fallback_endpoints:
+                try:
+                    return self._text(endpoint, self._create(self.client, endpoint, **self._request(endpoint, prompt, None)))
+                except Exception as exc:
+                    errors.append(exc)
+            raise self._connection_error(errors) from errors[-1]
+
+        endpoint = capabilities.endpoint
+        try:
+            return self._text(endpoint, self._create(self.client, endpoint, **self._request(endpoint, prompt, capabilities)))
+        except Exception as exc:
+            if not endpoint_missing(exc):
+                raise
+            # The server changed under us (model swapped, endpoint disabled): re-probe and retry once if that helps
+            invalidate(self.base_url, self.model)
+            fresh = get_capabilities(self.base_url, self.api_key, self.model)
+            if fresh is None or fresh.endpoint == endpoint:
+                raise
+            return self._text(fresh.endpoint, self._create(self.client, fresh.endpoint, **self._request(fresh.endpoint, prompt, fresh)))
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        capabilities = get_capabilities(self.base_url, self.api_key, self.model)
+        if capabilities is not None and not capabilities.streaming:
+            # Server cannot stream: deliver the whole completion as one chunk
+            yield self.invoke(prompt)
+            return
+        endpoints = (capabilities.endpoint,) if capabilities is not None else self.fallback_endpoints
+        errors = []
+        for endpoint in endpoints:
+            try:
+                chunks = self._create(self.client, endpoint, **self._request(endpoint, prompt, capabilities, stream=True))
+            except Exception as exc:
+                # Nothing has been yielded yet, so the next endpoint can still take over
+                errors.append(exc)
+                continue
+            try:
+                for chunk in chunks:
+                    delta = self._delta(endpoint, chunk)
+                    if delta:
+                        yield delta
+            finally:
+                _close_stream(chunks)
+            return
+        if capabilities is not None:
+            if endpoint_missing(errors[-1]):
+                invalidate(self.base_url, self.model)
+            raise errors[-1]
+        raise self._connection_error(errors) from errors[-1]
+
+
+class LMStudioLLM(OpenAICompatibleLLM):
+    """Local LM Studio client; uses chat completions when the server has them, else plain completions."""
+    display_name = "LM Studio"
+
+
+class OpenRouterLLM(OpenAICompatibleLLM):
+    """Legacy OpenRouter client; without a successful probe it keeps to the text completions endpoint."""
+    fallback_endpoints = ("completions",)
+    display_name = "OpenRouter"
 
-def get_llm(use_local: bool = False):
-    global llm
-    if llm is not None:
-        return llm
 
+# Receives streamed tokens for the current context (set per graph node by stream_tokens)
+_token_sink: ContextVar[Optional[Callable[[str], None]]] = ContextVar("token_sink", default=None)
+
+
+@contextmanager
+def stream_tokens(callback: Optional[Callable[[str], None]]):
+    """Forward tokens from long-form LLM calls made in this context to callback."""
+    token = _token_sink.set(callback)
+    try:
+        yield
+    finally:
+        _token_sink.reset(token)
+
+
+def _complete(prompt: str, use_local: bool, node: Optional[str] = None) -> str:
+    """Invoke the LLM, streaming tokens to the active sink when one is set."""
+    sink = _token_sink.get()
+    client = get_llm(use_local, node=node)
+    if sink is None:
+        return client.invoke(prompt)
+    parts = []
+    for token in client.stream(prompt):
+        parts.append(token)
+        sink(token)
+    return "".join(parts)
+
+
+def complete_json(prompt: str, use_local: bool, node: str, schema: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Invoke node and return its JSON object, validated against schema (default: node).
+
+    Tolerates fences and surrounding prose; when the response still cannot be used,
+    makes one short repair call instead of re-running the node. Raises
+    JSONExtractionError if the repair fails too.
+    """
+    schema = schema or node
+
+    # Only a response that parses is cached, so a malformed answer is not served again on retry
+    def validate(response: str):
+        parse_json_response(response, schema)
+
+    raw = get_llm(use_local, node=node, json_mode=True).invoke(prompt, validate=validate)
+    try:
+        parsed, exact = parse_json_response(raw, schema)
+        record_parse(schema, "exact" if exact else "extracted")
+        return parsed
+    except JSONExtractionError as exc:
+        error = exc
+
+    try:
+        repaired = get_llm(use_local, node="json_repair", json_mode=True).invoke(
+            repair_prompt(raw, schema, error), validate=validate
+        )
+        parsed, _ = parse_json_response(repaired, schema)
+    except Exception as exc:
+        record_parse(schema, "failed")
+        raise JSONExtractionError(f"{schema} response unusable after repair: {exc}") from exc
+    record_parse(schema, "repaired")
+    return parsed
+
+
+@dataclass(frozen=True)
+class ProviderSnapshot:
+    """Immutable description of which LLM client a job talks to."""
+    provider: str
+    model: str
+    base_url: Optional[str]
+    use_local: bool
+    temperature: float
+    max_tokens: int
+    api_key: Optional[str] = field(default=None, repr=False)
+    stop: Tuple[str, ...] = ()
+    json_mode: bool = False
+
+    @property
+    def registry_key(self) -> Tuple:
+        key_fingerprint = hashlib.sha256(self.api_key.encode("utf-8")).hexdigest()[:12] if self.api_key else None
+        return (
+            self.provider, self.model, self.base_url, self.use_local, self.temperature, self.max_tokens, key_fingerprint, self.stop,
+            self.json_mode,
+        )
+
+
+def _qualify_model(provider: str, model: str) -> str:
+    """Apply the provider's LiteLLM prefix to a bare model name (mirrors resolve_provider)."""
+    if provider in ("anthropic", "openai") and not model.startswith(f"{provider}/"):
+        return f"{provider}/{model}"
+    if provider == "google" and not model.startswith("gemini/"):
+        return f"gemini/{model}"
+    return model
+
+
+def apply_profile(snapshot: ProviderSnapshot, node: Optional[str], override_model: bool = True) -> ProviderSnapshot:
+    """
+    Overlay a node's model profile (see model_profiles) on a provider snapshot.
+
+    override_model=False keeps the snapshot's remote model; failover providers use it
+    because a profile's model names the primary provider's model.
+    """
+    profile = get_profile(node)
+    if snapshot.use_local:
+        model = profile.local_model
+    else:
+        model = profile.model if override_model else None
+    return replace(
+        snapshot,
+        model=_qualify_model(snapshot.provider, model) if model else snapshot.model,
+        max_tokens=profile.max_tokens if profile.max_tokens is not None else snapshot.max_tokens,
+        temperature=profile.temperature if profile.temperature is not None else snapshot.temperature,
+        stop=profile.stop or snapshot.stop,
+    )
+
+
+def _supports_json_mode(snapshot: ProviderSnapshot) -> bool:
+    """Providers that accept response_format={"type": "json_object"} through LiteLLM."""
+    if os.getenv("LLM_JSON_MODE", "true").lower() not in ("1", "true", "yes"):
+        return False
+    return snapshot.provider in ("openai", "google")
+
+
+def resolve_provider(use_local: bool = False, provider: Optional[str] = None) -> ProviderSnapshot:
+    """
+    Resolve the current environment into a provider snapshot (no client is built).
+
+    provider overrides LLM_PROVIDER (used to resolve the entries of LLM_PROVIDER_CHAIN).
+    """
     temperature = float(os.getenv("LLM_TEMPERATURE", "0.1"))
     max_tokens = int(os.getenv("LLM_MAX_TOKENS", "4096"))
 
@@ -59,52 +436,16 @@ def get_llm(use_local: bool = False):
         if not lmstudio_api_key or lmstudio_api_key == "your_openrouter_api_key_here":
             lmstudio_api_key = "lm-studio"
 
-        import openai
-
-        class LMStudioLLM:
-            def __init__(self, model: str, temperature: float, max_tokens: int, api_key: str, base_url: str):
-                self.model = model
-                self.temperature = temperature
-                self.max_tokens = max_tokens
-                self.client = openai.OpenAI(api_key=api_key, base_url=base_url)
-
-            def invoke(self, prompt: str) -> str:
-                try:
-                    completion = self.client.chat.completions.create(
-                        model=self.model,
-                        messages=[{"role": "user", "content": prompt}],
-                        max_tokens=self.max_tokens,
-                        temperature=self.temperature,
-                    )
-                    return completion.choices[0].message.content
-                except Exception as chat_exc:
-                    try:
-                        completion = self.client.completions.create(
-                            model=self.model,
-                            prompt=prompt,
-                            max_tokens=self.max_tokens,
-                            temperature=self.temperature,
-                        )
-                        return completion.choices[0].text
-                    except Exception as completion_exc:
-                        raise ValueError(
-                            "LM Studio connection failed. Tried both chat and completions endpoints. "
-                            f"Original errors: {chat_exc}, {completion_exc}"
-                        ) from completion_exc
-
-        llm = LMStudioLLM(
-            model=lmstudio_model,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            api_key=lmstudio_api_key,
-            base_url=lmstudio_base_url,
-        )
-        return llm
+        return ProviderSnapshot("lmstudio", lmstudio_model, lmstudio_base_url, True, temperature, max_tokens, lmstudio_api_key)
 
     # Get provider preference
-    provider = os.getenv("LLM_PROVIDER", "").lower()
+    provider = (provider or os.getenv("LLM_PROVIDER", "")).lower()
 
-    # Provider-specific configurations
+    # Deterministic offline provider for load tests (see fake_llm.py)
+    if provider == "fake":
+        return ProviderSnapshot("fake", os.getenv("FAKE_LLM_MODEL", "fake-songwriter"), None, False, temperature, max_tokens)
+
+    # Provider-specific configurations (all served through LiteLLM)
     if provider == "anthropic":
         api_key = os.getenv("ANTHROPIC_API_KEY")
         model = os.getenv("ANTHROPIC_MODEL", "claude-3-5-sonnet-20241022")
@@ -112,15 +453,8 @@ def get_llm(use_local: bool = False):
         if not api_key:
             raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
 
-        # Use LiteLLM for Anthropic
-        llm = LiteLLMWrapper(
-            model=f"anthropic/{model}" if not model.startswith("anthropic/") else model,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            api_key=api_key,
-            base_url=None,
-        )
-        return llm
+        model = f"anthropic/{model}" if not model.startswith("anthropic/") else model
+        return ProviderSnapshot("anthropic", model, None, False, temperature, max_tokens, api_key)
 
     elif provider == "openai":
         api_key = os.getenv("OPENAI_API_KEY")
@@ -129,15 +463,8 @@ def get_llm(use_local: bool = False):
         if not api_key:
             raise ValueError("OPENAI_API_KEY not found in environment variables")
 
-        # Use LiteLLM for OpenAI
-        llm = LiteLLMWrapper(
-            model=f"openai/{model}" if not model.startswith("openai/") else model,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            api_key=api_key,
-            base_url=None,
-        )
-        return llm
+        model = f"openai/{model}" if not model.startswith("openai/") else model
+        return ProviderSnapshot("openai", model, None, False, temperature, max_tokens, api_key)
 
     elif provider == "google" or provider == "gemini":
         api_key = os.getenv("GOOGLE_API_KEY")
@@ -146,30 +473,15 @@ def get_llm(use_local: bool = False):
         if not api_key:
             raise ValueError("GOOGLE_API_KEY not found in environment variables")
 
-        # Use LiteLLM for Google/Gemini
-        llm = LiteLLMWrapper(
-            model=model if model.startswith("gemini/") else f"gemini/{model}",
-            temperature=temperature,
-            max_tokens=max_tokens,
-            api_key=api_key,
-            base_url=None,
-        )
-        return llm
+        model = model if model.startswith("gemini/") else f"gemini/{model}"
+        return ProviderSnapshot("google", model, None, False, temperature, max_tokens, api_key)
 
     # Legacy LiteLLM configuration (for backward compatibility)
     litellm_model = os.getenv("LITELLM_MODEL")
-    litellm_api_key = os.getenv("LITELLM_API_KEY")
-    litellm_base_url = os.getenv("LITELLM_API_BASE")
-
     if litellm_model:
-        llm = LiteLLMWrapper(
-            model=litellm_model,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            api_key=litellm_api_key,
-            base_url=litellm_base_url,
+        return ProviderSnapshot(
+            "litellm", litellm_model, os.getenv("LITELLM_API_BASE"), False, temperature, max_tokens, os.getenv("LITELLM_API_KEY")
         )
-        return llm
 
     # Legacy OpenRouter configuration
     model = os.getenv("LLM_MODEL", "openai/gpt-3.5-turbo")
@@ -177,32 +489,7 @@ def get_llm(use_local: bool = False):
     openrouter_base_url = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
 
     if openrouter_api_key and openrouter_api_key != "your_openrouter_api_key_here":
-        import openai
-
-        class OpenRouterLLM:
-            def __init__(self, model: str, temperature: float, max_tokens: int, api_key: str, base_url: str):
-                self.model = model
-                self.temperature = temperature
-                self.max_tokens = max_tokens
-                self.client = openai.OpenAI(api_key=api_key, base_url=base_url)
-
-            def invoke(self, prompt: str) -> str:
-                completion = self.client.completions.create(
-                    model=self.model,
-                    prompt=prompt,
-                    max_tokens=self.max_tokens,
-                    temperature=self.temperature,
-                )
-                return completion.choices[0].text
-
-        llm = OpenRouterLLM(
-            model=model,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            api_key=openrouter_api_key,
-            base_url=openrouter_base_url,
-        )
-        return llm
+        return ProviderSnapshot("openrouter", model, openrouter_base_url, False, temperature, max_tokens, openrouter_api_key)
 
     # Final fallback to OpenAI
     openai_api_key = os.getenv("OPENAI_API_KEY")
@@ -211,18 +498,172 @@ def get_llm(use_local: bool = False):
             "No LLM provider configured. Please set one of: "
             "LLM_PROVIDER + provider API key, LITELLM_MODEL, OPENROUTER_API_KEY, or OPENAI_API_KEY"
         )
+    return ProviderSnapshot("openai-langchain", model, None, False, temperature, max_tokens, openai_api_key)
+
+
+# Chain entries already reported as unconfigured (warned once per process)
+_skipped_chain_entries: set = set()
 
-    llm = OpenAI(
-        temperature=temperature,
-        model=model,
-        max_tokens=max_tokens,
-        openai_api_key=openai_api_key,
+
+def provider_chain(primary: ProviderSnapshot) -> List[ProviderSnapshot]:
+    """
+    primary followed by the other configured providers of LLM_PROVIDER_CHAIN, in order.
+
+    Entries are provider names as in LLM_PROVIDER, plus lmstudio for the local server;
+    entries without credentials are skipped.
+    """
+    chain = [primary]
+    for name in (entry.strip().lower() for entry in os.getenv("LLM_PROVIDER_CHAIN", "").split(",")):
+        if not name:
+            continue
+        try:
+            snapshot = resolve_provider(use_local=True) if name in ("lmstudio", "local") else resolve_provider(provider=name)
+        except ValueError as exc:
+            if name not in _skipped_chain_entries:
+                _skipped_chain_entries.add(name)
+                print(f"Skipping provider chain entry '{name}': {exc}")
+            continue
+        if all(entry.provider != snapshot.provider for entry in chain):
+            chain.append(snapshot)
+    return chain
+
+
+def resolve_provider_chain(use_local: bool = False) -> Tuple[ProviderSnapshot, ...]:
+    """The provider for use_local followed by its LLM_PROVIDER_CHAIN failover entries, resolved once for a job."""
+    primary = resolve_provider(use_local)
+    return tuple(provider_chain(primary)) if os.getenv("LLM_PROVIDER_CHAIN") else (primary,)
+
+
+def chain_retries() -> int:
+    """Rate-limiter retries for a failover chain member; the next provider is the retry."""
+    return int(os.getenv("LLM_CHAIN_RETRIES", "0"))
+
+
+def build_llm(snapshot: ProviderSnapshot, max_retries: Optional[int] = None) -> CachedLLM:
+    """Build a client for a snapshot, wrapped with the shared rate limiter and response cache."""
+    common = dict(model=snapshot.model, temperature=snapshot.temperature, max_tokens=snapshot.max_tokens)
+    if snapshot.provider == "lmstudio":
+        client = LMStudioLLM(api_key=snapshot.api_key, base_url=snapshot.base_url, stop=snapshot.stop, **common)
+    elif snapshot.provider == "openrouter":
+        client = OpenRouterLLM(api_key=snapshot.api_key, base_url=snapshot.base_url, stop=snapshot.stop, **common)
+    elif snapshot.provider == "fake":
+        client = FakeLLM(**common)
+    elif snapshot.provider == "openai-langchain":
+        client = OpenAI(openai_api_key=snapshot.api_key, stop=list(snapshot.stop) or None, **common)
+    else:
+        client = LiteLLMWrapper(
+            api_key=snapshot.api_key, base_url=snapshot.base_url, stop=snapshot.stop, json_mode=snapshot.json_mode, **common
+        )
+
+    limited = RateLimitedLLM(client, snapshot.provider, snapshot.model, max_retries=max_retries)
+    return CachedLLM(
+        limited, snapshot.provider, snapshot.model, snapshot.temperature, snapshot.max_tokens, get_response_cache(),
+        stop=snapshot.stop, json_mode=snapshot.json_mode,
     )
-    return llm
+
+
+# Warm clients keyed by ProviderSnapshot.registry_key, shared by every job
+_clients: Dict[Tuple, CachedLLM] = {}
+_clients_lock = threading.Lock()
+
+# Failover routers keyed by routing mode and the registry keys of their chain
+_chains: Dict[Tuple, FailoverLLM] = {}
+
+# Provider chain pinned for the current job (set by pin_provider): the primary snapshot, then its failover entries
+_pinned_provider: ContextVar[Optional[Tuple[ProviderSnapshot, ...]]] = ContextVar("pinned_provider", default=None)
+
+
+@contextmanager
+def pin_provider(chain: Tuple[ProviderSnapshot, ...]):
+    """Route every get_llm() call in this context to chain (see resolve_provider_chain), regardless of later config changes."""
+    token = _pinned_provider.set(tuple(chain))
+    try:
+        yield chain
+    finally:
+        _pinned_provider.reset(token)
+
+
+def get_llm(
+    use_local: bool = False, snapshot: Optional[ProviderSnapshot] = None, node: Optional[str] = None, json_mode: bool = False
+) -> CachedLLM:
+    """
+    Return a warm client from the registry.
+
+    Resolution order: explicit snapshot, the provider chain pinned by the running
+    job, then the current environment for use_local. When node is given, that
+    node's model profile (model, max_tokens, temperature, stop) is applied on top.
+    json_mode asks for provider JSON output where the provider supports it.
+
+    Unless a snapshot is passed explicitly, a configured LLM_PROVIDER_CHAIN wraps
+    the clients in a FailoverLLM (see provider_health) led by the resolved provider.
+    """
+    if snapshot is not None:
+        chain = [snapshot]
+    else:
+        pinned = _pinned_provider.get()
+        chain = list(pinned if pinned is not None and pinned[0].use_local == use_local else resolve_provider_chain(use_local))
+    primary = chain[0]
+    chain = [
+        apply_profile(entry, node, override_model=entry.provider == primary.provider) if node is not None else entry
+        for entry in chain
+    ]
+    if json_mode:
+        chain = [replace(entry, json_mode=True) if _supports_json_mode(entry) else entry for entry in chain]
+    snapshot = chain[0]
+
+    batch = current_batch_job()
+    if batch is not None:
+        # Batch mode: calls are parked with the coordinator and submitted as provider batches
+        coordinator, job_id = batch
+        return CachedLLM(
+            BatchClient(coordinator, job_id, snapshot),
+            snapshot.provider, snapshot.model, snapshot.temperature, snapshot.max_tokens, get_response_cache(),
+            stop=snapshot.stop, json_mode=snapshot.json_mode,
+        )
+
+    if len(chain) > 1:
+        routing, retries = routing_mode(), chain_retries()
+        chain_key = (routing, retries, *(entry.registry_key for entry in chain))
+        with _clients_lock:
+            router = _chains.get(chain_key)
+        if router is None:
+            clients = [(f"{entry.provider}:{entry.model}", _registered_client(entry, retries)) for entry in chain]
+            with _clients_lock:
+                router = _chains.setdefault(chain_key, FailoverLLM(clients, routing))
+        return router
+    return _registered_client(snapshot)
+
+
+def _registered_client(snapshot: ProviderSnapshot, max_retries: Optional[int] = None) -> CachedLLM:
+    # Chain members get their own client (same limiter, smaller retry budget)
+    key = snapshot.registry_key if max_retries is None else (*snapshot.registry_key, f"retries={max_retries}")
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = build_llm(snapshot, max_retries)
+            _clients[key] = client
+        return client
+
+
+def registered_clients() -> List[Dict[str, Any]]:
+    """Describe the warm clients currently held by the registry."""
+    with _clients_lock:
+        return [
+            {"provider": key[0], "model": key[1], "base_url": key[2], "use_local": key[3], "max_tokens": key[5], "json_mode": key[8]}
+            for key in _clients
+        ]
 
 
 def build_prompts():
-    """Build and return all prompt templates for song generation."""
+    """
+    Build and return all prompt templates for song generation.
+
+    Reads prompts/ from disk; jobs should use prompt_registry.get_prompts(), which
+    calls this once and again only when a prompt file changes.
+    """
     from helpers import read_prompt
 
     song_drafter_template = read_prompt("song_drafter")
@@ -385,50 +826,65 @@ Lyrics:
     )
 
 
-def draft_song(prompt_template: PromptTemplate, enhanced_input: str, styles: Dict[str, str], tags: Dict[str, str], persona_styles: str, default_params: Dict[str, Optional[str]], use_local: bool) -> str:
-    formatted_prompt = prompt_template.format(
+def _rendered(resource: Union[str, Mapping[str, str]]) -> str:
+    """Styles/tags as prompt text; SongResources.styles_text/tags_text are already rendered."""
+    return resource if isinstance(resource, str) else render(resource)
+
+
+def _style_fields() -> Tuple[str, ...]:
+    """Styles/tags belong in the cacheable prefix only when every job gets the full catalog (retrieval off)."""
+    return ("styles", "tags") if retrieval_top_k() <= 0 else ()
+
+
+def draft_song(prompt_template: PromptTemplate, enhanced_input: str, styles: Union[str, Mapping[str, str]], tags: Union[str, Mapping[str, str]], persona_styles: str, default_params: Dict[str, Optional[str]], use_local: bool) -> str:
+    # With style retrieval on, styles and tags are narrowed per request and go in the dynamic tail
+    formatted_prompt = _format_prefixed(
+        prompt_template,
+        static_fields=_style_fields(),
         user_input=enhanced_input,
-        styles=str(styles),
-        tags=str(tags),
+        styles=_rendered(styles),
+        tags=_rendered(tags),
         persona_styles=persona_styles,
         default_params=str(default_params),
     )
-    return get_llm(use_local).invoke(formatted_prompt)
+    return _complete(formatted_prompt, use_local, node="draft")
 
 
 def revise_lyrics(prompt_template: PromptTemplate, lyrics: str, feedback: str, use_local: bool) -> str:
-    formatted_prompt = prompt_template.format(lyrics=lyrics, feedback=feedback)
-    return get_llm(use_local).invoke(formatted_prompt)
+    formatted_prompt = _format_prefixed(prompt_template, lyrics=lyrics, feedback=feedback)
+    return _complete(formatted_prompt, use_local, node="revise")
+
+
+def _merge_reviews(feedbacks: List[str]) -> str:
+    return "\n\n".join([f"Reviewer {idx + 1} Feedback:\n{fb}" for idx, fb in enumerate(feedbacks)])
 
 
 def run_parallel_reviews(prompt_template: PromptTemplate, lyrics: str, use_local: bool, reviewer_count: int = 3) -> str:
     """Run multiple AI reviewers in parallel and merge their feedback."""
-    def _call(_):
-        formatted_prompt = prompt_template.format(lyrics=lyrics)
-        return get_llm(use_local).invoke(formatted_prompt)
-
-    with ThreadPoolExecutor(max_workers=reviewer_count) as executor:
-        feedbacks = list(executor.map(_call, range(reviewer_count)))
-    merged = "\n\n".join([f"Reviewer {idx + 1} Feedback:\n{fb}" for idx, fb in enumerate(feedbacks)])
-    return merged
+    formatted_prompt = _format_prefixed(prompt_template, lyrics=lyrics)
+    # Resolve in the calling thread so the job's pinned provider, cancellation token and cache bypass apply to the worker threads too
+    client = get_llm(use_local, node="review")
+    cancel_token = current_token()
+    bypass = cache_bypassed()
+
+    def _call(idx):
+        with cancellation_scope(cancel_token), cache_bypass(bypass):
+            check_cancelled()
+            # Each reviewer slot gets its own cache entry so the panel doesn't collapse to one opinion
+            return client.invoke(formatted_prompt, cache_variant=f"reviewer-{idx}")
+
+    if current_batch_job() is not None:
+        # Batched reviewers block until the whole batch returns; don't let hundreds of jobs starve the shared pool
+        with ThreadPoolExecutor(max_workers=reviewer_count) as executor:
+            return _merge_reviews(list(executor.map(_call, range(reviewer_count))))
+    feedbacks = list(_reviewer_executor.map(_call, range(reviewer_count)))
+    return _merge_reviews(feedbacks)
 
 
 def score_lyrics(prompt_template: PromptTemplate, lyrics: str, use_local: bool) -> float:
-    formatted_prompt = prompt_template.format(lyrics=lyrics)
+    formatted_prompt = _format_prefixed(prompt_template, lyrics=lyrics)
     try:
-        raw = get_llm(use_local).invoke(formatted_prompt)
-
-        # Try to extract JSON from markdown code blocks if present
-        import re
-        json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', raw, re.DOTALL)
-        if json_match:
-            raw = json_match.group(1)
-
-        # Remove any leading/trailing whitespace
-        raw = raw.strip()
-
-        # Parse JSON
-        parsed = json.loads(raw)
+        parsed = complete_json(formatted_prompt, use_local, node="score")
         score = float(parsed.get("score", 0))
 
         # Print score for debugging
@@ -436,7 +892,7 @@ def score_lyrics(prompt_template: PromptTemplate, lyrics: str, use_local: bool)
 
         return score
     except Exception as e:
-        print(f"Failed to parse score from response: {raw[:200] if 'raw' in locals() else 'No response'}... Error: {e}")
+        print(f"Failed to parse score from response. Error: {e}")
         return 0.0
 
 
@@ -450,15 +906,31 @@ def review_song(prompt_template: PromptTemplate, revision_prompt: PromptTemplate
     return lyrics
 
 
+def critic_feedback(prompt_template: PromptTemplate, lyrics: str, use_local: bool) -> str:
+    formatted_prompt = _format_prefixed(prompt_template, lyrics=lyrics)
+    return get_llm(use_local, node="critic").invoke(formatted_prompt)
+
+
 def critique_song(prompt_template: PromptTemplate, revision_prompt: PromptTemplate, lyrics: str, use_local: bool) -> str:
-    formatted_prompt = prompt_template.format(lyrics=lyrics)
-    feedback = get_llm(use_local).invoke(formatted_prompt)
+    feedback = critic_feedback(prompt_template, lyrics, use_local)
     return revise_lyrics(revision_prompt, lyrics, feedback, use_local)
 
 
-def preflight_song(prompt_template: PromptTemplate, lyrics: str, styles: Dict[str, str], tags: Dict[str, str], use_local: bool) -> None:
-    formatted_prompt = prompt_template.format(lyrics=lyrics, styles=str(styles), tags=str(tags))
-    return get_llm(use_local).invoke(formatted_prompt)
+def merge_critiques(review_feedback: str, critic_notes: str, preflight_findings: str) -> str:
+    """Combine reviewer panel, critic and preflight feedback on the same lyrics into one revision brief."""
+    sections = [
+        ("Reviewer Panel", review_feedback),
+        ("Critic", critic_notes),
+        ("Preflight Findings (fix any Suno formatting or tag problems)", preflight_findings),
+    ]
+    return "\n\n".join(f"=== {name} ===\n{text.strip()}" for name, text in sections if text and text.strip())
+
+
+def preflight_song(prompt_template: PromptTemplate, lyrics: str, styles: Union[str, Mapping[str, str]], tags: Union[str, Mapping[str, str]], use_local: bool) -> None:
+    formatted_prompt = _format_prefixed(
+        prompt_template, static_fields=_style_fields(), lyrics=lyrics, styles=_rendered(styles), tags=_rendered(tags)
+    )
+    return get_llm(use_local, node="preflight").invoke(formatted_prompt)
 
 
 def triage_preflight(prompt_template: PromptTemplate, preflight_output: str, use_local: bool):
@@ -466,10 +938,9 @@ def triage_preflight(prompt_template: PromptTemplate, preflight_output: str, use
     fallback = {"pass": False, "issues": ["Preflight feedback could not be parsed. Review manually."]}
     if not preflight_output:
         return fallback
-    formatted = prompt_template.format(preflight_output=preflight_output)
+    formatted = _format_prefixed(prompt_template, preflight_output=preflight_output)
     try:
-        raw = get_llm(use_local).invoke(formatted)
-        parsed = json.loads(raw)
+        parsed = complete_json(formatted, use_local, node="triage")
         passed = bool(parsed.get("pass", False))
         issues = parsed.get("issues", [])
         if isinstance(issues, str):
@@ -491,15 +962,15 @@ def generate_metadata_summary(prompt_template: PromptTemplate, lyrics: str, user
         "target_audience": "Suggested demographic",
         "commercial_potential": "Assessment",
     }
-    formatted_prompt = prompt_template.format(
+    formatted_prompt = _format_prefixed(
+        prompt_template,
         lyrics=lyrics,
         user_input=user_input,
         default_params=str(default_params),
         persona_styles=persona_styles or "None provided",
     )
     try:
-        raw = get_llm(use_local).invoke(formatted_prompt)
-        parsed = json.loads(raw)
+        parsed = complete_json(formatted_prompt, use_local, node="metadata")
         description = parsed.get("description") or fallback["description"]
         styles = parsed.get("suno_styles") or fallback["suno_styles"]
         exclude_styles = parsed.get("suno_exclude_styles") or fallback["suno_exclude_styles"]
@@ -583,15 +1054,12 @@ def develop_narrative(
     context = "\n".join(context_parts)
 
     # Format prompt
-    formatted = prompt_template.replace("{context}", context)
+    formatted = _fill_context(prompt_template, context)
 
     # Invoke LLM
     try:
-        raw = get_llm(use_local).invoke(formatted)
-        # Try to parse JSON response
-        parsed = json.loads(raw)
-        return parsed
-    except json.JSONDecodeError:
+        return complete_json(formatted, use_local, node="narrative")
+    except JSONExtractionError:
         # If not JSON, return structured fallback
         return {
             "concepts": [],
@@ -641,10 +1109,10 @@ def draft_hookhouse_lyrics(
     context = "\n".join(context_parts)
 
     # Format prompt
-    formatted = prompt_template.replace("{context}", context)
+    formatted = _fill_context(prompt_template, context)
 
     # Invoke LLM
-    lyrics = get_llm(use_local).invoke(formatted)
+    lyrics = _complete(formatted, use_local, node="draft")
     return lyrics
 
 
@@ -663,25 +1131,22 @@ def review_hookhouse_lyrics(
     context = f"Lyrics:\n{lyrics}\n\nBPM: {bpm or 'Not specified'}\nBlend: {', '.join(blend)}"
 
     # Format prompt
-    formatted = prompt_template.replace("{context}", context)
+    formatted = _fill_context(prompt_template, context)
 
     # Invoke LLM
     try:
-        raw = get_llm(use_local).invoke(formatted)
-        # Try to parse JSON
-        parsed = json.loads(raw)
-        return parsed
-    except json.JSONDecodeError:
-        # Fallback with passing score
+        return complete_json(formatted, use_local, node="review", schema="hookhouse_review")
+    except JSONExtractionError:
+        # An unreadable review is not a pass; the workflow revises (or stops at max rounds)
         return {
-            "overall_score": 8.0,
+            "overall_score": 0.0,
             "category_scores": {},
             "critical_issues": [],
             "moderate_issues": [],
             "positive_notes": [],
             "revision_priority": [],
-            "pass_threshold": True,
-            "threshold_note": "Score parsing failed, defaulting to pass"
+            "pass_threshold": False,
+            "threshold_note": "Review could not be parsed; treating the round as not passed"
         }
 
 
@@ -706,10 +1171,10 @@ def funksmith_critique_lyrics(
     context = f"Lyrics:\n{lyrics}\n\nBlend: {', '.join(blend)}\nBPM: {bpm or 'Not specified'}"
 
     # Format prompt
-    formatted = prompt_template.replace("{context}", context)
+    formatted = _fill_context(prompt_template, context)
 
     # Invoke LLM (returns revised lyrics + changelog)
-    result = get_llm(use_local).invoke(formatted)
+    result = _complete(formatted, use_local, node="funksmith")
 
     # Extract just the lyrics part (before changelog)
     if "### Funksmith Changelog" in result:
@@ -738,8 +1203,6 @@ def generate_hookhouse_metadata(
     - Block 4: Title/Artist (invented artist name)
     - Block 5: Summary (≤500 chars, emotional/physiological arc)
     """
-    from helpers import read_excluded_styles
-
     # Build context
     context_parts = [
         f"Lyrics:\n{lyrics}",
@@ -761,17 +1224,16 @@ def generate_hookhouse_metadata(
         context_parts.append(f"\nNarrative Context:\n{json.dumps(best_bet, indent=2)}")
 
     # Add excluded styles reference
-    all_excluded = read_excluded_styles()
-    context_parts.append(f"\nAvailable Excluded Styles (sample):\n{', '.join(all_excluded[:50])}")
+    context_parts.append(f"\nAvailable Excluded Styles (sample):\n{get_resource_snapshot().excluded_styles_sample}")
 
     context = "\n".join(context_parts)
 
     # Format prompt
-    formatted = prompt_template.replace("{context}", context)
+    formatted = _fill_context(prompt_template, context)
 
     # Invoke LLM
     try:
-        raw = get_llm(use_local).invoke(formatted)
+        raw = get_llm(use_local, node="metadata").invoke(formatted)
 
         # Debug: Print raw response (safe for Unicode)
         import sys
@@ -922,15 +1384,12 @@ def generate_hookhouse_image_prompt(
     context = "\n".join(context_parts)
 
     # Format prompt
-    formatted = prompt_template.replace("{context}", context)
+    formatted = _fill_context(prompt_template, context)
 
     # Invoke LLM
     try:
-        raw = get_llm(use_local).invoke(formatted)
-        # Try to parse JSON
-        parsed = json.loads(raw)
-        return parsed
-    except json.JSONDecodeError:
+        return complete_json(formatted, use_local, node="image_prompt")
+    except JSONExtractionError:
         # Fallback JSON structure
         return {
             "objects": ["guitar", "road", "sunset"],
@@ -983,11 +1442,11 @@ Narrative Setting: {narrative.get('best_bet', {}).get('setting', 'Not specified'
 """
 
     # Format prompt
-    formatted = prompt_template.replace("{context}", context)
+    formatted = _fill_context(prompt_template, context)
 
     # Invoke LLM
     try:
-        raw = get_llm(use_local).invoke(formatted)
+        raw = get_llm(use_local, node="captions").invoke(formatted)
 
         # Parse captions from response
         captions = []
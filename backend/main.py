@@ -7,18 +7,41 @@ import os
 from backend.routers import generation, songs, config, websocket, personas
 from backend.services.job_manager import JobManager
 from backend.services.song_generator import SongGenerator
+from ai_functions import get_llm
+from http_pool import close_pools
+from prompt_registry import get_prompts
+from song_master import get_workflow
+from style_retrieval import get_style_index
 
 
 # Lifespan context manager for startup/shutdown
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: Initialize services
-    app.state.job_manager = JobManager()
-    app.state.song_generator = SongGenerator(max_workers=int(os.getenv("MAX_CONCURRENT_JOBS", "3")))
+    # The scheduler admits exactly as many jobs as the generator has worker threads
+    max_jobs = int(os.getenv("MAX_CONCURRENT_JOBS", "3"))
+    app.state.job_manager = JobManager(max_concurrent_jobs=max_jobs)
+    app.state.song_generator = SongGenerator(max_workers=max_jobs)
+    # Warm the default remote client so the first job skips client construction
+    try:
+        get_llm(use_local=False)
+    except ValueError:
+        pass  # No provider configured yet; it can be set through /api/config
+    # Build the style/tag retrieval index, compile the prompts and both workflow graphs up front rather than on the first job
+    get_style_index()
+    get_prompts()
+    get_workflow(use_hookhouse=True)
+    get_workflow(use_hookhouse=False)
+    # Re-queue jobs that were queued or running when the backend last stopped
+    restored = await app.state.job_manager.restore(app.state.song_generator, generation.make_progress_callback)
+    if restored:
+        print(f"Re-queued {restored} unfinished generation job(s)")
     yield
     # Shutdown: Cancel all running jobs
     await app.state.job_manager.cleanup()
     app.state.song_generator.shutdown()
+    # Release pooled provider connections
+    close_pools()
 
 
 app = FastAPI(
@@ -1,5 +1,10 @@
+import os
+
+from dotenv import load_dotenv
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Literal, Optional
+
+load_dotenv()
 
 
 class GenerateSongRequest(BaseModel):
@@ -24,8 +29,31 @@ class GenerateSongRequest(BaseModel):
     groove_texture: Optional[str] = Field(None, description="Groove/texture description")
     choir_call_response: bool = Field(False, description="Include choir/call-response elements")
 
+    # Scheduling
+    priority: Literal["interactive", "batch"] = Field(
+        "interactive", description="Queue lane: interactive jobs start before batch jobs"
+    )
+
+
+class GenerateBatchRequest(BaseModel):
+    songs: List[GenerateSongRequest] = Field(
+        ...,
+        min_length=1,
+        max_length=int(os.getenv("BATCH_MAX_JOBS", "500")),
+        description="Song requests to generate through the provider batch API",
+    )
+
 
 class UpdateProviderRequest(BaseModel):
     provider: str = Field(..., description="Provider: anthropic, openai, google")
     api_key: Optional[str] = Field(None, description="API key (optional, if changing)")
     model: Optional[str] = Field(None, description="Model name (optional)")
+
+
+class UpdateModelProfileRequest(BaseModel):
+    node: str = Field(..., description="Profile node: draft, review, critic, revise, preflight, score, triage, narrative, funksmith, metadata, image_prompt, captions")
+    model: Optional[str] = Field(None, description="Remote model override; empty string clears it")
+    local_model: Optional[str] = Field(None, description="Local (LM Studio) model override; empty string clears it")
+    max_tokens: Optional[int] = Field(None, ge=0, description="Max output tokens; 0 clears the override")
+    temperature: Optional[float] = Field(None, ge=0, le=2, description="Sampling temperature")
+    stop: Optional[List[str]] = Field(None, description="Stop sequences; empty list clears them")
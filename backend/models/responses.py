@@ -7,6 +7,9 @@ class JobResponse(BaseModel):
     job_id: str
     status: str  # "queued", "running", "completed", "failed", "cancelled"
     websocket_url: str
+    queue_position: Optional[int] = None  # 1-based, while the job waits for a slot
+    eta_seconds: Optional[float] = None  # estimated seconds until the job starts
+    coalesced: bool = False  # an identical request was already in flight; this is its job
 
 
 class ProgressUpdate(BaseModel):
@@ -17,6 +20,8 @@ class ProgressUpdate(BaseModel):
     message: str  # Human-readable message
     percentage: float  # 0-100
     timestamp: datetime
+    queue_position: Optional[int] = None  # set on "queued" updates
+    eta_seconds: Optional[float] = None
 
 
 class SongMetadata(BaseModel):
@@ -41,3 +46,5 @@ class ProviderConfigResponse(BaseModel):
     current_model: str
     available_models: Dict[str, List[str]]  # {provider: [models]}
     api_keys_configured: Dict[str, bool]  # {provider: has_key}
+    provider_chain: List[str] = []  # LLM_PROVIDER_CHAIN failover order
+    provider_health: List[Dict[str, Any]] = []  # latency, error rate and breaker state per provider
@@ -1,8 +1,8 @@
 from fastapi import APIRouter, HTTPException
-from backend.models.requests import UpdateProviderRequest
+from backend.models.requests import UpdateModelProfileRequest, UpdateProviderRequest
 from backend.models.responses import ProviderConfigResponse
 import os
-from dotenv import load_dotenv, set_key
+from dotenv import load_dotenv, set_key, unset_key
 
 router = APIRouter()
 
@@ -46,12 +46,16 @@ async def get_config():
         "google": bool(os.getenv("GOOGLE_API_KEY")),
     }
 
+    from provider_health import health_table
+
     return ProviderConfigResponse(
         current_provider=current_provider,
         available_providers=["anthropic", "openai", "google"],
         current_model=current_model,
         available_models=available_models,
         api_keys_configured=api_keys_configured,
+        provider_chain=[entry.strip() for entry in os.getenv("LLM_PROVIDER_CHAIN", "").split(",") if entry.strip()],
+        provider_health=health_table(),
     )
 
 
@@ -89,9 +93,168 @@ async def update_config(request: UpdateProviderRequest):
     # Reload environment variables from the same path
     load_dotenv(dotenv_path=env_file, override=True)
 
-    # Reset LLM singleton to force re-initialization
-    import ai_functions
+    # No client reset needed: new jobs resolve a fresh provider snapshot (and registry entry),
+    # while in-flight jobs keep the snapshot they pinned at start
+    return {"status": "updated", "provider": request.provider}
+
 
-    ai_functions.llm = None
+@router.get("/cache")
+async def get_cache_stats():
+    """Get LLM response cache hit/miss counters and size."""
+    from llm_cache import cache_stats
 
-    return {"status": "updated", "provider": request.provider}
+    return cache_stats()
+
+
+@router.delete("/cache")
+async def clear_cache():
+    """Drop every cached LLM response."""
+    from llm_cache import get_response_cache
+
+    cache = get_response_cache()
+    if cache is None:
+        raise HTTPException(status_code=400, detail="LLM response cache is disabled")
+    cache.clear()
+    return {"status": "cleared"}
+
+
+@router.get("/limits")
+async def get_rate_limits():
+    """Get current provider rate limits, adaptive concurrency and queue depth."""
+    from rate_limiter import limiter_stats
+
+    return {"limiters": limiter_stats()}
+
+
+@router.get("/queue")
+async def get_job_queue():
+    """Get the job scheduler's slots, queue depth per lane and admission counters."""
+    from backend.main import app
+
+    return app.state.job_manager.scheduler.stats()
+
+
+@router.get("/jobs")
+async def get_job_store():
+    """Get the job store's row counts per status, stored result size, eviction and coalescing counters."""
+    from backend.main import app
+
+    job_manager = app.state.job_manager
+    return {
+        **job_manager.store.stats(),
+        "hot_set": len(job_manager.jobs),
+        "hot_set_size": job_manager.hot_set_size,
+        "coalesced": job_manager.coalesced,
+    }
+
+
+@router.get("/clients")
+async def get_registered_clients():
+    """Get the warm LLM clients held by the client registry (one per provider, model, endpoint and settings)."""
+    from ai_functions import registered_clients
+
+    return {"clients": registered_clients()}
+
+
+@router.get("/providers")
+async def get_provider_health():
+    """Get the provider failover chain and each provider's latency, error rate and breaker state."""
+    from provider_health import health_table, routing_mode
+
+    chain = [entry.strip() for entry in os.getenv("LLM_PROVIDER_CHAIN", "").split(",") if entry.strip()]
+    return {"chain": chain, "routing": routing_mode(), "providers": health_table()}
+
+
+@router.get("/capabilities")
+async def get_endpoint_capabilities():
+    """Get the negotiated capabilities of OpenAI-compatible servers (LM Studio, OpenRouter)."""
+    from endpoint_capabilities import capability_table
+
+    return {"capabilities": capability_table()}
+
+
+@router.get("/parsing")
+async def get_parse_stats():
+    """Get structured-output parse outcomes per schema (exact, extracted, repaired, failed)."""
+    from json_extraction import parse_stats
+
+    return {"parsing": parse_stats()}
+
+
+@router.get("/prompts")
+async def get_prompt_registry():
+    """Get the prompt registry version, load time and source files."""
+    from prompt_registry import prompt_stats
+
+    return prompt_stats()
+
+
+@router.post("/prompts/reload")
+async def reload_prompt_registry():
+    """Rebuild the compiled prompts from prompts/ (edits are also picked up automatically by mtime)."""
+    from prompt_registry import reload_prompts
+
+    return reload_prompts()
+
+
+@router.get("/resources")
+async def get_resources():
+    """Get the version and size of the shared resource snapshot (styles, tags, personas, lists)."""
+    from resource_store import resource_stats
+
+    return resource_stats()
+
+
+@router.post("/resources/reload")
+async def reload_resource_snapshot():
+    """Rebuild the resource snapshot from disk (file edits are also picked up automatically by mtime)."""
+    from resource_store import reload_resources, resource_stats
+
+    reload_resources()
+    return resource_stats()
+
+
+@router.get("/profiles")
+async def get_model_profiles():
+    """Get the effective per-node model profiles (model, max_tokens, temperature, stop)."""
+    from model_profiles import all_profiles
+
+    return {"profiles": all_profiles()}
+
+
+@router.put("/profiles")
+async def update_model_profile(request: UpdateModelProfileRequest):
+    """
+    Update one node's model profile.
+    Omitted fields are left as they are; an empty model, 0 max_tokens or an empty stop list clears the override.
+    """
+    import json
+    import pathlib
+    from model_profiles import DEFAULT_PROFILES, env_key, get_profile
+
+    if request.node not in DEFAULT_PROFILES:
+        raise HTTPException(status_code=400, detail=f"Unknown profile node: {request.node}")
+
+    env_file = str(pathlib.Path(__file__).parent.parent.parent / ".env")
+    updates = {
+        "model": request.model,
+        "local_model": request.local_model,
+        "max_tokens": None if request.max_tokens is None else (str(request.max_tokens) if request.max_tokens else ""),
+        "temperature": None if request.temperature is None else str(request.temperature),
+        "stop": None if request.stop is None else (json.dumps(request.stop) if request.stop else ""),
+    }
+    for field_name, value in updates.items():
+        if value is None:
+            continue
+        key = env_key(request.node, field_name)
+        if value == "":
+            if pathlib.Path(env_file).exists():
+                unset_key(env_file, key)
+            os.environ.pop(key, None)
+        else:
+            set_key(env_file, key, value)
+            os.environ[key] = value
+
+    # New calls pick the profile up immediately; clients are keyed on the resolved settings
+    profile = get_profile(request.node)
+    return {"status": "updated", "node": request.node, "profile": {**profile.__dict__, "stop": list(profile.stop)}}
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
-from backend.models.requests import GenerateSongRequest
+from backend.models.requests import GenerateBatchRequest, GenerateSongRequest
 from backend.models.responses import JobResponse, ProgressUpdate
 from backend.services.song_generator import SongGenerator
 from backend.services.job_manager import JobManager
+from backend.services.job_scheduler import QueueFull
 from backend.routers.websocket import manager as ws_manager
 from datetime import datetime
+from typing import List, Tuple
 
 router = APIRouter()
 
@@ -27,18 +29,30 @@ def get_song_generator():
     return app.state.song_generator
 
 
-@router.post("/", response_model=JobResponse)
-async def generate_song_endpoint(
-    request: GenerateSongRequest,
-    job_manager: JobManager = Depends(get_job_manager),
-    generator: SongGenerator = Depends(get_song_generator),
-):
-    """
-    Start a new song generation job.
-    Returns job_id and websocket URL for progress tracking.
-    """
-    # Create job
-    job_id = job_manager.create_job(
+def make_progress_callback(job_id: str, use_hookhouse: bool):
+    """Build the WebSocket progress callback for a job."""
+    # HookHouse has 8 steps, original has 9 (album art vs. image prompt)
+    total_steps = 8 if use_hookhouse else 9
+
+    async def progress_callback(step: str, step_index: int, message: str):
+        update = ProgressUpdate(
+            job_id=job_id,
+            step=step,
+            step_index=step_index,
+            total_steps=total_steps,
+            message=message,
+            percentage=round((step_index / total_steps) * 100, 2),
+            timestamp=datetime.utcnow(),
+        )
+        await ws_manager.send_progress(job_id, update)
+
+    return progress_callback
+
+
+def create_job_from_request(
+    job_manager: JobManager, request: GenerateSongRequest, coalesce: bool = True
+) -> Tuple[str, bool]:
+    return job_manager.create_job(
         user_input=request.user_input,
         song_name=request.song_name,
         persona=request.persona,
@@ -57,28 +71,86 @@ async def generate_song_endpoint(
         key=request.key,
         groove_texture=request.groove_texture,
         choir_call_response=request.choir_call_response,
+        priority=request.priority,
+        coalesce=coalesce,
     )
 
-    # Define progress callback that sends to WebSocket
-    # HookHouse has 8 steps, original has 9 (album art vs. image prompt)
-    total_steps = 8 if request.use_hookhouse else 9
 
-    async def progress_callback(step: str, step_index: int, message: str):
-        update = ProgressUpdate(
-            job_id=job_id,
-            step=step,
-            step_index=step_index,
-            total_steps=total_steps,
-            message=message,
-            percentage=round((step_index / total_steps) * 100, 2),
-            timestamp=datetime.utcnow(),
-        )
-        await ws_manager.send_progress(job_id, update)
+def queue_full_error(error: QueueFull) -> HTTPException:
+    """429 telling the client when the queue is likely to have room again."""
+    return HTTPException(status_code=429, detail=str(error), headers={"Retry-After": str(error.retry_after)})
+
+
+def job_discarded_error(job_manager: JobManager, lane: str) -> HTTPException:
+    """
+    429 for a request whose job vanished before it could be queued.
+
+    Coalesced requests share one job, and whichever start_job call runs first discards
+    it on QueueFull; the others then find it gone and get the same answer.
+    """
+    return queue_full_error(QueueFull(lane, job_manager.scheduler.retry_after()))
+
+
+def job_response(job_manager: JobManager, job_id: str, coalesced: bool = False) -> JobResponse:
+    queued = job_manager.queue_status(job_id)
+    return JobResponse(
+        job_id=job_id,
+        status=job_manager.get_job(job_id).status.value,
+        websocket_url=f"ws://localhost:8000/ws/{job_id}",
+        queue_position=queued[0] if queued else None,
+        eta_seconds=queued[1] if queued else None,
+        coalesced=coalesced,
+    )
+
+
+@router.post("/", response_model=JobResponse)
+async def generate_song_endpoint(
+    request: GenerateSongRequest,
+    job_manager: JobManager = Depends(get_job_manager),
+    generator: SongGenerator = Depends(get_song_generator),
+):
+    """
+    Start a new song generation job.
+    Returns job_id and websocket URL for progress tracking, plus the queue position and ETA
+    when every generation slot is busy. Answers 429 with Retry-After when the job's queue lane is full.
+    A request identical to one already queued or running attaches to that job (coalesced=true).
+    """
+    # Create job, or find the in-flight job for an identical request
+    job_id, coalesced = create_job_from_request(job_manager, request)
 
-    # Start job asynchronously
-    await job_manager.start_job(job_id, generator, progress_callback)
+    # Queue the job; it runs asynchronously once a slot is free, sending progress to the WebSocket
+    try:
+        await job_manager.start_job(job_id, generator, make_progress_callback(job_id, request.use_hookhouse))
+    except QueueFull as e:
+        raise queue_full_error(e)
+    except ValueError:
+        raise job_discarded_error(job_manager, request.priority)
 
-    return JobResponse(job_id=job_id, status="running", websocket_url=f"ws://localhost:8000/ws/{job_id}")
+    return job_response(job_manager, job_id, coalesced=coalesced)
+
+
+@router.post("/batch", response_model=List[JobResponse])
+async def generate_batch_endpoint(
+    request: GenerateBatchRequest,
+    job_manager: JobManager = Depends(get_job_manager),
+    generator: SongGenerator = Depends(get_song_generator),
+):
+    """
+    Start a bulk generation run through the provider batch API.
+    Every song advances stage by stage together; per-song latency is traded for batch pricing and throughput.
+    """
+    # Not coalesced: every song must be its own job so the batch coordinator counts each one
+    job_ids = [create_job_from_request(job_manager, song, coalesce=False)[0] for song in request.songs]
+    callbacks = {
+        job_id: make_progress_callback(job_id, song.use_hookhouse) for job_id, song in zip(job_ids, request.songs)
+    }
+    try:
+        await job_manager.start_batch(job_ids, generator, callbacks)
+    except QueueFull as e:
+        raise queue_full_error(e)
+    return [
+        JobResponse(job_id=job_id, status="running", websocket_url=f"ws://localhost:8000/ws/{job_id}") for job_id in job_ids
+    ]
 
 
 @router.get("/{job_id}/status")
@@ -88,9 +160,13 @@ async def get_job_status(job_id: str, job_manager: JobManager = Depends(get_job_
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
+    queued = job_manager.queue_status(job_id)
     return {
         "job_id": job.job_id,
         "status": job.status,
+        "priority": job.priority,
+        "queue_position": queued[0] if queued else None,
+        "eta_seconds": queued[1] if queued else None,
         "created_at": job.created_at,
         "started_at": job.started_at,
         "completed_at": job.completed_at,
@@ -101,8 +177,30 @@ async def get_job_status(job_id: str, job_manager: JobManager = Depends(get_job_
 
 @router.post("/{job_id}/cancel")
 async def cancel_job(job_id: str, job_manager: JobManager = Depends(get_job_manager)):
-    """Cancel a running generation job."""
+    """Cancel a queued or running generation job."""
     success = await job_manager.cancel_job(job_id)
     if not success:
         raise HTTPException(status_code=400, detail="Job not found or already completed")
     return {"status": "cancelled"}
+
+
+@router.post("/{job_id}/resume", response_model=JobResponse)
+async def resume_job(
+    job_id: str,
+    job_manager: JobManager = Depends(get_job_manager),
+    generator: SongGenerator = Depends(get_song_generator),
+):
+    """
+    Resume a failed or cancelled job from its last completed step.
+    Steps that already finished are restored from the job's checkpoint instead of being re-generated.
+    """
+    job = job_manager.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    try:
+        await job_manager.resume_job(job_id, generator, make_progress_callback(job_id, job.use_hookhouse))
+    except QueueFull as e:
+        raise queue_full_error(e)
+    except ValueError:
+        raise HTTPException(status_code=409, detail="Only failed or cancelled jobs that have stopped running can be resumed")
+    return job_response(job_manager, job_id)
@@ -2,6 +2,8 @@ from fastapi import APIRouter, HTTPException, Query, Depends, UploadFile, File
 from backend.models.responses import SongMetadata, SongDetailResponse, JobResponse
 from backend.services.file_service import FileService
 from backend.services.job_manager import JobManager
+from backend.services.job_scheduler import INTERACTIVE, QueueFull
+from backend.routers.generation import job_discarded_error, job_response, queue_full_error
 from backend.services.song_generator import SongGenerator
 from typing import List, Optional
 import os
@@ -75,7 +77,7 @@ async def generate_image_prompt(song_id: str):
     lyrics_preview = song.lyrics[:1000] if len(song.lyrics) > 1000 else song.lyrics
 
     # Import AI functions
-    from ai_functions import get_llm
+    from ai_functions import complete_json
     import json
     import re
 
@@ -145,37 +147,8 @@ Output ONLY the JSON object in this exact format:
 Ensure the JSON is complete, valid, and captures all visual, spatial, semantic, and atmospheric elements that would make a compelling album cover for this song."""
 
     try:
-        # Get LLM and generate the blueprint
-        llm = get_llm(use_local=False)
-        ai_response = llm.invoke(ai_prompt)
-
-        print(f"AI Response received (first 500 chars): {str(ai_response)[:500]}")
-
-        # Convert response to string if it's not already
-        response_text = str(ai_response)
-
-        # Extract JSON from response (handle markdown code blocks)
-        json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', response_text, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(1)
-            print(f"Extracted JSON from code block")
-        else:
-            # Try to find JSON object directly
-            json_match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-                print(f"Extracted JSON directly")
-            else:
-                # Last resort: try the whole response
-                json_str = response_text.strip()
-                print(f"Using entire response as JSON")
-
-        if not json_str or json_str == '':
-            raise ValueError("No JSON content found in AI response")
-
-        # Parse the JSON
-        print(f"Attempting to parse JSON (first 200 chars): {json_str[:200]}")
-        scene_blueprint = json.loads(json_str)
+        # Generate the blueprint; fences/prose are tolerated and a malformed answer gets one repair call
+        scene_blueprint = complete_json(ai_prompt, use_local=False, node="image_prompt", schema="image_blueprint")
 
         # Format JSON for output (only JSON, no header)
         copy_ready_prompt = json.dumps(scene_blueprint, indent=2)
@@ -244,11 +217,13 @@ async def regenerate_lyrics(
     from datetime import datetime
 
     # Create a new job
-    job_id = job_manager.create_job(
+    job_id, coalesced = job_manager.create_job(
         user_input=song.metadata.user_prompt,
         use_local=False,
         song_name=None,  # Let it generate a new name
-        persona=None  # Use original persona if we tracked it
+        persona=None,  # Use original persona if we tracked it
+        # A regeneration must produce new lyrics, not replay the cached responses for the same prompt
+        bypass_cache=True,
     )
 
     # Define progress callback
@@ -267,12 +242,16 @@ async def regenerate_lyrics(
         )
         await ws_manager.send_progress(job_id, update)
 
-    # Start the job
-    await job_manager.start_job(job_id, generator, progress_callback)
+    # Queue the job (a repeated click while the first regeneration is in flight attaches to it)
+    try:
+        await job_manager.start_job(job_id, generator, progress_callback)
+    except QueueFull as e:
+        raise queue_full_error(e)
+    except ValueError:
+        raise job_discarded_error(job_manager, INTERACTIVE)
 
     # Return job info
-    websocket_url = f"ws://localhost:8000/ws/{job_id}"
-    return JobResponse(job_id=job_id, status="running", websocket_url=websocket_url)
+    return job_response(job_manager, job_id, coalesced=coalesced)
 
 
 @router.post("/{song_id}/upload-art")
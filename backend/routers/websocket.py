@@ -1,56 +1,220 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from backend.models.responses import ProgressUpdate
+from collections import deque
+from typing import Optional
+import asyncio
 import json
+import os
 
 router = APIRouter()
 
+# Token deltas are coalesced for this long before being published as one "token" message
+TOKEN_FLUSH_INTERVAL = float(os.getenv("WS_TOKEN_FLUSH_MS", "75")) / 1000
+# A client that cannot accept a message within this window is treated as gone
+SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", os.getenv("WS_TOKEN_SEND_TIMEOUT", "10")))
+# Events kept per job for replay; a subscriber further behind than this is disconnected (it can resume from its offset)
+EVENT_LOG_SIZE = int(os.getenv("WS_EVENT_LOG_SIZE", "1000"))
+# How long a finished job's event log stays available for late or reconnecting clients
+EVENT_LOG_TTL = float(os.getenv("WS_EVENT_LOG_TTL_SECONDS", "300"))
+# An idle connection gets a heartbeat this often; a socket that cannot take it is reaped
+HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_SECONDS", "15"))
+
+
+class EventLog:
+    """Bounded, sequence-numbered record of the messages published for one job."""
 
-class ConnectionManager:
     def __init__(self):
-        self.active_connections: dict[str, WebSocket] = {}
+        self.events: deque[tuple[int, str]] = deque(maxlen=EVENT_LOG_SIZE)
+        self.last_seq = 0
+        # Set once the job's final message (complete/error) is logged; the log then expires after EVENT_LOG_TTL
+        self.final = False
+        self.expiry: Optional[asyncio.TimerHandle] = None
 
-    async def connect(self, job_id: str, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections[job_id] = websocket
+    def append(self, payload: dict) -> str:
+        self.last_seq += 1
+        text = json.dumps({**payload, "seq": self.last_seq}, default=str)
+        self.events.append((self.last_seq, text))
+        return text
 
-    def disconnect(self, job_id: str):
-        if job_id in self.active_connections:
-            del self.active_connections[job_id]
+    def since(self, offset: int) -> tuple[int, list[str]]:
+        """(number of events after offset no longer retained, retained events after offset)."""
+        first = self.events[0][0] if self.events else self.last_seq + 1
+        missed = max(0, first - offset - 1)
+        return missed, [text for seq, text in self.events if seq > offset]
 
-    async def send_progress(self, job_id: str, update: ProgressUpdate):
-        if job_id in self.active_connections:
+
+class Subscriber:
+    """One connected client: an outbound queue drained by its own writer task."""
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.queue: asyncio.Queue[str] = asyncio.Queue()
+        self.writer: Optional[asyncio.Task] = None
+
+
+class ConnectionManager:
+    """
+    Per-job pub/sub over WebSockets.
+
+    Every message for a job is appended to that job's EventLog with a sequence
+    number ("seq") and fanned out to all of its subscribers (several tabs, or
+    several callers of a coalesced job). Messages published before a client
+    connects are not lost: a client connecting with ?offset=N first receives
+    every retained event after seq N (offset 0 replays the whole log), so a
+    reconnecting client passes the last seq it saw.
+    """
+
+    def __init__(self):
+        self._logs: dict[str, EventLog] = {}
+        self._subscribers: dict[str, list[Subscriber]] = {}
+        # Pending token text per job as [step, text] segments, plus the task flushing them
+        self._token_buffers: dict[str, list[list[str]]] = {}
+        self._token_flushers: dict[str, asyncio.Task] = {}
+
+    def subscribe(self, job_id: str, websocket: WebSocket, offset: int = 0) -> Subscriber:
+        """Register an accepted socket, queueing the events it missed since offset."""
+        subscriber = Subscriber(websocket)
+        log = self._logs.get(job_id)
+        if log is not None:
+            missed, events = log.since(offset)
+            if missed:
+                # Older events have left the ring buffer; the status endpoint has the job's current state
+                subscriber.queue.put_nowait(json.dumps({"type": "replay_gap", "job_id": job_id, "missed": missed}))
+            for text in events:
+                subscriber.queue.put_nowait(text)
+        self._subscribers.setdefault(job_id, []).append(subscriber)
+        subscriber.writer = asyncio.create_task(self._write(job_id, subscriber))
+        return subscriber
+
+    def unsubscribe(self, job_id: str, subscriber: Subscriber):
+        subscribers = self._subscribers.get(job_id, [])
+        if subscriber in subscribers:
+            subscribers.remove(subscriber)
+        if not subscribers:
+            self._subscribers.pop(job_id, None)
+        if subscriber.writer is not None and subscriber.writer is not asyncio.current_task():
+            subscriber.writer.cancel()
+
+    def subscriber_count(self, job_id: str) -> int:
+        return len(self._subscribers.get(job_id, []))
+
+    async def _write(self, job_id: str, subscriber: Subscriber):
+        try:
+            while True:
+                try:
+                    text = await asyncio.wait_for(subscriber.queue.get(), HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    log = self._logs.get(job_id)
+                    text = json.dumps({"type": "heartbeat", "job_id": job_id, "seq": log.last_seq if log else 0})
+                await asyncio.wait_for(subscriber.websocket.send_text(text), SEND_TIMEOUT)
+        except Exception:
+            # Dead or stalled socket: stop fanning out to it and close it so its receive loop ends
+            self.unsubscribe(job_id, subscriber)
             try:
-                await self.active_connections[job_id].send_text(update.model_dump_json())
+                await asyncio.wait_for(subscriber.websocket.close(), SEND_TIMEOUT)
             except Exception:
-                # Connection closed, remove it
-                self.disconnect(job_id)
+                pass
+
+    def publish(self, job_id: str, payload: dict, final: bool = False):
+        """Log a message for a job and fan it out; final starts the countdown to dropping the job's log."""
+        log = self._logs.get(job_id)
+        if log is None:
+            log = self._logs[job_id] = EventLog()
+        text = log.append(payload)
+        for subscriber in list(self._subscribers.get(job_id, [])):
+            if subscriber.queue.qsize() >= EVENT_LOG_SIZE:
+                # Too far behind to ever catch up; the client can reconnect from its last seq
+                self.unsubscribe(job_id, subscriber)
+                asyncio.create_task(subscriber.websocket.close())
+                continue
+            subscriber.queue.put_nowait(text)
+        if final or log.final:
+            # (Re)arm the expiry, so a finished job's log lives EVENT_LOG_TTL past its last message
+            if log.expiry is not None:
+                log.expiry.cancel()
+            log.final = True
+            log.expiry = asyncio.get_running_loop().call_later(EVENT_LOG_TTL, self._logs.pop, job_id, None)
+
+    def reopen(self, job_id: str):
+        """Keep a finished job's log (and accept its tokens again) because the job is being resumed."""
+        log = self._logs.get(job_id)
+        if log is None:
+            return
+        if log.expiry is not None:
+            log.expiry.cancel()
+            log.expiry = None
+        log.final = False
+
+    async def send_progress(self, job_id: str, update: ProgressUpdate):
+        # Streamed text still buffered belongs before the progress event that follows it
+        # (and nothing may follow the final one), so the log replays in order
+        self._drain_tokens(job_id)
+        self.publish(job_id, update.model_dump(mode="json"), final=update.step == "complete")
+
+    def queue_token(self, job_id: str, step: str, text: str):
+        """
+        Buffer a streamed token for a job (must be called on the event loop).
+
+        Tokens are coalesced and published at most every TOKEN_FLUSH_INTERVAL, so the
+        event log and slow clients see fewer, larger messages instead of one per token.
+        """
+        log = self._logs.get(job_id)
+        if log is not None and log.final:
+            return  # Late tokens from a finished job would arrive after its final message
+        segments = self._token_buffers.setdefault(job_id, [])
+        if segments and segments[-1][0] == step:
+            segments[-1][1] += text
+        else:
+            segments.append([step, text])
+        flusher = self._token_flushers.get(job_id)
+        if flusher is None or flusher.done():
+            self._token_flushers[job_id] = asyncio.create_task(self._flush_tokens(job_id))
+
+    async def _flush_tokens(self, job_id: str):
+        while self._token_buffers.get(job_id):
+            await asyncio.sleep(TOKEN_FLUSH_INTERVAL)
+            for step, text in self._token_buffers.pop(job_id, []):
+                self.publish(job_id, {"type": "token", "job_id": job_id, "step": step, "text": text})
+        self._token_flushers.pop(job_id, None)
+
+    def _drain_tokens(self, job_id: str):
+        """Publish a job's buffered tokens now and stop its flusher."""
+        flusher = self._token_flushers.pop(job_id, None)
+        if flusher is not None and flusher is not asyncio.current_task():
+            flusher.cancel()
+        for step, text in self._token_buffers.pop(job_id, []):
+            self.publish(job_id, {"type": "token", "job_id": job_id, "step": step, "text": text})
 
     async def send_error(self, job_id: str, error_message: str):
-        """Send error message to client"""
-        if job_id in self.active_connections:
-            try:
-                error_data = {
-                    "type": "error",
-                    "error": error_message,
-                    "job_id": job_id
-                }
-                await self.active_connections[job_id].send_text(json.dumps(error_data))
-            except Exception:
-                self.disconnect(job_id)
+        """Send error message to clients"""
+        error_data = {
+            "type": "error",
+            "error": error_message,
+            "job_id": job_id
+        }
+        self._drain_tokens(job_id)
+        self.publish(job_id, error_data, final=True)
 
 
 manager = ConnectionManager()
 
 
 @router.websocket("/{job_id}")
-async def websocket_endpoint(job_id: str, websocket: WebSocket):
+async def websocket_endpoint(job_id: str, websocket: WebSocket, offset: int = 0):
     """
     WebSocket endpoint for real-time progress updates.
 
-    Client connects to ws://localhost:8000/ws/{job_id}
-    Receives ProgressUpdate JSON messages as generation progresses.
+    Client connects to ws://localhost:8000/ws/{job_id}?offset=N
+    Receives ProgressUpdate JSON messages as generation progresses (step "queued",
+    with queue_position and eta_seconds, while the job waits for a slot), plus
+    {"type": "token", "step", "text"} messages carrying streamed lyrics. Every
+    message carries a "seq"; on connect the job's retained messages after seq
+    ``offset`` are replayed first (preceded by {"type": "replay_gap", "missed"}
+    if some have been dropped). Idle connections receive
+    {"type": "heartbeat", "seq"} messages.
     """
-    await manager.connect(job_id, websocket)
+    await websocket.accept()
+    subscriber = manager.subscribe(job_id, websocket, offset)
 
     try:
         # Keep connection alive and listen for client messages
@@ -63,8 +227,9 @@ async def websocket_endpoint(job_id: str, websocket: WebSocket):
 
                 job_manager = app.state.job_manager
                 await job_manager.cancel_job(job_id)
-                await websocket.send_text(json.dumps({"status": "cancelled"}))
-                break
+                subscriber.queue.put_nowait(json.dumps({"status": "cancelled"}))
 
     except WebSocketDisconnect:
-        manager.disconnect(job_id)
+        pass
+    finally:
+        manager.unsubscribe(job_id, subscriber)
@@ -1,6 +1,18 @@
+import hashlib
+import json
+import math
+import os
 import uuid
 import asyncio
-from typing import Dict, List, Optional, Callable
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Callable, Tuple
+
+from backend.services.job_scheduler import BATCH, INTERACTIVE, JobScheduler, QueueFull
+from backend.services.job_store import JobStore, open_job_store
+from batch_mode import BatchCoordinator
+from cancellation import cancel
+from job_context import job_context_registered
 from datetime import datetime
 from enum import Enum
 
@@ -13,6 +25,31 @@ class JobStatus(str, Enum):
     CANCELLED = "cancelled"
 
 
+FINISHED = (JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+# Job attributes stored as the job's request: everything needed to run it again after a restart
+REQUEST_FIELDS = (
+    "user_input",
+    "song_name",
+    "persona",
+    "use_local",
+    "use_hookhouse",
+    "blend",
+    "mood_style",
+    "explicitness",
+    "pov",
+    "setting",
+    "themes_include",
+    "themes_avoid",
+    "bpm",
+    "time_signature",
+    "key",
+    "groove_texture",
+    "choir_call_response",
+    "bypass_cache",
+)
+
+
 class Job:
     def __init__(
         self,
@@ -35,6 +72,8 @@ class Job:
         key: Optional[str] = None,
         groove_texture: Optional[str] = None,
         choir_call_response: bool = False,
+        priority: str = INTERACTIVE,
+        bypass_cache: bool = False,
     ):
         self.job_id = job_id
         self.user_input = user_input
@@ -55,23 +94,103 @@ class Job:
         self.key = key
         self.groove_texture = groove_texture
         self.choir_call_response = choir_call_response
+        self.priority = priority  # scheduler lane: "interactive" or "batch"
+        self.batch_id: Optional[str] = None  # set while the job runs in batch mode (see JobManager.start_batch)
+        self.bypass_cache = bypass_cache  # generate fresh output instead of serving cached LLM responses
         # Status fields
         self.status = JobStatus.QUEUED
         self.created_at = datetime.utcnow()
         self.started_at: Optional[datetime] = None
         self.completed_at: Optional[datetime] = None
-        self.result: Optional[dict] = None
         self.error: Optional[str] = None
         self.task: Optional[asyncio.Task] = None
         self.progress_callbacks: list[Callable] = []
+        # Set when identical requests may attach to this job while it is in flight (see JobManager.create_job)
+        self.request_fingerprint: Optional[str] = None
+        # The result lives in the job store once the job finishes; _load_result reads it back on demand
+        self._result: Optional[dict] = None
+        self._load_result: Optional[Callable[[str], Optional[dict]]] = None
+
+    @property
+    def result(self) -> Optional[dict]:
+        if self._result is None and self._load_result is not None and self.status == JobStatus.COMPLETED:
+            return self._load_result(self.job_id)
+        return self._result
+
+    @result.setter
+    def result(self, value: Optional[dict]):
+        self._result = value
+
+    def fingerprint(self) -> str:
+        """Hash of the request parameters (whitespace-normalized prompt), used to spot identical in-flight requests."""
+        request = {field: getattr(self, field) for field in REQUEST_FIELDS}
+        request["user_input"] = " ".join(self.user_input.split())
+        return hashlib.sha256(json.dumps(request, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def to_record(self) -> Dict[str, Any]:
+        """The job's row in the job store (without its result)."""
+        return {
+            "job_id": self.job_id,
+            "status": self.status.value,
+            "priority": self.priority,
+            "batch_id": self.batch_id,
+            "request": {field: getattr(self, field) for field in REQUEST_FIELDS},
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+            "error": self.error,
+        }
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "Job":
+        request = record["request"]
+        job = cls(
+            record["job_id"],
+            request["user_input"],
+            request["song_name"],
+            request["persona"],
+            request["use_local"],
+            priority=record["priority"],
+            # Records written before a field existed fall back to the Job default
+            **{field: request[field] for field in REQUEST_FIELDS[4:] if field in request},
+        )
+        job.batch_id = record.get("batch_id")
+        job.status = JobStatus(record["status"])
+        job.created_at = datetime.fromisoformat(record["created_at"])
+        job.started_at = datetime.fromisoformat(record["started_at"]) if record["started_at"] else None
+        job.completed_at = datetime.fromisoformat(record["completed_at"]) if record["completed_at"] else None
+        job.error = record["error"]
+        return job
 
 
 class JobManager:
-    """Manages concurrent song generation jobs with cancellation support."""
+    """
+    Manages concurrent song generation jobs with cancellation support.
 
-    def __init__(self):
-        self.jobs: Dict[str, Job] = {}
+    ``jobs`` is only the hot set: every queued or running job plus the
+    JOB_HOT_SET_SIZE most recently used finished ones. All jobs are persisted to
+    the job store, and get_job() loads older ones back from it on demand.
+    """
+
+    def __init__(self, max_concurrent_jobs: Optional[int] = None, store: Optional[JobStore] = None):
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.store = store or open_job_store()
+        # Job store writes run here, in submission order, so sqlite commits never block the event loop
+        self._store_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store")
+        self.hot_set_size = int(os.getenv("JOB_HOT_SET_SIZE", "100"))
         self._lock = asyncio.Lock()
+        self._shutting_down = False
+        # Request fingerprint -> job_id of the queued or running job serving it
+        self._inflight: Dict[str, str] = {}
+        self.coalesce_window = float(os.getenv("JOB_COALESCE_WINDOW_SECONDS", "60"))
+        self.coalesced = 0
+        # Jobs wait here until a generation slot is free (see job_scheduler)
+        self.scheduler = JobScheduler(slots=max_concurrent_jobs)
+        self.scheduler.on_change = self._queue_changed
+        self._queue_notifier: Optional[asyncio.Task] = None
+        # Batch-mode jobs bypass the scheduler's slots (they mostly sit parked on a provider batch), so cap them here
+        self.batch_max_jobs = int(os.getenv("BATCH_MAX_JOBS", "500"))
+        self._batch_running: set[str] = set()
 
     def create_job(
         self,
@@ -93,8 +212,18 @@ class JobManager:
         key: Optional[str] = None,
         groove_texture: Optional[str] = None,
         choir_call_response: bool = False,
-    ) -> str:
-        """Create a new job and return job_id."""
+        priority: str = INTERACTIVE,
+        coalesce: bool = True,
+        bypass_cache: bool = False,
+    ) -> Tuple[str, bool]:
+        """
+        Create a new job and return (job_id, coalesced).
+
+        With coalesce, a request identical to a job created within
+        JOB_COALESCE_WINDOW_SECONDS that is still pending or in flight returns that
+        job's id with coalesced=True instead, so double-clicks and client retries
+        share one run (start_job leaves an active job as is).
+        """
         job_id = str(uuid.uuid4())
         job = Job(
             job_id,
@@ -115,29 +244,264 @@ class JobManager:
             key=key,
             groove_texture=groove_texture,
             choir_call_response=choir_call_response,
+            priority=priority,
+            bypass_cache=bypass_cache,
         )
-        self.jobs[job_id] = job
-        return job_id
+        if coalesce and self._coalescing_enabled():
+            fingerprint = job.fingerprint()
+            existing = self.jobs.get(self._inflight.get(fingerprint, ""))
+            if existing is not None and self._within_window(existing):
+                self.coalesced += 1
+                return existing.job_id, True
+            job.request_fingerprint = fingerprint
+            self._inflight[fingerprint] = job_id
+        self._adopt(job)
+        return job_id, False
+
+    def _coalescing_enabled(self) -> bool:
+        return os.getenv("JOB_COALESCE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+    def _within_window(self, job: Job) -> bool:
+        if self.coalesce_window <= 0:
+            return True
+        return (datetime.utcnow() - job.created_at).total_seconds() <= self.coalesce_window
+
+    def _release_fingerprint(self, job: Job):
+        if job.request_fingerprint and self._inflight.get(job.request_fingerprint) == job.job_id:
+            del self._inflight[job.request_fingerprint]
+
+    def is_active(self, job_id: str) -> bool:
+        """Whether the job is waiting in the queue or running."""
+        job = self.jobs.get(job_id)
+        return job is not None and (self.scheduler.is_queued(job_id) or (job.task is not None and not job.task.done()))
 
     def get_job(self, job_id: str) -> Optional[Job]:
-        """Get job by ID."""
-        return self.jobs.get(job_id)
+        """Get job by ID, loading it from the job store if it has left the hot set."""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            self.jobs.move_to_end(job_id)
+            return job
+        record = self.store.load(job_id)
+        if record is None:
+            return None
+        job = self._adopt(Job.from_record(record))
+        self._evict()
+        return job
+
+    def _adopt(self, job: Job) -> Job:
+        job._load_result = self.store.load_result
+        self.jobs[job.job_id] = job
+        return job
+
+    def _persist(self, job: Job):
+        # The record is taken now, on the loop; only the write happens in the background
+        self._store_writer.submit(self.store.save, job.to_record())
 
-    async def start_job(self, job_id: str, generator, progress_callback: Callable):
-        """Start executing a job."""
+    def _evict(self):
+        """Drop the least recently used finished jobs beyond the hot set size (they stay in the job store)."""
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in FINISHED and job.task is None]
+        for job_id in finished[: max(0, len(finished) - self.hot_set_size)]:
+            del self.jobs[job_id]
+
+    async def restore(self, generator, make_progress_callback: Callable[[str, bool], Callable]) -> int:
+        """
+        Re-queue the jobs that were queued or running when the backend last stopped.
+
+        Interrupted running jobs resume from their last checkpointed step; batch-mode
+        jobs restart together under a new coordinator, as the batch they belonged to.
+        Returns the number of jobs queued again.
+        """
+        self.store.prune()
+        restored = 0
+        batches: Dict[str, List[Job]] = {}
+        async with self._lock:
+            for record in self.store.unfinished():
+                job = self._adopt(Job.from_record(record))
+                if job.batch_id:
+                    batches.setdefault(job.batch_id, []).append(job)
+                    continue
+                resume = job.status == JobStatus.RUNNING
+                try:
+                    self._enqueue(job, generator, make_progress_callback(job.job_id, job.use_hookhouse), resume=resume)
+                    restored += 1
+                except QueueFull:
+                    job.status = JobStatus.FAILED
+                    job.error = "Job queue was full when the backend restarted"
+                    job.completed_at = datetime.utcnow()
+                    self._persist(job)
+            # Already admitted once, so a restored batch is not held to BATCH_MAX_JOBS again
+            for jobs in batches.values():
+                callbacks = {job.job_id: make_progress_callback(job.job_id, job.use_hookhouse) for job in jobs}
+                self._launch_batch(jobs, generator, callbacks, resume=True)
+                restored += len(jobs)
+        return restored
+
+    async def start_job(self, job_id: str, generator, progress_callback: Callable) -> Optional[int]:
+        """
+        Queue a job in its priority lane; it starts as soon as a slot is free.
+
+        Returns the job's queue position (None if it is running). A job that is
+        already queued or running (a coalesced request) is left as is. Raises
+        job_scheduler.QueueFull, after discarding the job, when its lane is full.
+        """
         async with self._lock:
             job = self.jobs.get(job_id)
             if not job:
                 raise ValueError(f"Job {job_id} not found")
+            if self.is_active(job_id):
+                return self.scheduler.position(job_id)
+            try:
+                return self._enqueue(job, generator, progress_callback)
+            except Exception:
+                self._release_fingerprint(job)
+                del self.jobs[job_id]
+                raise
+
+    async def resume_job(self, job_id: str, generator, progress_callback: Callable) -> Optional[int]:
+        """
+        Re-queue a failed or cancelled job to run from its last checkpointed step.
+
+        Returns the queue position like start_job; raises ValueError when the job
+        cannot be resumed and QueueFull when its lane is full.
+        """
+        async with self._lock:
+            job = self.get_job(job_id)
+            if not job or job.status not in (JobStatus.FAILED, JobStatus.CANCELLED):
+                raise ValueError(f"Job {job_id} is not failed or cancelled")
+            # A cancelled job's worker thread keeps running until its current step ends; it still owns the checkpoint
+            if (job.task and not job.task.done()) or job_context_registered(job_id):
+                raise ValueError(f"Job {job_id} is still stopping")
+
+            return self._enqueue(job, generator, progress_callback, resume=True)
+
+    def _enqueue(self, job: Job, generator, progress_callback: Callable, resume: bool = False) -> Optional[int]:
+        def start() -> asyncio.Task:
+            job.status = JobStatus.RUNNING
+            job.started_at = datetime.utcnow()
+            job.task = asyncio.create_task(self._run_job(job, generator, progress_callback, resume=resume))
+            self._persist(job)
+            return job.task
+
+        previous = (job.status, job.error, job.completed_at, job.batch_id)
+        # A resumed batch-mode job runs on its own, through the scheduler
+        job.status, job.error, job.completed_at, job.batch_id = JobStatus.QUEUED, None, None, None
+        try:
+            position = self.scheduler.submit(job.job_id, start, lane=job.priority)
+        except Exception:
+            job.status, job.error, job.completed_at, job.batch_id = previous
+            raise
+        if job.request_fingerprint:
+            self._inflight.setdefault(job.request_fingerprint, job.job_id)
+        if resume:
+            from backend.routers.websocket import manager as ws_manager
+
+            # The job's event log was closed by its error/cancel message; it carries on through the resumed run
+            ws_manager.reopen(job.job_id)
+        if job.status == JobStatus.QUEUED:
+            self._persist(job)
+        return position
+
+    def queue_status(self, job_id: str) -> Optional[Tuple[int, float]]:
+        """(queue position, estimated seconds until start) while a job waits, else None."""
+        return self.scheduler.positions().get(job_id)
+
+    def _queue_changed(self):
+        # Coalesce bursts of queue changes into one round of WebSocket updates
+        if self._queue_notifier is None or self._queue_notifier.done():
+            self._queue_notifier = asyncio.get_running_loop().create_task(self._notify_queue_positions())
 
+    async def _notify_queue_positions(self):
+        await asyncio.sleep(0)
+        for job_id in self.scheduler.positions():
+            await self.send_queue_position(job_id)
+
+    async def send_queue_position(self, job_id: str):
+        """Tell a waiting job's WebSocket client its queue position and ETA."""
+        entry = self.queue_status(job_id)
+        if entry is None:
+            return
+        position, eta = entry
+        try:
+            from backend.routers.websocket import manager as ws_manager
+            from backend.models.responses import ProgressUpdate
+
+            job = self.jobs[job_id]
+            update = ProgressUpdate(
+                job_id=job_id,
+                step="queued",
+                step_index=0,
+                total_steps=8 if job.use_hookhouse else 9,
+                message=f"Queued at position {position}, starting in about {round(eta)}s",
+                percentage=0.0,
+                timestamp=datetime.utcnow(),
+                queue_position=position,
+                eta_seconds=eta,
+            )
+            await ws_manager.send_progress(job_id, update)
+        except Exception:
+            pass  # Position is still available from the status endpoint
+
+    async def start_batch(self, job_ids: List[str], generator, progress_callbacks: Dict[str, Callable]) -> BatchCoordinator:
+        """
+        Start several jobs in batch mode.
+
+        The jobs share one BatchCoordinator, so their LLM calls are submitted stage by stage as provider batches.
+        Raises job_scheduler.QueueFull, after discarding the jobs, when starting them would put more than
+        BATCH_MAX_JOBS batch-mode jobs in flight.
+        """
+        async with self._lock:
+            if len(self._batch_running) + len(job_ids) > self.batch_max_jobs:
+                for job_id in job_ids:
+                    self._release_fingerprint(self.jobs.pop(job_id))
+                raise QueueFull(BATCH, max(1, math.ceil(self.scheduler.avg_duration)))
+            jobs = [self.jobs[job_id] for job_id in job_ids]
+            # Persisted with every job so restore() can bring the batch back as a batch
+            batch_id = uuid.uuid4().hex
+            for job in jobs:
+                job.batch_id = batch_id
+            return self._launch_batch(jobs, generator, progress_callbacks)
+
+    def _launch_batch(
+        self, jobs: List[Job], generator, progress_callbacks: Dict[str, Callable], resume: bool = False
+    ) -> BatchCoordinator:
+        coordinator = BatchCoordinator()
+        # Register every job before any starts so the first batch waits for all of them
+        for job in jobs:
+            coordinator.register_job(job.job_id)
+        tasks = []
+        for job in jobs:
             job.status = JobStatus.RUNNING
             job.started_at = datetime.utcnow()
+            job.task = asyncio.create_task(
+                self._run_job(job, generator, progress_callbacks[job.job_id], batch_coordinator=coordinator, resume=resume)
+            )
+            self._persist(job)
+            self._batch_running.add(job.job_id)
+            job.task.add_done_callback(lambda _task, job_id=job.job_id: self._batch_running.discard(job_id))
+            tasks.append(job.task)
 
-            # Create task
-            job.task = asyncio.create_task(self._run_job(job, generator, progress_callback))
+        async def _close_when_done():
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await asyncio.get_running_loop().run_in_executor(None, coordinator.close)
 
-    async def _run_job(self, job: Job, generator, progress_callback: Callable):
+        asyncio.create_task(_close_when_done())
+        return coordinator
+
+    async def _run_job(
+        self,
+        job: Job,
+        generator,
+        progress_callback: Callable,
+        batch_coordinator: Optional[BatchCoordinator] = None,
+        resume: bool = False,
+    ):
         """Execute the actual generation."""
+        from backend.routers.websocket import manager as ws_manager
+
+        def token_callback(step: str, text: str):
+            ws_manager.queue_token(job.job_id, step, text)
+
+        interrupted = False
         try:
             result = await generator.generate_async(
                 user_input=job.user_input,
@@ -145,6 +509,7 @@ class JobManager:
                 song_name=job.song_name,
                 persona=job.persona,
                 progress_callback=progress_callback,
+                token_callback=token_callback,
                 # HookHouse parameters
                 use_hookhouse=job.use_hookhouse,
                 blend=job.blend,
@@ -159,12 +524,24 @@ class JobManager:
                 key=job.key,
                 groove_texture=job.groove_texture,
                 choir_call_response=job.choir_call_response,
+                batch_coordinator=batch_coordinator,
+                job_id=job.job_id,
+                resume=resume,
+                bypass_cache=job.bypass_cache,
             )
-            job.result = result
+            # Offload the result to the job store; Job.result reads it back when asked
+            await asyncio.get_running_loop().run_in_executor(self._store_writer, self.store.save_result, job.job_id, result)
             job.status = JobStatus.COMPLETED
             # Send completion message through WebSocket
             await self._notify_completion(job.job_id, result.get("filename", ""))
         except asyncio.CancelledError:
+            if batch_coordinator is not None:
+                # The worker thread keeps running; stop counting it so the rest of the batch isn't held back
+                batch_coordinator.finish_job(job.job_id)
+            if self._shutting_down:
+                # Stays "running" in the job store, so restore() resumes it on the next startup
+                interrupted = True
+                return
             job.status = JobStatus.CANCELLED
             job.error = "Job cancelled by user"
             # Send error through WebSocket
@@ -176,6 +553,12 @@ class JobManager:
             await self._notify_error(job.job_id, job.error)
         finally:
             job.completed_at = datetime.utcnow()
+            job.task = None
+            job.progress_callbacks.clear()
+            if not interrupted:
+                self._release_fingerprint(job)
+                self._persist(job)
+                self._evict()
 
     async def _notify_completion(self, job_id: str, filename: str):
         """Send completion notification through WebSocket"""
@@ -206,16 +589,33 @@ class JobManager:
             pass  # If WebSocket fails, error is still stored in job.error
 
     async def cancel_job(self, job_id: str) -> bool:
-        """Cancel a running job."""
+        """Cancel a queued or running job."""
         job = self.jobs.get(job_id)
-        if not job or not job.task:
+        if not job:
+            return False
+        if self.scheduler.remove(job_id):
+            job.status = JobStatus.CANCELLED
+            job.error = "Job cancelled by user"
+            job.completed_at = datetime.utcnow()
+            self._release_fingerprint(job)
+            self._persist(job)
+            await self._notify_error(job_id, job.error)
+            return True
+        if not job.task:
             return False
 
+        # Stop the worker thread at its next check (node boundary, LLM call, stream chunk), then the awaiting task
+        cancel(job_id)
         job.task.cancel()
         return True
 
     async def cleanup(self):
-        """Cancel all running jobs on shutdown."""
-        for job in self.jobs.values():
+        """Stop all queued and running jobs on shutdown; the job store keeps them for restore()."""
+        self._shutting_down = True
+        for job in list(self.jobs.values()):
+            self.scheduler.remove(job.job_id)
             if job.task and not job.task.done():
+                cancel(job.job_id)
                 job.task.cancel()
+        # Let job store writes already handed to the writer land before the process exits
+        await asyncio.get_running_loop().run_in_executor(self._store_writer, lambda: None)
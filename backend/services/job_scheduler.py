@@ -0,0 +1,185 @@
+"""
+Admission control and dispatch order for generation jobs.
+
+JobManager used to create an asyncio task for every request straight away. The
+tasks then queued invisibly inside SongGenerator's thread pool, with no limit,
+no priority and no way to tell a client where it stood. JobScheduler holds jobs
+until one of the MAX_CONCURRENT_JOBS slots is free:
+
+- two lanes: "interactive" (the default for UI requests) and "batch" (bulk work,
+  GenerateSongRequest.priority="batch")
+- interactive jobs go first, but after JOB_QUEUE_INTERACTIVE_BURST interactive
+  dispatches in a row a waiting batch job is started, so bulk work never starves
+- at most JOB_QUEUE_MAX jobs wait (the batch lane alone at most
+  JOB_QUEUE_BATCH_MAX, keeping room for interactive users); beyond that submit()
+  raises QueueFull with a Retry-After estimate and the route answers 429
+- queue position and ETA come from replaying the dispatch order against the
+  running jobs, using a moving average of recent job durations
+
+The scheduler lives on the event loop and is not thread-safe.
+"""
+
+import asyncio
+import heapq
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+LANES = (INTERACTIVE, BATCH)
+
+# Weight of the newest job in the moving average of job durations
+_DURATION_SMOOTHING = 0.2
+
+
+class QueueFull(Exception):
+    """The job's lane is full; retry after ``retry_after`` seconds."""
+
+    def __init__(self, lane: str, retry_after: int):
+        super().__init__(f"The {lane} job queue is full; retry in {retry_after}s")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class JobScheduler:
+    """Bounded two-lane queue in front of a fixed number of job slots."""
+
+    def __init__(
+        self,
+        slots: Optional[int] = None,
+        max_queued: Optional[int] = None,
+        max_batch_queued: Optional[int] = None,
+        interactive_burst: Optional[int] = None,
+    ):
+        self.slots = max(1, slots or int(os.getenv("MAX_CONCURRENT_JOBS", "3")))
+        self.max_queued = max_queued if max_queued is not None else int(os.getenv("JOB_QUEUE_MAX", "50"))
+        self.max_batch_queued = (
+            max_batch_queued if max_batch_queued is not None else int(os.getenv("JOB_QUEUE_BATCH_MAX", "40"))
+        )
+        self.interactive_burst = max(
+            1, interactive_burst if interactive_burst is not None else int(os.getenv("JOB_QUEUE_INTERACTIVE_BURST", "3"))
+        )
+        self.avg_duration = float(os.getenv("JOB_QUEUE_INITIAL_ETA_SECONDS", "120"))
+        # Called after every queue change (submit, dispatch, removal) so waiting clients can be told their new position
+        self.on_change: Optional[Callable[[], None]] = None
+        self._lanes: Dict[str, Deque[Tuple[str, Callable[[], asyncio.Task]]]] = {lane: deque() for lane in LANES}
+        self._running: Dict[str, float] = {}  # job_id -> monotonic dispatch time
+        self._streak = 0  # interactive jobs dispatched since the last batch job
+        self.dispatched = 0
+        self.rejected = 0
+
+    def submit(self, job_id: str, start: Callable[[], asyncio.Task], lane: str = INTERACTIVE) -> Optional[int]:
+        """
+        Queue a job; start() is called once a slot is free and must return the job's task.
+
+        Returns the job's 1-based queue position, or None when it started immediately.
+        Raises QueueFull when the lane has no room.
+        """
+        if lane not in self._lanes:
+            raise ValueError(f"Unknown job lane: {lane}")
+        queued = self.queued_count()
+        if queued >= self.max_queued or (lane == BATCH and len(self._lanes[BATCH]) >= self.max_batch_queued):
+            self.rejected += 1
+            raise QueueFull(lane, self.retry_after())
+        self._lanes[lane].append((job_id, start))
+        self._pump()
+        self._changed()
+        return self.position(job_id)
+
+    def remove(self, job_id: str) -> bool:
+        """Drop a job that is still waiting; False if it is not queued."""
+        for lane in self._lanes.values():
+            for entry in lane:
+                if entry[0] == job_id:
+                    lane.remove(entry)
+                    self._changed()
+                    return True
+        return False
+
+    def is_queued(self, job_id: str) -> bool:
+        return any(entry[0] == job_id for lane in self._lanes.values() for entry in lane)
+
+    def queued_count(self) -> int:
+        return sum(len(lane) for lane in self._lanes.values())
+
+    def _next_lane(self, lanes: Dict[str, Deque], streak: int) -> Tuple[str, int]:
+        """The lane to dispatch from next and the resulting interactive streak."""
+        if lanes[INTERACTIVE] and (not lanes[BATCH] or streak < self.interactive_burst):
+            return INTERACTIVE, (streak + 1 if lanes[BATCH] else 0)
+        return BATCH, 0
+
+    def _pump(self) -> None:
+        while len(self._running) < self.slots and self.queued_count():
+            lane, self._streak = self._next_lane(self._lanes, self._streak)
+            job_id, start = self._lanes[lane].popleft()
+            self._running[job_id] = time.monotonic()
+            self.dispatched += 1
+            task = start()
+            task.add_done_callback(lambda task, job_id=job_id: self._finished(job_id, task))
+
+    def _finished(self, job_id: str, task: asyncio.Task) -> None:
+        started = self._running.pop(job_id, None)
+        if started is not None and not task.cancelled():
+            duration = time.monotonic() - started
+            self.avg_duration += _DURATION_SMOOTHING * (duration - self.avg_duration)
+        self._pump()
+        self._changed()
+
+    def _changed(self) -> None:
+        if self.on_change is not None:
+            self.on_change()
+
+    def dispatch_order(self) -> List[str]:
+        """Queued job_ids in the order they will start if nothing else arrives."""
+        lanes = {lane: deque(entry[0] for entry in entries) for lane, entries in self._lanes.items()}
+        streak = self._streak
+        order = []
+        while lanes[INTERACTIVE] or lanes[BATCH]:
+            lane, streak = self._next_lane(lanes, streak)
+            order.append(lanes[lane].popleft())
+        return order
+
+    def _start_times(self) -> List[float]:
+        """Estimated seconds until each queued job starts, in dispatch order."""
+        now = time.monotonic()
+        free_at = [max(0.0, self.avg_duration - (now - started)) for started in self._running.values()]
+        free_at += [0.0] * (self.slots - len(free_at))
+        heapq.heapify(free_at)
+        starts = []
+        for _ in range(self.queued_count()):
+            start = heapq.heappop(free_at)
+            starts.append(start)
+            heapq.heappush(free_at, start + self.avg_duration)
+        return starts
+
+    def positions(self) -> Dict[str, Tuple[int, float]]:
+        """job_id -> (1-based queue position, estimated seconds until it starts) for every queued job."""
+        return {
+            job_id: (index + 1, round(eta, 1))
+            for index, (job_id, eta) in enumerate(zip(self.dispatch_order(), self._start_times()))
+        }
+
+    def position(self, job_id: str) -> Optional[int]:
+        entry = self.positions().get(job_id)
+        return entry[0] if entry else None
+
+    def retry_after(self) -> int:
+        """Seconds until the queue has likely drained by one job."""
+        starts = self._start_times()
+        return max(1, math.ceil(starts[0] if starts else 0))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "slots": self.slots,
+            "running": len(self._running),
+            "queued": {lane: len(entries) for lane, entries in self._lanes.items()},
+            "max_queued": self.max_queued,
+            "max_batch_queued": self.max_batch_queued,
+            "interactive_burst": self.interactive_burst,
+            "avg_job_seconds": round(self.avg_duration, 1),
+            "dispatched": self.dispatched,
+            "rejected": self.rejected,
+        }
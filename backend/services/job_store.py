@@ -0,0 +1,180 @@
+"""
+Durable record of generation jobs.
+
+JobManager keeps only a small hot set of Job objects in memory (every queued or
+running job plus the JOB_HOT_SET_SIZE most recently used finished ones). Every
+job's request, status and timestamps are written here as they change, and its
+result (lyrics, narrative, metadata) is stored once on completion and read back
+only when a client asks for it. Job history therefore survives restarts and
+memory stays flat no matter how many jobs the backend has served.
+
+Finished jobs are pruned after JOB_RETENTION_HOURS, and beyond the newest
+JOB_STORE_MAX_JOBS. Jobs that were queued or running when the backend stopped
+are picked up again by JobManager.restore() on startup; batch-mode jobs keep
+their batch_id so they come back as one batch.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Statuses whose jobs will not change again (kept in sync with JobStatus)
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+
+class JobStore:
+    """SQLite-backed job table with lazily loaded results and TTL/count eviction."""
+
+    # Prune every N finished jobs rather than on every write
+    PRUNE_EVERY = 50
+
+    def __init__(self, path: str, retention_seconds: float, max_jobs: int):
+        self.path = path
+        self.retention_seconds = retention_seconds
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._finished_since_prune = 0
+        self.result_loads = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " priority TEXT NOT NULL,"
+            " batch_id TEXT,"
+            " request TEXT NOT NULL,"
+            " created_at TEXT NOT NULL,"
+            " started_at TEXT,"
+            " completed_at TEXT,"
+            " error TEXT,"
+            " result TEXT,"
+            " updated_at REAL NOT NULL)"
+        )
+        # Stores created before batch jobs were persisted lack the column
+        if "batch_id" not in {column[1] for column in self._conn.execute("PRAGMA table_info(jobs)")}:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN batch_id TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_updated ON jobs (status, updated_at)")
+        self._conn.commit()
+
+    def save(self, record: Dict[str, Any]) -> None:
+        """Insert or update a job's request and status fields (its stored result is left alone)."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, status, priority, batch_id, request, created_at, started_at, completed_at, error, updated_at)"
+                " VALUES (:job_id, :status, :priority, :batch_id, :request, :created_at, :started_at, :completed_at, :error,"
+                " :updated_at)"
+                " ON CONFLICT(job_id) DO UPDATE SET status = excluded.status, priority = excluded.priority,"
+                " batch_id = excluded.batch_id,"
+                " started_at = excluded.started_at, completed_at = excluded.completed_at, error = excluded.error,"
+                " updated_at = excluded.updated_at",
+                {**record, "request": json.dumps(record["request"]), "updated_at": time.time()},
+            )
+            self._conn.commit()
+            if record["status"] in FINISHED_STATUSES:
+                self._finished_since_prune += 1
+                if self._finished_since_prune >= self.PRUNE_EVERY:
+                    self._prune_locked(time.time())
+
+    def save_result(self, job_id: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET result = ? WHERE job_id = ?", (json.dumps(result, default=str), job_id))
+            self._conn.commit()
+
+    def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """A job's record without its result, or None if it is unknown or was pruned."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT job_id, status, priority, batch_id, request, created_at, started_at, completed_at, error FROM jobs"
+                " WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+        return self._record(row) if row else None
+
+    def load_result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            self.result_loads += 1
+        return json.loads(row[0]) if row and row[0] else None
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        """Records of jobs that were queued or running, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id, status, priority, batch_id, request, created_at, started_at, completed_at, error FROM jobs"
+                f" WHERE status NOT IN ({', '.join('?' for _ in FINISHED_STATUSES)}) ORDER BY created_at",
+                FINISHED_STATUSES,
+            ).fetchall()
+        return [self._record(row) for row in rows]
+
+    @staticmethod
+    def _record(row) -> Dict[str, Any]:
+        job_id, status, priority, batch_id, request, created_at, started_at, completed_at, error = row
+        return {
+            "job_id": job_id,
+            "status": status,
+            "priority": priority,
+            "batch_id": batch_id,
+            "request": json.loads(request),
+            "created_at": created_at,
+            "started_at": started_at,
+            "completed_at": completed_at,
+            "error": error,
+        }
+
+    def prune(self) -> None:
+        with self._lock:
+            self._prune_locked(time.time())
+
+    def _prune_locked(self, now: float) -> None:
+        self._finished_since_prune = 0
+        finished = f"status IN ({', '.join('?' for _ in FINISHED_STATUSES)})"
+        if self.retention_seconds:
+            cursor = self._conn.execute(
+                f"DELETE FROM jobs WHERE {finished} AND updated_at < ?", (*FINISHED_STATUSES, now - self.retention_seconds)
+            )
+            self.evictions += max(cursor.rowcount, 0)
+        if self.max_jobs:
+            # Keep only the newest max_jobs finished jobs
+            cursor = self._conn.execute(
+                f"DELETE FROM jobs WHERE job_id IN (SELECT job_id FROM jobs WHERE {finished}"
+                " ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (*FINISHED_STATUSES, self.max_jobs),
+            )
+            self.evictions += max(cursor.rowcount, 0)
+        self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            result_bytes = self._conn.execute("SELECT COALESCE(SUM(LENGTH(result)), 0) FROM jobs").fetchone()[0]
+        return {
+            "path": self.path,
+            "jobs": counts,
+            "result_bytes": result_bytes,
+            "result_loads": self.result_loads,
+            "evictions": self.evictions,
+            "retention_seconds": self.retention_seconds,
+            "max_jobs": self.max_jobs,
+        }
+
+
+def open_job_store() -> JobStore:
+    """The job store configured by JOB_STORE_PATH, JOB_RETENTION_HOURS and JOB_STORE_MAX_JOBS."""
+    return JobStore(
+        path=os.getenv("JOB_STORE_PATH", os.path.join(".cache", "jobs.sqlite3")),
+        retention_seconds=float(os.getenv("JOB_RETENTION_HOURS", "168")) * 3600,
+        max_jobs=int(os.getenv("JOB_STORE_MAX_JOBS", "1000")),
+    )
@@ -7,6 +7,8 @@ import os
 # Add parent directory to path to import song_master
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
+from batch_mode import BatchCoordinator, batch_job
+from cancellation import get_cancel_token, release_cancel_token
 from song_master import generate_song
 
 
@@ -15,6 +17,10 @@ class SongGenerator:
 
     def __init__(self, max_workers: int = 3):
         self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        # Batch jobs spend almost all their time parked on a provider batch, so they get their own wide pool
+        self.batch_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("BATCH_MAX_JOBS", "500")), thread_name_prefix="batch-job"
+        )
 
     async def generate_async(
         self,
@@ -23,6 +29,7 @@ class SongGenerator:
         song_name: Optional[str],
         persona: Optional[str],
         progress_callback: Callable[[str, int, str], None],
+        token_callback: Optional[Callable[[str, str], None]] = None,
         # HookHouse parameters
         use_hookhouse: bool = True,
         blend: Optional[List[str]] = None,
@@ -37,6 +44,10 @@ class SongGenerator:
         key: Optional[str] = None,
         groove_texture: Optional[str] = None,
         choir_call_response: bool = False,
+        batch_coordinator: Optional[BatchCoordinator] = None,
+        job_id: Optional[str] = None,
+        resume: bool = False,
+        bypass_cache: bool = False,
     ) -> dict:
         """
         Run generate_song() in a thread pool with progress callbacks.
@@ -47,6 +58,7 @@ class SongGenerator:
             song_name: Optional song title
             persona: Optional persona
             progress_callback: Function called with (step_name, step_index, message)
+            token_callback: Optional function called on the event loop with (step_name, text) for streamed tokens
             use_hookhouse: Use HookHouse workflow (default: True)
             blend: Musical blend (2-3 styles)
             mood_style: Mood style (dark or clean)
@@ -60,6 +72,10 @@ class SongGenerator:
             key: Musical key
             groove_texture: Groove/texture description
             choir_call_response: Include choir/call-response
+            batch_coordinator: Run in batch mode, submitting LLM calls through this coordinator
+            job_id: Job identifier (keys the job's context side store and checkpoints; registered with batch_coordinator in batch mode)
+            resume: Continue job_id from its last checkpointed step instead of starting over
+            bypass_cache: Don't serve any LLM call from the response cache (e.g. regenerating a song)
 
         Returns:
             dict with keys: filename, lyrics, metadata, album_art, and HookHouse fields if enabled
@@ -75,6 +91,10 @@ class SongGenerator:
             )
             # Don't wait for completion to avoid blocking the generation
 
+        # Token callbacks are plain functions; hop onto the event loop without waiting
+        def sync_token_callback(step: str, text: str):
+            loop.call_soon_threadsafe(token_callback, step, text)
+
         # Wrap the synchronous function
         def _run_generation():
             return generate_song(
@@ -83,6 +103,7 @@ class SongGenerator:
                 song_name=song_name,
                 persona=persona,
                 progress_callback=sync_progress_callback,
+                token_callback=sync_token_callback if token_callback else None,
                 use_hookhouse=use_hookhouse,
                 blend=blend,
                 mood_style=mood_style,
@@ -96,12 +117,33 @@ class SongGenerator:
                 key=key,
                 groove_texture=groove_texture,
                 choir_call_response=choir_call_response,
+                job_id=job_id,
+                resume=resume,
+                bypass_cache=bypass_cache,
             )
 
-        # Run in executor to avoid blocking event loop
-        result = await loop.run_in_executor(self.executor, _run_generation)
-        return result
+        # Create the job's cancellation token before the thread is queued, so a cancel that lands first still counts.
+        # generate_song() releases it when the worker finishes; only a run that never started is released here
+        if job_id:
+            get_cancel_token(job_id)
+
+        def _release_if_never_started(future):
+            if job_id and future.cancelled():
+                release_cancel_token(job_id)
+
+        if batch_coordinator is not None:
+            def _run_batched():
+                with batch_job(batch_coordinator, job_id):
+                    return _run_generation()
+
+            future = self.batch_executor.submit(_run_batched)
+        else:
+            # Run in executor to avoid blocking event loop
+            future = self.executor.submit(_run_generation)
+        future.add_done_callback(_release_if_never_started)
+        return await asyncio.wrap_future(future, loop=loop)
 
     def shutdown(self):
         """Shutdown the thread pool."""
         self.executor.shutdown(wait=True)
+        self.batch_executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,420 @@
+"""
+Batch-API execution for bulk song generation.
+
+Many song graphs run concurrently (one thread each) under a shared BatchCoordinator.
+Inside a batch job, get_llm() hands out clients whose invoke() parks the prompt with
+the coordinator instead of calling the provider. Once every running job is waiting
+on the LLM, the coordinator submits all parked prompts as one provider batch per
+model (all narratives, then all drafts, then all reviews, ...), polls until the
+batch finishes and resumes each job's graph with its response.
+
+Backends:
+- OpenAIBatchBackend: OpenAI /v1/files + /v1/batches (also tools/batch_server.py, the
+  offline stand-in, via LLM_BATCH_BASE_URL)
+- AnthropicBatchBackend: Anthropic Message Batches
+- LocalBatchBackend: runs the batch through the normal clients (providers without a batch API)
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from dotenv import load_dotenv
+
+from cancellation import current_token
+
+load_dotenv()
+
+BatchResults = Dict[str, Union[str, Exception]]
+
+# How often a job thread parked in BatchCoordinator.submit() looks at its cancellation token
+_POLL_SECONDS = 0.25
+
+
+@dataclass
+class BatchRequest:
+    custom_id: str
+    job_id: str
+    snapshot: Any  # ai_functions.ProviderSnapshot
+    prompt: str
+    future: Future = field(default_factory=Future)
+    submitted_at: float = field(default_factory=time.monotonic)
+
+
+def _bare_model(model: str) -> str:
+    """Strip the LiteLLM provider prefix (anthropic/..., openai/...) for native batch APIs."""
+    return model.split("/", 1)[1] if model.startswith(("anthropic/", "openai/")) else model
+
+
+class LocalBatchBackend:
+    """Offline stand-in: fulfils a batch through the regular (rate-limited, cached) clients."""
+
+    name = "local"
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or int(os.getenv("LLM_BATCH_LOCAL_WORKERS", "8"))
+
+    def run(self, snapshot, requests: List[Tuple[str, str]]) -> BatchResults:
+        from ai_functions import get_llm
+
+        client = get_llm(snapshot.use_local, snapshot=snapshot)
+
+        def _call(item: Tuple[str, str]) -> Union[str, Exception]:
+            try:
+                return client.invoke(item[1])
+            except Exception as exc:
+                return exc
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(requests)))) as pool:
+            return dict(zip((cid for cid, _ in requests), pool.map(_call, requests)))
+
+
+class OpenAIBatchBackend:
+    """OpenAI Batch API (JSONL upload, /v1/batches, poll, download output file)."""
+
+    name = "openai"
+    TERMINAL = ("completed", "failed", "expired", "cancelled")
+
+    def __init__(self, base_url: Optional[str], api_key: str, poll_seconds: float):
+        self.base_url = base_url or "https://api.openai.com/v1"
+        self.api_key = api_key
+        self.poll_seconds = poll_seconds
+
+    def run(self, snapshot, requests: List[Tuple[str, str]]) -> BatchResults:
+        from http_pool import get_openai_client
+
+        client = get_openai_client(self.base_url, self.api_key)
+        lines = []
+        for custom_id, prompt in requests:
+            body = {
+                "model": _bare_model(snapshot.model),
+                "messages": [{"role": "user", "content": str(prompt)}],
+                "max_tokens": snapshot.max_tokens,
+                "temperature": snapshot.temperature,
+            }
+            if snapshot.stop:
+                body["stop"] = list(snapshot.stop)
+            if snapshot.json_mode:
+                body["response_format"] = {"type": "json_object"}
+            lines.append(json.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body}))
+
+        upload = client.files.create(file=("batch.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch")
+        batch = client.batches.create(input_file_id=upload.id, endpoint="/v1/chat/completions", completion_window="24h")
+        while batch.status not in self.TERMINAL:
+            time.sleep(self.poll_seconds)
+            batch = client.batches.retrieve(batch.id)
+
+        results: BatchResults = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                response = record.get("response") or {}
+                body = response.get("body") or {}
+                if record.get("error") or response.get("status_code", 200) >= 400:
+                    results[record["custom_id"]] = RuntimeError(f"Batch request failed: {record.get('error') or body}")
+                else:
+                    results[record["custom_id"]] = body["choices"][0]["message"]["content"]
+        if batch.status != "completed":
+            for custom_id, _ in requests:
+                results.setdefault(custom_id, RuntimeError(f"Batch {batch.id} ended with status {batch.status}"))
+        return results
+
+
+class AnthropicBatchBackend:
+    """Anthropic Message Batches API."""
+
+    name = "anthropic"
+
+    def __init__(self, base_url: Optional[str], api_key: str, poll_seconds: float):
+        self.base_url = (base_url or "https://api.anthropic.com").rstrip("/")
+        self.api_key = api_key
+        self.poll_seconds = poll_seconds
+
+    def _headers(self) -> Dict[str, str]:
+        return {"x-api-key": self.api_key, "anthropic-version": "2023-06-01", "content-type": "application/json"}
+
+    def run(self, snapshot, requests: List[Tuple[str, str]]) -> BatchResults:
+        from http_pool import get_http_client
+
+        http = get_http_client()
+        payload = []
+        for custom_id, prompt in requests:
+            params = {
+                "model": _bare_model(snapshot.model),
+                "max_tokens": snapshot.max_tokens,
+                "temperature": snapshot.temperature,
+                "messages": [{"role": "user", "content": str(prompt)}],
+            }
+            if snapshot.stop:
+                params["stop_sequences"] = list(snapshot.stop)
+            payload.append({"custom_id": custom_id, "params": params})
+
+        response = http.post(f"{self.base_url}/v1/messages/batches", headers=self._headers(), json={"requests": payload})
+        response.raise_for_status()
+        batch = response.json()
+        while batch.get("processing_status") != "ended":
+            time.sleep(self.poll_seconds)
+            response = http.get(f"{self.base_url}/v1/messages/batches/{batch['id']}", headers=self._headers())
+            response.raise_for_status()
+            batch = response.json()
+
+        results: BatchResults = {}
+        response = http.get(batch["results_url"], headers=self._headers())
+        response.raise_for_status()
+        for line in response.text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            result = record.get("result") or {}
+            if result.get("type") == "succeeded":
+                content = result["message"].get("content") or []
+                results[record["custom_id"]] = "".join(block.get("text", "") for block in content if block.get("type") == "text")
+            else:
+                results[record["custom_id"]] = RuntimeError(f"Batch request {result.get('type')}: {result.get('error')}")
+        return results
+
+
+def get_batch_backend(snapshot):
+    """Pick a batch backend for a provider snapshot (LLM_BATCH_BACKEND=auto|openai|anthropic|local)."""
+    choice = os.getenv("LLM_BATCH_BACKEND", "auto").lower()
+    poll_seconds = float(os.getenv("LLM_BATCH_POLL_SECONDS", "30"))
+    base_url = os.getenv("LLM_BATCH_BASE_URL") or None
+    api_key = os.getenv("LLM_BATCH_API_KEY") or snapshot.api_key or "batch"
+
+    if choice == "auto":
+        if snapshot.provider == "anthropic":
+            choice = "anthropic"
+        elif snapshot.provider in ("openai", "openai-langchain") or base_url:
+            choice = "openai"
+        else:
+            choice = "local"
+
+    if choice == "openai":
+        return OpenAIBatchBackend(base_url, api_key, poll_seconds)
+    if choice == "anthropic":
+        return AnthropicBatchBackend(base_url, api_key, poll_seconds)
+    if choice == "local":
+        return LocalBatchBackend()
+    raise ValueError(f"Unknown LLM_BATCH_BACKEND: {choice}")
+
+
+class BatchCoordinator:
+    """
+    Collects LLM calls from many concurrently running song jobs and flushes them as provider batches.
+
+    A flush happens when every registered job is waiting on at least one LLM call and no new
+    call has arrived for settle_seconds (so reviewer fan-outs land in the same batch), or when
+    the oldest parked call has waited max_wait_seconds (a job is busy with non-LLM work).
+    """
+
+    def __init__(
+        self,
+        backend_factory: Callable[[Any], Any] = get_batch_backend,
+        settle_seconds: Optional[float] = None,
+        max_wait_seconds: Optional[float] = None,
+    ):
+        self.backend_factory = backend_factory
+        self.settle_seconds = settle_seconds if settle_seconds is not None else float(os.getenv("LLM_BATCH_SETTLE_SECONDS", "1"))
+        self.max_wait_seconds = max_wait_seconds if max_wait_seconds is not None else float(os.getenv("LLM_BATCH_MAX_WAIT_SECONDS", "60"))
+        self._cond = threading.Condition()
+        self._outstanding: Dict[str, int] = {}  # job_id -> calls parked or in flight
+        self._queue: List[BatchRequest] = []
+        self._last_submit = 0.0
+        self._ids = itertools.count(1)
+        self._closed = False
+        self.batches_submitted = 0
+        self.requests_submitted = 0
+        self._flusher = threading.Thread(target=self._run, name="batch-coordinator", daemon=True)
+        self._flusher.start()
+
+    # Job lifecycle -----------------------------------------------------------
+
+    def register_job(self, job_id: str) -> None:
+        with self._cond:
+            self._outstanding.setdefault(job_id, 0)
+            self._cond.notify_all()
+
+    def finish_job(self, job_id: str) -> None:
+        with self._cond:
+            self._outstanding.pop(job_id, None)
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._flusher.join(timeout=5)
+
+    # Calls from job threads ----------------------------------------------------
+
+    def submit(self, job_id: str, snapshot, prompt: str) -> str:
+        """
+        Park a prompt for the next batch and block until its response arrives.
+
+        If the calling job is cancelled while waiting, its prompt is taken out of the
+        queue (when not yet flushed) and JobCancelled is raised; a prompt already sent
+        to the provider is abandoned and its result dropped.
+        """
+        token = current_token()
+        request = BatchRequest(f"{job_id[:12]}-{next(self._ids)}", job_id, snapshot, prompt)
+        with self._cond:
+            self._outstanding[job_id] = self._outstanding.get(job_id, 0) + 1
+            self._queue.append(request)
+            self._last_submit = time.monotonic()
+            self._cond.notify_all()
+        try:
+            while True:
+                try:
+                    return request.future.result(timeout=_POLL_SECONDS if token is not None else None)
+                except FutureTimeout:
+                    if token.cancelled:
+                        with self._cond:
+                            if request in self._queue:
+                                self._queue.remove(request)
+                        token.raise_if_cancelled()
+        finally:
+            with self._cond:
+                if job_id in self._outstanding:
+                    self._outstanding[job_id] -= 1
+                self._cond.notify_all()
+
+    # Flushing -------------------------------------------------------------------
+
+    def _ready_locked(self, now: float) -> bool:
+        if not self._queue:
+            return False
+        if self._closed or now - self._queue[0].submitted_at >= self.max_wait_seconds:
+            return True
+        all_waiting = all(count > 0 for count in self._outstanding.values())
+        return all_waiting and now - self._last_submit >= self.settle_seconds
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._ready_locked(time.monotonic()):
+                    if self._closed and not self._queue:
+                        return
+                    self._cond.wait(timeout=min(self.settle_seconds, 1.0) or 0.1)
+                pending, self._queue = self._queue, []
+            self._flush(pending)
+
+    def _flush(self, pending: List[BatchRequest]) -> None:
+        groups: Dict[Tuple, List[BatchRequest]] = {}
+        for request in pending:
+            groups.setdefault(request.snapshot.registry_key, []).append(request)
+
+        def _run_group(group: List[BatchRequest]) -> None:
+            snapshot = group[0].snapshot
+            try:
+                results = self.backend_factory(snapshot).run(snapshot, [(r.custom_id, r.prompt) for r in group])
+            except Exception as exc:
+                results = {r.custom_id: exc for r in group}
+            for request in group:
+                outcome = results.get(request.custom_id, RuntimeError(f"No batch result for {request.custom_id}"))
+                if isinstance(outcome, Exception):
+                    request.future.set_exception(outcome)
+                else:
+                    request.future.set_result(outcome)
+
+        self.batches_submitted += len(groups)
+        self.requests_submitted += len(pending)
+        # Different models/providers go out as separate batches, concurrently
+        with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+            list(pool.map(_run_group, groups.values()))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "active_jobs": len(self._outstanding),
+                "queued_requests": len(self._queue),
+                "batches_submitted": self.batches_submitted,
+                "requests_submitted": self.requests_submitted,
+            }
+
+
+class BatchClient:
+    """Client handed out by get_llm() inside a batch job; invoke() goes through the coordinator."""
+
+    def __init__(self, coordinator: BatchCoordinator, job_id: str, snapshot):
+        self.coordinator = coordinator
+        self.job_id = job_id
+        self.snapshot = snapshot
+
+    def invoke(self, prompt: str) -> str:
+        return self.coordinator.submit(self.job_id, self.snapshot, prompt)
+
+    def stream(self, prompt: str):
+        # Batch APIs do not stream; the whole response arrives at once
+        yield self.invoke(prompt)
+
+
+# (coordinator, job_id) for the batch job running in this context
+_batch_job: ContextVar[Optional[Tuple[BatchCoordinator, str]]] = ContextVar("batch_job", default=None)
+
+
+def current_batch_job() -> Optional[Tuple[BatchCoordinator, str]]:
+    return _batch_job.get()
+
+
+@contextmanager
+def batch_job(coordinator: BatchCoordinator, job_id: str):
+    """Route LLM calls made in this context through coordinator as part of job_id."""
+    coordinator.register_job(job_id)
+    token = _batch_job.set((coordinator, job_id))
+    try:
+        yield
+    finally:
+        _batch_job.reset(token)
+        coordinator.finish_job(job_id)
+
+
+def run_batch(
+    jobs: List[Dict[str, Any]],
+    generate: Callable[..., Dict[str, Any]],
+    coordinator: Optional[BatchCoordinator] = None,
+    on_done: Optional[Callable[[int, Union[Dict[str, Any], Exception]], None]] = None,
+) -> List[Union[Dict[str, Any], Exception]]:
+    """
+    Run generate(**kwargs) for every job concurrently under one coordinator.
+
+    Each job runs with job_id set (the job's own "job_id" or a fresh one) and uses it as its
+    coordinator id too, so a failed song can be resumed from its checkpoint under that id.
+    Returns results in input order; a failed job yields its exception instead of a dict.
+    """
+    owns_coordinator = coordinator is None
+    coordinator = coordinator or BatchCoordinator()
+    results: List[Union[Dict[str, Any], Exception]] = [None] * len(jobs)
+    # Register everything up front so the first flush waits for every job's first call
+    job_ids = [job.get("job_id") or uuid.uuid4().hex for job in jobs]
+    for job_id in job_ids:
+        coordinator.register_job(job_id)
+
+    def _run(index: int) -> None:
+        try:
+            with batch_job(coordinator, job_ids[index]):
+                results[index] = generate(**{**jobs[index], "job_id": job_ids[index]})
+        except Exception as exc:
+            results[index] = exc
+        if on_done:
+            on_done(index, results[index])
+
+    try:
+        # One thread per job: each spends nearly all of its time blocked on a batch
+        with ThreadPoolExecutor(max_workers=max(1, len(jobs)), thread_name_prefix="batch-job") as pool:
+            list(pool.map(_run, range(len(jobs))))
+    finally:
+        if owns_coordinator:
+            coordinator.close()
+    return results
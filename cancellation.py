@@ -0,0 +1,171 @@
+"""
+Cooperative cancellation for generation jobs.
+
+Cancelling the asyncio task that awaits a job only abandons the await; the
+worker thread running generate_song() keeps making LLM and image calls. Each
+job instead gets a CancellationToken (keyed by job_id) that JobManager.cancel_job
+sets. The token is bound to the job's context (cancellation_scope) and checked:
+
+- between graph nodes (job_context.job_context raises once it is set)
+- before every LLM call and while waiting on rate limits or retry backoff
+- on every streamed chunk, closing the HTTP stream (and freeing its limiter
+  slot) when cancelled
+- around blocking calls made through abortable(): the job thread stops waiting
+  immediately; the call itself keeps running in the background unless it checks
+  the token (a non-streaming LLM request runs until the provider answers or
+  LLM_HTTP_TIMEOUT, image generation to completion), and its result is dropped
+
+A cancelled job therefore frees its worker slot within about a second and
+starts no further provider calls.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, Optional, TypeVar
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+T = TypeVar("T")
+
+# How often a thread blocked in abortable() looks at its token
+_POLL_SECONDS = 0.25
+
+
+class JobCancelled(BaseException):
+    """
+    The job was cancelled.
+
+    Derives from BaseException (like asyncio.CancelledError) so the broad
+    ``except Exception`` fallbacks in the nodes and provider failover don't
+    swallow it and carry on generating.
+    """
+
+
+class CancellationToken:
+    """A one-way cancel flag for one job."""
+
+    def __init__(self, job_id: Optional[str] = None):
+        self.job_id = job_id
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise JobCancelled(f"Job {self.job_id} cancelled")
+
+    def sleep(self, seconds: float) -> None:
+        """time.sleep that ends early (raising JobCancelled) when the token is cancelled."""
+        if seconds > 0 and self._event.wait(seconds):
+            self.raise_if_cancelled()
+
+
+# Token of the job running in the current context (set per job by cancellation_scope)
+_current: ContextVar[Optional[CancellationToken]] = ContextVar("cancellation_token", default=None)
+
+
+@contextmanager
+def cancellation_scope(token: Optional[CancellationToken]) -> Iterator[Optional[CancellationToken]]:
+    reset = _current.set(token)
+    try:
+        yield token
+    finally:
+        _current.reset(reset)
+
+
+def current_token() -> Optional[CancellationToken]:
+    return _current.get()
+
+
+def check_cancelled() -> None:
+    """Raise JobCancelled if the current job has been cancelled."""
+    token = _current.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+def cancellable_sleep(seconds: float) -> None:
+    token = _current.get()
+    if token is None:
+        time.sleep(seconds)
+    else:
+        token.sleep(seconds)
+
+
+def _abortable_pool_size() -> int:
+    """ABORTABLE_CALL_POOL_SIZE, by default one thread per LLM call that running jobs and their reviewers can make at once."""
+    configured = os.getenv("ABORTABLE_CALL_POOL_SIZE")
+    if configured:
+        return max(1, int(configured))
+    return max(1, int(os.getenv("MAX_CONCURRENT_JOBS", "3"))) * max(1, int(os.getenv("REVIEWER_POOL_SIZE", "12")))
+
+
+_abortable_executor = ThreadPoolExecutor(max_workers=_abortable_pool_size(), thread_name_prefix="abortable-call")
+
+
+def abortable(fn: Callable[[], T]) -> T:
+    """
+    Run a blocking call so that cancelling the current job stops waiting for it.
+
+    Without a token the call runs inline. With one it runs on a helper thread
+    (inside the same cancellation scope, so its own retries stop too) while this
+    thread polls the token; on cancel JobCancelled is raised here at once and
+    the call's eventual result is discarded. The call is not interrupted: it
+    stops early only where it checks the token itself (e.g. per streamed chunk).
+    """
+    token = _current.get()
+    if token is None:
+        return fn()
+    token.raise_if_cancelled()
+
+    def _run() -> T:
+        with cancellation_scope(token):
+            token.raise_if_cancelled()
+            return fn()
+
+    future = _abortable_executor.submit(_run)
+    while True:
+        try:
+            return future.result(timeout=_POLL_SECONDS)
+        except FutureTimeout:
+            token.raise_if_cancelled()
+
+
+_tokens: Dict[str, CancellationToken] = {}
+_tokens_lock = threading.Lock()
+
+
+def get_cancel_token(job_id: str) -> CancellationToken:
+    """The job's token, created on first use (a cancel that arrives before the run starts is kept)."""
+    with _tokens_lock:
+        token = _tokens.get(job_id)
+        if token is None:
+            token = CancellationToken(job_id)
+            _tokens[job_id] = token
+        return token
+
+
+def cancel(job_id: str) -> bool:
+    """Signal the job's worker to stop; False when no run of job_id is known."""
+    with _tokens_lock:
+        token = _tokens.get(job_id)
+    if token is None:
+        return False
+    token.cancel()
+    return True
+
+
+def release_cancel_token(job_id: str) -> None:
+    with _tokens_lock:
+        _tokens.pop(job_id, None)
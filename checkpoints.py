@@ -0,0 +1,77 @@
+"""
+Durable LangGraph checkpoints for song generation runs.
+
+Both workflow graphs are compiled with a SQLite checkpointer (see
+song_master.get_workflow), using the job_id as the LangGraph thread_id. After
+every completed step the graph state is written to CHECKPOINT_PATH, so a job
+that fails on its tenth LLM call (provider outage, unparseable metadata,
+process restart) can be resumed from its last completed node with
+generate_song(..., resume=True) or POST /api/generation/{job_id}/resume instead
+of paying for every earlier call again.
+
+Only SongState is checkpointed; the read-only inputs live in the JobContext,
+which generate_song() rebuilds from the job's request on resume. The review
+mode a run was started in is kept in the checkpoint metadata, so a resumed run
+continues in the same graph even if REVIEW_MODE changed since. A thread's
+checkpoints are deleted once its job completes.
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Any, Dict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_saver = None
+_saver_lock = threading.Lock()
+
+
+def checkpointing_enabled() -> bool:
+    return os.getenv("CHECKPOINT_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+def get_checkpointer():
+    """The process-wide SQLite checkpointer, or None when checkpointing is disabled or unavailable."""
+    global _saver
+    if not checkpointing_enabled():
+        return None
+    with _saver_lock:
+        if _saver is None:
+            try:
+                from langgraph.checkpoint.sqlite import SqliteSaver
+            except ImportError:
+                print("Warning: langgraph-checkpoint-sqlite is not installed; generation runs are not checkpointed")
+                return None
+            path = os.getenv("CHECKPOINT_PATH", os.path.join(".cache", "checkpoints.sqlite3"))
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            _saver = SqliteSaver(conn)
+            _saver.setup()
+        return _saver
+
+
+def run_config(job_id: str, **metadata) -> Dict[str, Any]:
+    """LangGraph config addressing a job's checkpoint thread; metadata is recorded with every checkpoint."""
+    config: Dict[str, Any] = {"configurable": {"thread_id": job_id}}
+    if metadata:
+        config["metadata"] = metadata
+    return config
+
+
+def checkpoint_metadata(job_id: str) -> Dict[str, Any]:
+    """Metadata of a job's latest checkpoint (e.g. the review mode it ran in); empty when there is none."""
+    saver = get_checkpointer()
+    checkpoint = saver.get_tuple(run_config(job_id)) if saver is not None else None
+    return dict(checkpoint.metadata or {}) if checkpoint is not None else {}
+
+
+def delete_checkpoint(job_id: str) -> None:
+    saver = get_checkpointer()
+    if saver is not None:
+        saver.delete_thread(job_id)
@@ -0,0 +1,196 @@
+"""
+Capability negotiation for OpenAI-compatible servers (LM Studio, legacy OpenRouter).
+
+Instead of trying chat completions and falling back to text completions on every
+call, the first call against a (base URL, model) pair probes the server once:
+
+    - which endpoint works (chat completions, text completions)
+    - whether streaming works on it
+    - whether n>1 returns several choices
+    - the model's context window, when /models (or LM Studio's /api/v0/models) reports it
+
+The result is memoized for LLM_CAPABILITY_TTL_SECONDS (default 3600). A call
+that fails with an endpoint-shaped error (404/405/422/400/501) invalidates the
+entry so the next call re-probes. Probes that cannot reach the server are not
+memoized. Current entries are served by GET /api/config/capabilities.
+"""
+
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import openai
+from dotenv import load_dotenv
+
+from http_pool import get_http_client, get_openai_client
+
+load_dotenv()
+
+_PROBE_PROMPT = "Reply with OK."
+_CONTEXT_FIELDS = ("max_context_length", "context_length", "context_window", "max_model_len")
+
+
+@dataclass(frozen=True)
+class EndpointCapabilities:
+    """What one OpenAI-compatible server supports for one model."""
+    base_url: str
+    model: str
+    chat: bool
+    completions: bool
+    streaming: bool = False
+    multiple_choices: bool = False
+    max_context: Optional[int] = None
+    probed_at: float = field(default_factory=time.time)
+
+    @property
+    def endpoint(self) -> str:
+        """Endpoint to call: chat when the server has it, else text completions."""
+        return "chat" if self.chat else "completions"
+
+    def clamp_max_tokens(self, max_tokens: int) -> int:
+        return min(max_tokens, self.max_context) if self.max_context else max_tokens
+
+
+class EndpointUnavailable(Exception):
+    """The probe could not reach the server, so nothing is known (and nothing is cached)."""
+
+
+def endpoint_missing(exc: Exception) -> bool:
+    """Errors meaning "this endpoint/parameter is not served here" rather than a transient failure."""
+    if isinstance(exc, (openai.NotFoundError, openai.UnprocessableEntityError, openai.BadRequestError)):
+        return True
+    return isinstance(exc, openai.APIStatusError) and exc.status_code in (405, 501)
+
+
+def _ttl_seconds() -> float:
+    return float(os.getenv("LLM_CAPABILITY_TTL_SECONDS", "3600"))
+
+
+def _probe_timeout() -> float:
+    return float(os.getenv("LLM_CAPABILITY_PROBE_TIMEOUT", "15"))
+
+
+def _max_context(base_url: str, api_key: str, model: str) -> Optional[int]:
+    """Context window from /models, or LM Studio's richer /api/v0/models."""
+    urls = [f"{base_url.rstrip('/')}/models"]
+    if base_url.rstrip("/").endswith("/v1"):
+        urls.append(f"{base_url.rstrip('/')[:-3]}/api/v0/models")
+    http = get_http_client()
+    for url in urls:
+        try:
+            response = http.get(url, headers={"Authorization": f"Bearer {api_key}"}, timeout=_probe_timeout())
+            response.raise_for_status()
+            entries = response.json().get("data", [])
+        except Exception:
+            continue
+        for entry in entries:
+            if entry.get("id") != model and len(entries) > 1:
+                continue
+            for name in _CONTEXT_FIELDS:
+                if isinstance(entry.get(name), int):
+                    return entry[name]
+    return None
+
+
+def probe(base_url: str, api_key: str, model: str) -> EndpointCapabilities:
+    """Probe a server with one-token requests; raises EndpointUnavailable if no endpoint answers."""
+    client = get_openai_client(base_url, api_key).with_options(timeout=_probe_timeout(), max_retries=0)
+    support: Dict[str, bool] = {}
+    errors: List[Exception] = []
+
+    def _call(endpoint: str, **kwargs):
+        if endpoint == "chat":
+            return client.chat.completions.create(
+                model=model, messages=[{"role": "user", "content": _PROBE_PROMPT}], max_tokens=1, **kwargs
+            )
+        return client.completions.create(model=model, prompt=_PROBE_PROMPT, max_tokens=1, **kwargs)
+
+    for endpoint in ("chat", "completions"):
+        try:
+            _call(endpoint)
+            support[endpoint] = True
+            break
+        except Exception as exc:
+            if not endpoint_missing(exc):
+                errors.append(exc)
+            support[endpoint] = False
+    if not any(support.values()):
+        raise EndpointUnavailable(f"No completion endpoint answered at {base_url}: {errors or 'all endpoints rejected'}")
+
+    working = "chat" if support.get("chat") else "completions"
+    streaming = multiple_choices = False
+    try:
+        for _ in _call(working, stream=True):
+            pass
+        streaming = True
+    except Exception:
+        pass
+    try:
+        multiple_choices = len(_call(working, n=2).choices) >= 2
+    except Exception:
+        pass
+
+    return EndpointCapabilities(
+        base_url=base_url,
+        model=model,
+        chat=support.get("chat", False),
+        # Text completions is only probed when chat is missing; a chat server is assumed to be OpenAI-shaped
+        completions=support.get("completions", False),
+        streaming=streaming,
+        multiple_choices=multiple_choices,
+        max_context=_max_context(base_url, api_key, model),
+    )
+
+
+_capabilities: Dict[Tuple[str, str], EndpointCapabilities] = {}
+_probe_locks: Dict[Tuple[str, str], threading.Lock] = {}
+_lock = threading.Lock()
+
+
+def get_capabilities(base_url: str, api_key: str, model: str) -> Optional[EndpointCapabilities]:
+    """
+    Memoized capabilities for (base_url, model), probing on first use or after the TTL.
+
+    Returns None when the server could not be probed; callers then fall back to
+    trying both endpoints.
+    """
+    key = (base_url, model)
+    cached = _capabilities.get(key)
+    if cached is not None and time.time() - cached.probed_at < _ttl_seconds():
+        return cached
+    with _lock:
+        probe_lock = _probe_locks.setdefault(key, threading.Lock())
+    with probe_lock:
+        # Another thread may have finished the probe while we waited
+        cached = _capabilities.get(key)
+        if cached is not None and time.time() - cached.probed_at < _ttl_seconds():
+            return cached
+        try:
+            capabilities = probe(base_url, api_key, model)
+        except EndpointUnavailable as exc:
+            print(f"Capability probe failed for {base_url} ({model}): {exc}")
+            return None
+        with _lock:
+            _capabilities[key] = capabilities
+        return capabilities
+
+
+def invalidate(base_url: str, model: str) -> None:
+    """Forget the capabilities of (base_url, model) so the next call re-probes."""
+    with _lock:
+        _capabilities.pop((base_url, model), None)
+
+
+def capability_table() -> List[Dict[str, Any]]:
+    """Every memoized entry, for the config API."""
+    with _lock:
+        entries = list(_capabilities.values())
+    table = []
+    for capabilities in entries:
+        entry = asdict(capabilities)
+        entry["endpoint"] = capabilities.endpoint
+        entry["age_seconds"] = round(time.time() - capabilities.probed_at, 1)
+        table.append(entry)
+    return table
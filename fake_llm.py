@@ -0,0 +1,358 @@
+"""
+Deterministic fake LLM provider for load testing and offline development.
+
+Selected with LLM_PROVIDER=fake (or served over HTTP by tools/fake_llm_server.py).
+The prompt type is recognised from the instruction text of each prompt in
+ai_functions.build_prompts() / prompts/, and a schema-valid response is templated
+for it: narrative JSON, HookHouse review JSON, "### Block N" metadata, scoring and
+triage JSON, caption options, lyrics with [end] and a Funksmith changelog, etc.
+Responses are seeded from the prompt, so the same prompt always yields the same text.
+
+Knobs (env):
+    FAKE_LLM_LATENCY_MS          time to first token (default 0)
+    FAKE_LLM_JITTER_MS           uniform +/- jitter on the latency (default 0)
+    FAKE_LLM_TOKENS_PER_SECOND   generation speed after the first token; 0 = instant (default 0)
+    FAKE_LLM_ERROR_RATE          fraction of calls that fail, 0-1 (default 0)
+    FAKE_LLM_ERROR_STATUS        HTTP status reported by injected failures (default 503)
+    FAKE_LLM_SCORE               score returned by scoring/review prompts (default 9.0)
+    FAKE_LLM_SEED                seed for latency/error injection (default: random)
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# (prompt kind, marker) — checked in order against the head of the prompt, where the instructions live
+PROMPT_MARKERS: List[Tuple[str, str]] = [
+    ("narrative", "Storysmith Muse"),
+    ("hookhouse_review", "quality reviewer** for HookHouse"),
+    ("funksmith", "Sanctified Funksmith"),
+    ("hookhouse_metadata", "metadata generator** for the HookHouse"),
+    ("image_prompt", "album art concept generator"),
+    ("captions", "social media caption writer"),
+    ("hookhouse_draft", "lyric generation engine"),
+    ("image_blueprint", "high-fidelity image blueprint"),
+    ("metadata", "preparing concise metadata for a Suno song render"),
+    ("triage", "You are a strict validator"),
+    ("score", "songwriting judge scoring"),
+    ("revise", "Revise the lyrics based on the reviewer feedback"),
+    ("critic", "ruthless music critic"),
+    ("preflight", "expert in Suno AI"),
+    ("review", "in charge of reviewing lyrics"),
+    ("draft", "You are an expert songwriter"),
+]
+MARKER_WINDOW = 3000
+
+_IMAGERY = [
+    "gravel under bald tires", "porch light humming", "coffee gone cold", "rain on the tin roof",
+    "a radio losing the station", "keys on the kitchen hook", "smoke in the headlights", "a church bell two towns over",
+    "boots by the back door", "neon buzzing blue", "a map folded wrong", "the last bus pulling out",
+]
+_HOOKS = ["hold the line", "carry me home", "burn it slow", "say it plain", "leave the light on", "one more mile"]
+_ARTISTS = ["The Gravel Saints", "Marlow & The Low Road", "June Calloway", "Tin Roof Revival", "The Night Shift Choir"]
+
+
+class FakeLLMError(Exception):
+    """Injected provider failure; carries an HTTP status so retry logic treats it like a real one."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Fake LLM injected failure (HTTP {status_code})")
+        self.status_code = status_code
+
+
+def classify_prompt(prompt: str) -> str:
+    head = str(prompt)[:MARKER_WINDOW]
+    for kind, marker in PROMPT_MARKERS:
+        if marker in head:
+            return kind
+    return "generic"
+
+
+def _rng(prompt: str) -> random.Random:
+    return random.Random(int(hashlib.sha256(str(prompt).encode("utf-8")).hexdigest()[:16], 16))
+
+
+def _seed_phrase(prompt: str) -> str:
+    """A short phrase from the user's request, to make output visibly tied to the input."""
+    for label in ("Title/Seed:", "User Input:", "Song Title:"):
+        match = re.search(re.escape(label) + r"\s*(.+)", str(prompt))
+        if match:
+            words = match.group(1).strip().split()
+            if words:
+                return " ".join(words[:6]).strip(".,")
+    return "the long way home"
+
+
+def _score() -> float:
+    return float(os.getenv("FAKE_LLM_SCORE", "9.0"))
+
+
+def _lyrics(rng: random.Random, seed: str, hookhouse: bool) -> str:
+    hook = rng.choice(_HOOKS)
+    verse = lambda: "\n".join(rng.sample(_IMAGERY, 4))  # noqa: E731
+    sections = [
+        "[Intro] [Mood: Reflective]",
+        "(hum)",
+        "",
+        "[Verse 1] [Male Vocal]",
+        verse(),
+        "",
+        "[Pre-Chorus]",
+        f"Tell me {seed}",
+        "",
+        "[Chorus] [Dynamic: Building]",
+        f"We {hook}, we {hook}",
+        f"Till {seed} comes around",
+        "",
+        "[Verse 2]",
+        verse(),
+        "",
+        "[Bridge] [Dynamic: Intimate, building]",
+        f"Nothing left but {rng.choice(_IMAGERY)}",
+        "",
+        "[Chorus]",
+        f"We {hook}, we {hook}",
+        "",
+        "[Outro]",
+        f"{hook.capitalize()}...",
+    ]
+    if hookhouse:
+        sections = ["[arrangement_cues]", "Sparse groove, organ swell into chorus, stomp-clap on 2 and 4", ""] + sections
+        sections.append("[end]")
+    return "\n".join(sections)
+
+
+def _narrative(rng: random.Random, seed: str) -> Dict[str, Any]:
+    concepts = []
+    for concept_id in (1, 2, 3):
+        concepts.append({
+            "id": concept_id,
+            "logline": f"{seed.capitalize()}, told from a {rng.choice(['kitchen table', 'truck cab', 'back pew'])}",
+            "synopsis": f"A small story about {seed} and {rng.choice(_IMAGERY)}.",
+            "beats": rng.sample(_IMAGERY, 3),
+            "character": rng.choice(["a night-shift nurse", "a retired trucker", "a choir kid grown up"]),
+            "setting": rng.choice(["a river town in August", "an interstate diner", "a church parking lot"]),
+            "symbols": rng.sample(_IMAGERY, 3),
+            "hook_seeds": rng.sample(_HOOKS, 2),
+            "title_variants": [seed.title(), rng.choice(_HOOKS).title()],
+            "rhyme_fields": {section: rng.sample(["line", "mine", "road", "load", "light", "night"], 2)
+                             for section in ("verse", "pre_chorus", "chorus", "bridge")},
+            "emotional_arc": "restraint to release",
+            "structure_map": ["Intro", "Verse 1", "Pre-Chorus", "Chorus", "Verse 2", "Bridge", "Chorus", "Outro"],
+        })
+    sections = ("intro", "verse_1", "pre_chorus", "chorus", "verse_2", "bridge", "outro")
+    return {
+        "concepts": concepts,
+        "best_bet": {
+            "concept_id": 1,
+            "rationale": "Most concrete imagery and the strongest hook seed.",
+            "riff_groove_map": {section: rng.choice(["sparse", "building", "full band", "half-time"]) for section in sections},
+            "section_prompts": {
+                section: {
+                    "narrative_function": "advance the story",
+                    "emotional_tone": rng.choice(["wry", "aching", "defiant"]),
+                    "imagery": rng.sample(_IMAGERY, 3),
+                    "prosody": "short phrases, breath after each line",
+                    "sample_lines": rng.sample(_IMAGERY, 2),
+                }
+                for section in sections
+            },
+            "movement_cues": ["sway", "stomp"],
+            "vocal_texture": rng.choice(["raspy", "conversational", "strained"]),
+            "production_hints": "dry vocal up front, roomy drums",
+        },
+    }
+
+
+def _hookhouse_review(rng: random.Random) -> Dict[str, Any]:
+    score = _score()
+    categories = ("suno_compliance", "language_purity", "spoken_first", "groove_rhythm", "emotional_impact",
+                  "imagery", "rhyme_quality", "narrative", "cultural_authenticity", "singability")
+    return {
+        "overall_score": score,
+        "category_scores": {name: round(min(10.0, max(0.0, score + rng.uniform(-0.5, 0.5))), 1) for name in categories},
+        "critical_issues": [],
+        "moderate_issues": [{"line_number": rng.randint(3, 20), "section": "Verse 2",
+                             "issue": "Slightly abstract image", "severity": "low",
+                             "suggestion": f"Try '{rng.choice(_IMAGERY)}'"}],
+        "positive_notes": ["Concrete imagery", "Hook lands"],
+        "revision_priority": ["Tighten Verse 2"],
+        "pass_threshold": score >= 8.5,
+        "threshold_note": "Fake reviewer verdict",
+    }
+
+
+def _hookhouse_metadata(rng: random.Random, seed: str) -> str:
+    return (
+        "### Block 2: Style\n"
+        f"Southern soul rock at {rng.randint(72, 128)} BPM in 4/4. Opens with dry fingerpicked guitar and a low organ pad, "
+        "builds through stomp-clap pre-chorus into a full-band chorus with gospel backing vocals.\n\n"
+        "### Block 3: Excluded Style\n"
+        "synthpop, EDM, dubstep, trap, hyperpop, eurobeat\n\n"
+        "### Block 4: Title / Artist\n"
+        f"Title: {seed.title()}\n"
+        f"Artist: {rng.choice(_ARTISTS)}\n\n"
+        "### Block 5: Summary\n"
+        f"A slow-burning confession about {seed} that moves from a whisper at the kitchen table to a full-throated release.\n"
+    )
+
+
+def _image_prompt(rng: random.Random, seed: str) -> Dict[str, Any]:
+    return {
+        "objects": rng.sample(["guitar", "pickup truck", "porch light", "coffee cup", "church pew", "radio"], 4),
+        "environment": f"A dusk scene about {seed}, long shadows across an empty two-lane road.",
+        "people": "none",
+        "composition": "Centered subject, rule of thirds horizon",
+        "symbolism": rng.sample(["journey", "memory", "redemption", "home"], 2),
+        "metadata": {"mood": "dark", "color_palette": "warm earth tones", "lighting": "golden hour",
+                     "era": "timeless", "style": "photorealistic"},
+        "text": {"include": False},
+        "size": "9:16",
+        "resolution": "720p minimum",
+    }
+
+
+def _image_blueprint(rng: random.Random, seed: str) -> Dict[str, Any]:
+    return {
+        "spec_version": "scene-blueprint-2.0",
+        "global_scene": {
+            "environment": {"location_type": "outdoor", "setting_description": f"An empty two-lane road at dusk, about {seed}.",
+                            "time_of_day": "dusk", "weather": {"condition": "clear", "intensity": "none"}},
+            "lighting": {"overall_mood": "cinematic"},
+            "camera": {"framing": "wide", "angle": "low_angle"},
+            "style": {"render_type": "photoreal"},
+        },
+        "objects": [{"name": name, "description": f"A weathered {name}", "position": "foreground", "importance": "primary"}
+                    for name in rng.sample(["guitar", "pickup truck", "porch light", "radio"], 2)],
+        "people": [],
+        "typography": {"enabled": True, "title": {"text": seed.title()}, "artist": {"text": "The Gravel Saints"}},
+    }
+
+
+def _captions(rng: random.Random, seed: str) -> str:
+    tones = ["Roots / Americana Authentic", "Scene or Setting Hook", "Streaming / Promo Short",
+             "Emotional Minimalist", "Philosophical / Legacy Frame", "Wildcard"]
+    lines = ["### Caption Options", ""]
+    for index, tone in enumerate(tones, start=1):
+        lines.append(f"**{index}. {tone}**")
+        lines.append(f"\"{seed.title()}\" — {rng.choice(_IMAGERY)}. Out now.")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def fake_response(prompt: str) -> str:
+    """Deterministic, schema-valid response text for a prompt."""
+    kind = classify_prompt(prompt)
+    rng = _rng(prompt)
+    seed = _seed_phrase(prompt)
+
+    if kind in ("draft", "revise"):
+        return _lyrics(rng, seed, hookhouse=False)
+    if kind == "hookhouse_draft":
+        return _lyrics(rng, seed, hookhouse=True)
+    if kind == "funksmith":
+        return _lyrics(rng, seed, hookhouse=True) + (
+            "\n\n### Funksmith Changelog\n\n**Chorus, Line 2**: Shortened for breath space\n"
+        )
+    if kind == "narrative":
+        return json.dumps(_narrative(rng, seed))
+    if kind == "hookhouse_review":
+        return json.dumps(_hookhouse_review(rng))
+    if kind == "hookhouse_metadata":
+        return _hookhouse_metadata(rng, seed)
+    if kind == "image_prompt":
+        return json.dumps(_image_prompt(rng, seed))
+    if kind == "image_blueprint":
+        return json.dumps(_image_blueprint(rng, seed))
+    if kind == "captions":
+        return _captions(rng, seed)
+    if kind == "metadata":
+        return json.dumps({
+            "description": f"A song about {seed}.",
+            "suno_styles": ["southern rock", "soul", "gospel"],
+            "suno_exclude_styles": ["edm"],
+            "target_audience": "Adults 25-45 who like roots music",
+            "commercial_potential": "Solid playlist fit",
+        })
+    if kind == "triage":
+        return json.dumps({"pass": True, "issues": []})
+    if kind == "score":
+        return json.dumps({"score": _score(), "rationale": "Concrete imagery and a singable hook."})
+    if kind == "critic":
+        return json.dumps({"rating": _score(), "feedback": f"Verse 2 drifts; anchor it with {rng.choice(_IMAGERY)}."})
+    if kind == "preflight":
+        return "All sections are correctly bracketed and styles are valid. No action needed."
+    if kind == "review":
+        return f"Strong chorus. Verse 2 could use a sharper image like '{rng.choice(_IMAGERY)}'. Keep the bridge short."
+    return f"Fake response for a {len(str(prompt))} character prompt."
+
+
+class _Injector:
+    """Latency and failure injection shared by every FakeLLM instance."""
+
+    def __init__(self):
+        seed = os.getenv("FAKE_LLM_SEED")
+        self._rng = random.Random(int(seed)) if seed else random.Random()
+        self._lock = threading.Lock()
+
+    def first_token_delay(self) -> float:
+        latency = float(os.getenv("FAKE_LLM_LATENCY_MS", "0")) / 1000.0
+        jitter = float(os.getenv("FAKE_LLM_JITTER_MS", "0")) / 1000.0
+        with self._lock:
+            offset = self._rng.uniform(-jitter, jitter) if jitter else 0.0
+        return max(0.0, latency + offset)
+
+    def token_delay(self) -> float:
+        rate = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "0"))
+        return 1.0 / rate if rate > 0 else 0.0
+
+    def maybe_fail(self) -> None:
+        rate = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+        with self._lock:
+            failed = rate > 0 and self._rng.random() < rate
+        if failed:
+            raise FakeLLMError(int(os.getenv("FAKE_LLM_ERROR_STATUS", "503")))
+
+
+injector = _Injector()
+
+
+def split_tokens(text: str) -> List[str]:
+    # Roughly word-sized chunks, keeping whitespace so the joined stream equals the full text
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+class FakeLLM:
+    """Client with the same surface as the real wrappers (invoke/stream)."""
+
+    def __init__(self, model: str = "fake-songwriter", temperature: float = 0.0, max_tokens: int = 4096,
+                 responder: Callable[[str], str] = fake_response, **_: Any):
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.responder = responder
+
+    def invoke(self, prompt: str) -> str:
+        text = self.responder(str(prompt))
+        time.sleep(injector.first_token_delay() + injector.token_delay() * len(split_tokens(text)))
+        injector.maybe_fail()
+        return text
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        text = self.responder(str(prompt))
+        time.sleep(injector.first_token_delay())
+        injector.maybe_fail()
+        delay = injector.token_delay()
+        for token in split_tokens(text):
+            if delay:
+                time.sleep(delay)
+            yield token
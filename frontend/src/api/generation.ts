@@ -14,3 +14,8 @@ export const getJobStatus = async (jobId: string): Promise<JobStatus> => {
 export const cancelJob = async (jobId: string): Promise<void> => {
   await apiClient.post(`/generation/${jobId}/cancel`);
 };
+
+export const resumeJob = async (jobId: string): Promise<JobResponse> => {
+  const response = await apiClient.post<JobResponse>(`/generation/${jobId}/resume`);
+  return response.data;
+};
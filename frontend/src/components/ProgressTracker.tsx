@@ -16,7 +16,7 @@ export const ProgressTracker: React.FC<ProgressTrackerProps> = ({
   onComplete,
   useHookhouse = true
 }) => {
-  const { progress, connected, error, connect, disconnect, cancelJob } = useWebSocket();
+  const { progress, connected, error, liveStep, liveText, connect, disconnect, cancelJob } = useWebSocket();
   const [showSuccess, setShowSuccess] = useState(false);
   const [startTime] = useState(Date.now());
   const [elapsedTime, setElapsedTime] = useState(0);
@@ -183,6 +183,18 @@ export const ProgressTracker: React.FC<ProgressTrackerProps> = ({
                 </div>
               )}
 
+              {/* Live LLM output for the current step */}
+              {liveText && (
+                <div className="bg-dark-800/50 border border-dark-700 rounded-lg p-4 mb-6">
+                  <p className="text-xs text-slate-500 mb-2 uppercase tracking-wide">
+                    Live output{liveStep ? ` · ${liveStep.replace(/_/g, ' ')}` : ''}
+                  </p>
+                  <pre className="text-sm text-slate-300 whitespace-pre-wrap font-mono max-h-64 overflow-y-auto">
+                    {liveText}
+                  </pre>
+                </div>
+              )}
+
               {/* Stats Row */}
               <div className="grid grid-cols-3 gap-4 mb-6">
                 <div className="bg-dark-800/50 border border-dark-700 rounded-lg p-3 text-center">
@@ -1,5 +1,5 @@
 import { useState, useCallback, useRef, useEffect } from 'react';
-import { ProgressUpdate } from '../types/generation';
+import { ProgressUpdate, TokenMessage } from '../types/generation';
 
 // Derive WebSocket URL from current host so it works through proxied domains
 const getWsBaseUrl = () => {
@@ -12,10 +12,22 @@ export const useWebSocket = () => {
   const [progress, setProgress] = useState<ProgressUpdate | null>(null);
   const [connected, setConnected] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  // Text streamed by the LLM for the step currently generating (draft, revisions, Funksmith)
+  const [liveStep, setLiveStep] = useState<string | null>(null);
+  const [liveText, setLiveText] = useState('');
+  const liveStepRef = useRef<string | null>(null);
   const wsRef = useRef<WebSocket | null>(null);
+  // Last event sequence number received; a reconnect resumes from here instead of losing events
+  const lastSeqRef = useRef(0);
+  const finishedRef = useRef(false);
+  const reconnectTimerRef = useRef<number | null>(null);
 
-  const connect = useCallback((jobId: string) => {
-    const ws = new WebSocket(`${getWsBaseUrl()}/${jobId}`);
+  const connect = useCallback((jobId: string, offset: number = 0) => {
+    if (offset === 0) {
+      lastSeqRef.current = 0;
+      finishedRef.current = false;
+    }
+    const ws = new WebSocket(`${getWsBaseUrl()}/${jobId}?offset=${offset}`);
 
     ws.onopen = () => {
       setConnected(true);
@@ -25,14 +37,34 @@ export const useWebSocket = () => {
 
     ws.onmessage = (event) => {
       const data = JSON.parse(event.data);
+      if (typeof data.seq === 'number') {
+        if (data.seq <= lastSeqRef.current) return; // already seen before a reconnect
+        if (data.type !== 'heartbeat') lastSeqRef.current = data.seq;
+      }
 
       // Check if it's an error message
       if (data.type === 'error') {
+        finishedRef.current = true;
         setError(data.error);
         setConnected(false);
+      } else if (data.type === 'heartbeat') {
+        return;
+      } else if (data.type === 'replay_gap') {
+        console.warn(`WebSocket replay skipped ${data.missed} events`);
+      } else if (data.type === 'token') {
+        const token: TokenMessage = data;
+        if (liveStepRef.current !== token.step) {
+          // A new node started streaming; replace the previous step's text
+          liveStepRef.current = token.step;
+          setLiveStep(token.step);
+          setLiveText(token.text);
+        } else {
+          setLiveText((prev) => prev + token.text);
+        }
       } else {
         // It's a progress update
         const update: ProgressUpdate = data;
+        if (update.step === 'complete') finishedRef.current = true;
         setProgress(update);
       }
     };
@@ -46,18 +78,30 @@ export const useWebSocket = () => {
     ws.onclose = () => {
       console.log('WebSocket connection closed');
       setConnected(false);
+      // Dropped mid-job (network blip, reaped as stalled): reconnect and replay what was missed
+      if (wsRef.current === ws && !finishedRef.current) {
+        reconnectTimerRef.current = window.setTimeout(() => connect(jobId, lastSeqRef.current), 1000);
+      }
     };
 
     wsRef.current = ws;
   }, []);
 
   const disconnect = useCallback(() => {
+    if (reconnectTimerRef.current !== null) {
+      window.clearTimeout(reconnectTimerRef.current);
+      reconnectTimerRef.current = null;
+    }
     if (wsRef.current) {
-      wsRef.current.close();
+      const ws = wsRef.current;
       wsRef.current = null;
+      ws.close();
       setConnected(false);
       setProgress(null);
       setError(null);
+      liveStepRef.current = null;
+      setLiveStep(null);
+      setLiveText('');
     }
   }, []);
 
@@ -74,5 +118,5 @@ export const useWebSocket = () => {
     };
   }, [disconnect]);
 
-  return { progress, connected, error, connect, disconnect, cancelJob };
+  return { progress, connected, error, liveStep, liveText, connect, disconnect, cancelJob };
 };
@@ -4,6 +4,20 @@ export interface ProviderConfig {
   current_model: string;
   available_models: Record<string, string[]>;
   api_keys_configured: Record<string, boolean>;
+  provider_chain?: string[];
+  provider_health?: ProviderHealth[];
+}
+
+export interface ProviderHealth {
+  provider: string;
+  state: 'closed' | 'open' | 'half_open';
+  p50_seconds: number | null;
+  p95_seconds: number | null;
+  error_rate: number;
+  window_calls: number;
+  consecutive_failures: number;
+  calls: number;
+  failures: number;
 }
 
 export interface UpdateProviderRequest {
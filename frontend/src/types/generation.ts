@@ -9,6 +9,9 @@ export interface JobResponse {
   job_id: string;
   status: string;
   websocket_url: string;
+  queue_position?: number | null;
+  eta_seconds?: number | null;
+  coalesced?: boolean;
 }
 
 export interface ProgressUpdate {
@@ -19,6 +22,17 @@ export interface ProgressUpdate {
   message: string;
   percentage: number;
   timestamp: string;
+  queue_position?: number | null;
+  eta_seconds?: number | null;
+  seq?: number;
+}
+
+export interface TokenMessage {
+  type: 'token';
+  job_id: string;
+  step: string;
+  text: string;
+  seq?: number;
 }
 
 export interface JobStatus {
@@ -29,4 +43,7 @@ export interface JobStatus {
   completed_at: string | null;
   result: any;
   error: string | null;
+  priority: 'interactive' | 'batch';
+  queue_position: number | null;
+  eta_seconds: number | null;
 }
@@ -1,9 +1,13 @@
 import json
 import os
+import threading
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Dict, List, Optional, TypedDict
+from typing import Any, Dict, List, Mapping, Optional, TypedDict
 
+from cancellation import abortable, check_cancelled
+from resource_store import get_resource_snapshot, render
+from style_retrieval import select_resources
 from tools.create_album_art import generate_album_art_image
 
 
@@ -27,7 +31,8 @@ def read_styles() -> Dict[str, str]:
 
 def read_tags() -> Dict[str, str]:
     tags: Dict[str, str] = {}
-    for filename in os.listdir("tags"):
+    # Sorted so the rendered tags (part of the cacheable prompt prefix) are stable across runs
+    for filename in sorted(os.listdir("tags")):
         if filename.endswith(".txt"):
             with open(f"tags/{filename}", "r") as file:
                 tags[filename] = file.read()
@@ -163,6 +168,49 @@ def extract_title(lyrics: str, provided_title: Optional[str]) -> str:
     return "Unknown Song"
 
 
+_image_slots: Optional[threading.BoundedSemaphore] = None
+_image_slots_lock = threading.Lock()
+
+
+def _image_call_slots() -> threading.BoundedSemaphore:
+    """Semaphore capping concurrent image provider calls at IMAGE_MAX_CONCURRENCY across all jobs."""
+    global _image_slots
+    with _image_slots_lock:
+        if _image_slots is None:
+            _image_slots = threading.BoundedSemaphore(max(1, int(os.getenv("IMAGE_MAX_CONCURRENCY", "4"))))
+        return _image_slots
+
+
+def _limited_image_call(call) -> None:
+    """
+    Run call() through abortable() once an image slot is free.
+
+    A large batch reaches its album-art step all at once and image APIs are not batched,
+    so without the cap every song would hit the provider together. The slot is held until
+    the call itself ends, even when the job stops waiting for it on cancel.
+    """
+    slots = _image_call_slots()
+    while not slots.acquire(timeout=0.25):
+        check_cancelled()
+    # Whoever takes this first owns the slot: the call once it starts, or the job if it gives up before that
+    claim = threading.Lock()
+
+    def _call():
+        if not claim.acquire(blocking=False):
+            return
+        try:
+            call()
+        finally:
+            slots.release()
+
+    try:
+        abortable(_call)
+    except BaseException:
+        if claim.acquire(blocking=False):
+            slots.release()
+        raise
+
+
 def generate_album_art(title: str, user_input: str) -> str:
     """Generate album artwork using integrated function."""
     artwork_prompt = (
@@ -172,7 +220,8 @@ def generate_album_art(title: str, user_input: str) -> str:
     output_file = f"songs/{title.replace(' ', '_')}_cover.jpg"
     os.makedirs("songs", exist_ok=True)
     try:
-        generate_album_art_image(artwork_prompt, output_file)
+        # A cancelled job stops waiting for the image provider rather than holding its worker
+        _limited_image_call(lambda: generate_album_art_image(artwork_prompt, output_file))
     except Exception as e:
         print(f"Warning: Failed to generate album art: {e}")
         return None
@@ -220,8 +269,16 @@ def parse_persona_styles_list(persona_styles: str):
     return [token for token in raw_tokens if token]
 
 
-def save_song(title: str, user_input: str, lyrics: str, default_params: Dict[str, Optional[str]], metadata: Dict[str, object]) -> str:
-    """Save the generated song to a markdown file with metadata."""
+def save_song(
+    title: str,
+    user_input: str,
+    lyrics: str,
+    default_params: Dict[str, Optional[str]],
+    metadata: Dict[str, object],
+    image_prompt_json: Optional[Dict[str, Any]] = None,
+    captions: Optional[List[str]] = None,
+) -> str:
+    """Save the generated song to a markdown file with metadata (plus HookHouse Block 6 and captions when given)."""
     description = metadata.get("description", "Short description of the song's theme and style.")
     suno_styles = metadata.get("suno_styles", [default_params.get("genre", "rock")])
     suno_exclude_styles = metadata.get("suno_exclude_styles", [])
@@ -230,6 +287,13 @@ def save_song(title: str, user_input: str, lyrics: str, default_params: Dict[str
     target_audience = metadata.get("target_audience", "Suggested demographic")
     commercial_potential = metadata.get("commercial_potential", "Assessment")
 
+    # Optional HookHouse sections sit above the metadata so the user prompt and lyrics parsers are unaffected
+    extra_sections = ""
+    if image_prompt_json:
+        extra_sections += f"## Image Prompt\n```json\n{json.dumps(image_prompt_json, indent=2, ensure_ascii=False)}\n```\n\n"
+    if captions:
+        extra_sections += "## Social Captions\n" + "\n".join(f"- {' '.join(caption.split())}" for caption in captions) + "\n\n"
+
     final_md = f"""
 ## {title}
 ### {description}
@@ -240,7 +304,7 @@ def save_song(title: str, user_input: str, lyrics: str, default_params: Dict[str
 ## Suno Exclude-styles
 {exclude_line if exclude_line else "None"}
 
-## Additional Metadata
+{extra_sections}## Additional Metadata
 - **Emotional Arc**: {default_params['mood']}
 - **Target Audience**: {target_audience}
 - **Commercial Potential**: {commercial_potential}
@@ -260,45 +324,39 @@ def save_song(title: str, user_input: str, lyrics: str, default_params: Dict[str
 
 @dataclass
 class SongResources:
-    styles: Dict[str, str]
-    tags: Dict[str, str]
+    styles: Mapping[str, str]
+    tags: Mapping[str, str]
     persona_styles: str
     default_params: Dict[str, Optional[str]]
+    # Prompt renderings of styles/tags, computed once per job (pre-rendered for the full catalog)
+    styles_text: str = ""
+    tags_text: str = ""
 
 
 class SongState(TypedDict, total=False):
-    # Original fields
-    user_input: str
-    song_name: Optional[str]
-    persona: Optional[str]
-    persona_name: Optional[str]
-    use_local: bool
-    resources: SongResources
+    """
+    Graph channels: only what nodes write, plus the job_id handle.
+
+    Request parameters, resources and prompts are read-only for the whole run and
+    live in the job's JobContext (see job_context) instead of being copied at
+    every node transition.
+    """
+    job_id: str
     lyrics: str
     feedback: str
     score: float
     round: int
-    max_rounds: int
-    score_threshold: float
     preflight_passed: bool
     preflight_issues: List[str]
     metadata: Dict[str, Any]
     filename: Optional[str]
     album_art: Optional[str]
+    # Parallel critique mode: each branch's feedback on the round's lyrics
+    review_feedback: Optional[str]
+    critic_feedback: Optional[str]
+    preflight_feedback: Optional[str]
 
     # HookHouse-specific fields
-    blend: Optional[List[str]]  # 2-3 musical styles (e.g., ["Southern Rock", "Gospel"])
-    mood_style: Optional[str]  # "dark" or "clean"
-    explicitness: Optional[str]  # "explicit" or "mature"
-    pov: Optional[str]  # "first-person", "third-person", etc.
-    setting: Optional[str]  # Time period, location, context
-    themes_include: Optional[List[str]]  # Themes to include
-    themes_avoid: Optional[List[str]]  # Themes to avoid
-    bpm: Optional[int]  # Beats per minute
-    time_signature: Optional[str]  # e.g., "4/4", "3/4"
-    key: Optional[str]  # Musical key (e.g., "C", "Am")
-    groove_texture: Optional[str]  # Groove feel description
-    choir_call_response: Optional[bool]  # Include choir/call-response
     narrative: Optional[Dict[str, Any]]  # Narrative scaffold (concepts + best bet)
     section_map: Optional[List[str]]  # Song structure (Intro, Verse, Chorus, etc.)
     groove_map: Optional[Dict[str, str]]  # Section-by-section groove/texture
@@ -311,12 +369,32 @@ class SongState(TypedDict, total=False):
     captions: Optional[List[str]]  # Social media caption options
 
 
-def load_resources(persona_name: Optional[str]) -> SongResources:
-    styles = read_styles()
-    tags = read_tags()
-    persona_styles = read_persona(persona_name) if persona_name else ""
+def load_resources(persona_name: Optional[str], query: Optional[str] = None) -> SongResources:
+    """
+    Load styles, tags, persona styles and default params for a song.
+
+    Everything comes from the shared resource snapshot (see resource_store), so no
+    files are read per job. When query is given, styles and tags are narrowed to the
+    entries most relevant to it (plus the persona styles and default params) via the
+    style retrieval index; see STYLE_RETRIEVAL_TOP_K. Without a query the full
+    catalog is returned.
+    """
+    snapshot = get_resource_snapshot()
+    persona_styles = snapshot.persona_styles(persona_name) if persona_name else ""
     default_params = get_default_song_params()
-    return SongResources(styles=styles, tags=tags, persona_styles=persona_styles, default_params=default_params)
+    if query is None:
+        styles, tags = snapshot.styles, snapshot.tags
+    else:
+        defaults = " ".join(str(default_params.get(name) or "") for name in ("genre", "mood", "instruments"))
+        styles, tags = select_resources(f"{query}\n{persona_styles}\n{defaults}")
+    return SongResources(
+        styles=styles,
+        tags=tags,
+        persona_styles=persona_styles,
+        default_params=default_params,
+        styles_text=snapshot.styles_text if styles is snapshot.styles else render(styles),
+        tags_text=snapshot.tags_text if tags is snapshot.tags else render(tags),
+    )
 
 
 def progress_steps(use_local: bool):
@@ -0,0 +1,71 @@
+"""
+Shared, long-lived HTTP connection pools for LLM providers.
+
+One keep-alive pool is kept per provider base URL (and API key) so wrappers stop
+building a fresh openai.OpenAI per instance and LiteLLM reuses connections.
+"""
+
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import httpx
+import openai
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_lock = threading.Lock()
+_sync_http: Optional[httpx.Client] = None
+_sync_openai: Dict[Tuple[str, str], openai.OpenAI] = {}
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=float(os.getenv("LLM_HTTP_KEEPALIVE_SECONDS", "60")),
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(float(os.getenv("LLM_HTTP_TIMEOUT", "600")), connect=10.0)
+
+
+def get_http_client() -> httpx.Client:
+    """Process-wide pooled sync HTTP client."""
+    global _sync_http
+    with _lock:
+        if _sync_http is None or _sync_http.is_closed:
+            _sync_http = httpx.Client(limits=_limits(), timeout=_timeout())
+        return _sync_http
+
+
+def get_openai_client(base_url: str, api_key: str) -> openai.OpenAI:
+    """Shared OpenAI-compatible client for a base URL, backed by the sync pool."""
+    key = (base_url, api_key)
+    http_client = get_http_client()
+    with _lock:
+        client = _sync_openai.get(key)
+        if client is None:
+            client = openai.OpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+            _sync_openai[key] = client
+        return client
+
+
+def configure_litellm_sessions() -> None:
+    """Point LiteLLM at the shared pool so completion() reuses connections."""
+    import litellm
+
+    if litellm.client_session is None or litellm.client_session.is_closed:
+        litellm.client_session = get_http_client()
+
+
+def close_pools() -> None:
+    """Close the sync pool and forget every cached client."""
+    global _sync_http
+    with _lock:
+        if _sync_http is not None:
+            _sync_http.close()
+            _sync_http = None
+        _sync_openai.clear()
@@ -0,0 +1,111 @@
+"""
+Per-job side store for the read-only inputs of a song generation.
+
+LangGraph copies and merges the graph state at every node transition, and a
+checkpointer serializes it. The request parameters, loaded resources (styles,
+tags, persona styles), prompts and callbacks never change during a job, so they
+live here in a JobContext keyed by job_id. SongState carries only the job_id
+handle plus the fields nodes actually write, which keeps per-transition copying
+flat no matter how large the catalog or how many request fields grow. It also
+lets song_master compile each workflow graph once: the module-level nodes find
+their job's inputs here rather than in per-job closures.
+
+generate_song() registers the context before invoking the graph and releases it
+when the run ends (job_context_scope); nodes look it up with job_context(state).
+"""
+
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from cancellation import CancellationToken
+from helpers import SongResources
+from prompt_registry import SongPrompts
+
+
+@dataclass(frozen=True)
+class JobContext:
+    """Everything a job's nodes read but never write."""
+    job_id: str
+    user_input: str
+    use_local: bool
+    resources: SongResources
+    song_name: Optional[str] = None
+    persona: Optional[str] = None
+    persona_name: Optional[str] = None
+    max_rounds: int = 3
+    score_threshold: float = 8.5
+    use_hookhouse: bool = True
+    # HookHouse request parameters
+    blend: Tuple[str, ...] = ()  # 2-3 musical styles (e.g., ("Southern Rock", "Gospel"))
+    mood_style: str = "dark"  # "dark" or "clean"
+    explicitness: str = "mature"  # "explicit" or "mature"
+    pov: Optional[str] = None  # "first-person", "third-person", etc.
+    setting: Optional[str] = None  # Time period, location, context
+    themes_include: Tuple[str, ...] = ()
+    themes_avoid: Tuple[str, ...] = ()
+    bpm: Optional[int] = None
+    time_signature: Optional[str] = None  # e.g., "4/4", "3/4"
+    key: Optional[str] = None  # Musical key (e.g., "C", "Am")
+    groove_texture: Optional[str] = None
+    choir_call_response: bool = False
+    # Per-job plumbing for the shared, compiled workflow graphs
+    prompts: Optional[SongPrompts] = None  # prompt set as of job start; later prompt reloads don't affect the job
+    progress_callback: Optional[Callable[[str, int, str], None]] = field(default=None, compare=False)
+    token_callback: Optional[Callable[[str, str], None]] = field(default=None, compare=False)
+    cancel_token: Optional[CancellationToken] = field(default=None, compare=False)
+
+
+class JobContextMissing(KeyError):
+    """No context is registered for the job_id carried in the graph state."""
+
+
+_contexts: Dict[str, JobContext] = {}
+_lock = threading.Lock()
+
+
+def register_job_context(context: JobContext) -> None:
+    with _lock:
+        _contexts[context.job_id] = context
+
+
+def get_job_context(job_id: str) -> JobContext:
+    context = _contexts.get(job_id)
+    if context is None:
+        raise JobContextMissing(f"No job context registered for job {job_id}")
+    return context
+
+
+def job_context_registered(job_id: str) -> bool:
+    """Whether a graph run for job_id is still in progress (its worker thread may outlive a cancelled task)."""
+    return job_id in _contexts
+
+
+def release_job_context(job_id: str) -> None:
+    with _lock:
+        _contexts.pop(job_id, None)
+
+
+def job_context(state: Dict[str, Any]) -> JobContext:
+    """
+    The context of the job a graph state belongs to.
+
+    Every node and router starts here, so this is also where a cancelled job
+    stops between nodes (raises cancellation.JobCancelled).
+    """
+    context = get_job_context(state["job_id"])
+    if context.cancel_token is not None:
+        context.cancel_token.raise_if_cancelled()
+    return context
+
+
+@contextmanager
+def job_context_scope(context: JobContext) -> Iterator[JobContext]:
+    """Register context for the duration of a graph run."""
+    register_job_context(context)
+    try:
+        yield context
+    finally:
+        release_job_context(context.job_id)
+
@@ -0,0 +1,142 @@
+"""
+Tolerant extraction of JSON objects from LLM responses.
+
+Structured nodes (scoring, triage, metadata, narrative, HookHouse review, image
+prompts) ask the model for a JSON object, but models wrap it in code fences, lead
+with prose or leave trailing commas. extract_json() scans the response for the
+first balanced {...} (respecting strings and escapes) that parses, and
+parse_json_response() validates it against the node's schema. When both fail,
+ai_functions.complete_json() spends one short repair call built by
+repair_prompt() instead of re-running the node.
+
+Outcomes are counted per schema and exposed through GET /api/config/parsing.
+"""
+
+import json
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Required top-level keys per schema and the JSON types their values may take
+SCHEMAS: Dict[str, Dict[str, Tuple[type, ...]]] = {
+    "score": {"score": (int, float, str)},
+    "triage": {"pass": (bool,), "issues": (list, str)},
+    "metadata": {"description": (str,), "suno_styles": (list, str)},
+    "narrative": {"best_bet": (dict,)},
+    "hookhouse_review": {"overall_score": (int, float, str), "pass_threshold": (bool,)},
+    "image_prompt": {"objects": (list,), "metadata": (dict,)},
+    "image_blueprint": {"global_scene": (dict,)},
+}
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+class JSONExtractionError(ValueError):
+    """No JSON object matching the expected schema could be recovered from a response."""
+
+
+def _balanced_objects(text: str) -> Iterator[str]:
+    """Yield every balanced {...} span in text, outermost first, in order of their opening brace."""
+    for start in (index for index, char in enumerate(text) if char == "{"):
+        depth = 0
+        in_string = False
+        escaped = False
+        for index in range(start, len(text)):
+            char = text[index]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == "{":
+                depth += 1
+            elif char == "}":
+                depth -= 1
+                if depth == 0:
+                    yield text[start:index + 1]
+                    break
+
+
+def _strip_trailing_commas(candidate: str) -> str:
+    """Drop commas directly before a closing bracket, leaving string contents untouched."""
+    parts = re.split(r'("(?:[^"\\]|\\.)*")', candidate)
+    return "".join(part if part.startswith('"') else _TRAILING_COMMA.sub(r"\1", part) for part in parts)
+
+
+def extract_json(text: str) -> Tuple[Dict[str, Any], bool]:
+    """
+    Return (obj, exact) for the first JSON object in text.
+
+    exact is True when the whole response was already valid JSON. Raises
+    JSONExtractionError when no balanced object in the response parses.
+    """
+    text = (text or "").strip()
+    try:
+        parsed = json.loads(text)
+        if isinstance(parsed, dict):
+            return parsed, True
+    except json.JSONDecodeError:
+        pass
+
+    for candidate in _balanced_objects(text):
+        for attempt in (candidate, _strip_trailing_commas(candidate)):
+            try:
+                parsed = json.loads(attempt)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(parsed, dict):
+                return parsed, False
+    raise JSONExtractionError("No JSON object found in response")
+
+
+def validate(obj: Dict[str, Any], schema: Optional[str]) -> List[str]:
+    """Return the schema violations of obj (empty when it conforms or no schema is registered)."""
+    errors = []
+    for key, types in SCHEMAS.get(schema or "", {}).items():
+        if key not in obj:
+            errors.append(f"missing key '{key}'")
+        elif not isinstance(obj[key], types) or (bool not in types and isinstance(obj[key], bool)):
+            errors.append(f"'{key}' should be {' or '.join(t.__name__ for t in types)}")
+    return errors
+
+
+def parse_json_response(raw: str, schema: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+    """Extract and validate the JSON object in raw; returns (obj, exact) or raises JSONExtractionError."""
+    obj, exact = extract_json(raw)
+    errors = validate(obj, schema)
+    if errors:
+        raise JSONExtractionError("; ".join(errors))
+    return obj, exact
+
+
+def repair_prompt(raw: str, schema: Optional[str], error: Exception) -> str:
+    """Short prompt asking the model to turn a malformed response into the expected JSON object."""
+    keys = ", ".join(SCHEMAS.get(schema or "", {}))
+    expected = f"a single JSON object with at least the keys: {keys}" if keys else "a single JSON object"
+    return (
+        f"The text below was supposed to be {expected}, but it could not be used ({error}).\n"
+        "Return only the corrected JSON object: keep the original content, fix the syntax and fill any "
+        "missing keys from the text. No commentary, no code fences.\n\n"
+        f"Text:\n{raw}"
+    )
+
+
+# Parse outcomes per schema: exact, extracted (needed scanning), repaired, failed
+_stats: Dict[str, Counter] = defaultdict(Counter)
+_stats_lock = threading.Lock()
+
+
+def record_parse(schema: Optional[str], outcome: str) -> None:
+    with _stats_lock:
+        _stats[schema or "unknown"][outcome] += 1
+
+
+def parse_stats() -> Dict[str, Dict[str, int]]:
+    """Parse outcome counters per schema."""
+    with _stats_lock:
+        return {schema: dict(counts) for schema, counts in _stats.items()}
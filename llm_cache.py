@@ -0,0 +1,314 @@
+"""
+Persistent, content-addressed cache for LLM responses.
+
+Responses are stored in a small SQLite database keyed on provider, model,
+temperature, max_tokens, JSON mode and a hash of the fully formatted prompt, so
+repeated prompts (regression runs, identical requests) are served from disk
+instead of paying provider latency and cost again.
+
+Jobs that explicitly want new output (regenerated lyrics, resumed jobs) run under
+cache_bypass(), and structured replies are only stored once they parse (the
+validate argument), so neither a previous song nor a malformed answer is replayed.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class ResponseCache:
+    """SQLite-backed response store with TTL and size-based eviction."""
+
+    # Run size/TTL pruning every N writes rather than on every write
+    PRUNE_EVERY = 50
+
+    def __init__(self, path: str, ttl_seconds: float, max_bytes: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.writes = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(
+        provider: str, model: str, temperature: float, max_tokens: int, prompt: str, variant: Optional[Any] = None,
+        stop: Sequence[str] = (), json_mode: bool = False,
+    ) -> str:
+        """Build the content address for a request."""
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        parts = [provider, model, repr(float(temperature)), str(max_tokens), prompt_hash]
+        if stop:
+            parts.append(f"stop={list(stop)!r}")
+        if json_mode:
+            parts.append("json_mode")
+        if variant is not None:
+            parts.append(f"variant={variant}")
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str, validate: Optional[Callable[[str], Any]] = None) -> Optional[str]:
+        """The cached response for key; an entry that fails validate counts as a miss and is not served."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            response, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                self.misses += 1
+                return None
+            if not _valid(response, validate):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return response
+
+    def record_bypass(self) -> None:
+        with self._lock:
+            self.bypassed += 1
+
+    def set(self, key: str, response: str) -> None:
+        if not isinstance(response, str):
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, response, len(response.encode("utf-8")), now, now),
+            )
+            self._conn.commit()
+            self.writes += 1
+            self._writes_since_prune += 1
+            if self._writes_since_prune >= self.PRUNE_EVERY:
+                self._prune_locked(now)
+
+    def prune(self) -> None:
+        with self._lock:
+            self._prune_locked(time.time())
+
+    def _prune_locked(self, now: float) -> None:
+        self._writes_since_prune = 0
+        if self.ttl_seconds:
+            cursor = self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            self.evictions += max(cursor.rowcount, 0)
+        if self.max_bytes:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                # Drop least recently used entries until we are back under budget
+                rows = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at ASC").fetchall()
+                doomed = []
+                for key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    doomed.append((key,))
+                    total -= size
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+                self.evictions += len(doomed)
+        self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, total_bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "enabled": True,
+                "path": self.path,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": entries,
+                "size_bytes": total_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+# Set for jobs that must not be served from the cache (regenerate, resume); see cache_bypass()
+_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+
+@contextmanager
+def cache_bypass(enabled: bool = True) -> Iterator[None]:
+    """
+    Skip cache lookups for every LLM call made in this context.
+
+    Fresh responses are still stored. Regenerating a song or resuming a failed job
+    runs under this, so it gets new output instead of replaying the previous run.
+    """
+    token = _bypass.set(enabled)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def cache_bypassed() -> bool:
+    return _bypass.get()
+
+
+class CachedLLM:
+    """Wraps any client exposing invoke(prompt) -> str with the response cache."""
+
+    def __init__(
+        self, llm, provider: str, model: str, temperature: float, max_tokens: int, cache: Optional[ResponseCache],
+        stop: Sequence[str] = (), json_mode: bool = False,
+    ):
+        self.llm = llm
+        self.provider = provider
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.cache = cache
+        self.stop = tuple(stop)
+        self.json_mode = json_mode
+
+    def _key(self, prompt: str, cache_variant: Optional[Any]) -> str:
+        return self.cache.make_key(
+            self.provider, self.model, self.temperature, self.max_tokens, prompt, cache_variant, self.stop, self.json_mode
+        )
+
+    def _lookup(self, key: str, bypass_cache: bool, validate: Optional[Callable[[str], Any]]) -> Optional[str]:
+        if bypass_cache or _bypass.get():
+            self.cache.record_bypass()
+            return None
+        return self.cache.get(key, validate)
+
+    def _store(self, key: str, response: str, validate: Optional[Callable[[str], Any]]) -> None:
+        if response and _valid(response, validate):
+            self.cache.set(key, response)
+
+    def invoke(
+        self, prompt: str, bypass_cache: bool = False, cache_variant: Optional[Any] = None,
+        validate: Optional[Callable[[str], Any]] = None,
+    ) -> str:
+        """
+        Invoke the wrapped client, serving verbatim repeats from the cache.
+
+        Args:
+            prompt: Fully formatted prompt
+            bypass_cache: Skip the cache lookup and always call the provider (the fresh response is still stored);
+                also in effect for the whole context under cache_bypass()
+            cache_variant: Extra key component so intentionally repeated prompts (e.g. parallel reviewers)
+                keep distinct cache entries
+            validate: Called with the response; it is only cached (and a cached entry only served) if this
+                doesn't raise, so malformed structured output is never replayed
+        """
+        if self.cache is None:
+            return self.llm.invoke(prompt)
+
+        key = self._key(prompt, cache_variant)
+        cached = self._lookup(key, bypass_cache, validate)
+        if cached is not None:
+            return cached
+
+        response = self.llm.invoke(prompt)
+        self._store(key, response, validate)
+        return response
+
+    def stream(self, prompt: str, bypass_cache: bool = False, cache_variant: Optional[Any] = None) -> Iterator[str]:
+        """Yield response tokens as they arrive; cache hits are yielded as a single chunk."""
+        key = None
+        if self.cache is not None:
+            key = self._key(prompt, cache_variant)
+            cached = self._lookup(key, bypass_cache, None)
+            if cached is not None:
+                yield cached
+                return
+
+        if not hasattr(self.llm, "stream"):
+            response = self.llm.invoke(prompt)
+            if response:
+                yield response
+        else:
+            parts = []
+            for token in self.llm.stream(prompt):
+                text = token if isinstance(token, str) else getattr(token, "content", str(token))
+                parts.append(text)
+                yield text
+            response = "".join(parts)
+
+        if key is not None:
+            self._store(key, response, None)
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+
+def _valid(response: str, validate: Optional[Callable[[str], Any]]) -> bool:
+    if validate is None:
+        return True
+    try:
+        validate(response)
+    except Exception:
+        return False
+    return True
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the process-wide response cache, or None when caching is disabled."""
+    global _cache
+    if os.getenv("LLM_CACHE_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(
+                path=os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm_responses.sqlite3")),
+                ttl_seconds=float(os.getenv("LLM_CACHE_TTL_HOURS", "168")) * 3600,
+                max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024),
+            )
+        return _cache
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters and size of the response cache."""
+    cache = get_response_cache()
+    if cache is None:
+        return {"enabled": False}
+    return cache.stats()
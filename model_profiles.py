@@ -0,0 +1,106 @@
+"""
+Per-node model profiles.
+
+Each graph node asks ai_functions.get_llm(use_local, node=...) for its client. The
+node's profile overrides the provider defaults (model, max_tokens, temperature,
+stop sequences) so short JSON calls such as scoring and triage can run on a small
+fast model with a tight token budget while drafting stays on the flagship.
+
+Profiles are configured through env (or PUT /api/config/profiles):
+
+    LLM_PROFILE_<NODE>_MODEL         remote model override (same format as the provider's *_MODEL)
+    LLM_PROFILE_<NODE>_LOCAL_MODEL   model override in --local (LM Studio) mode
+    LLM_PROFILE_<NODE>_MAX_TOKENS
+    LLM_PROFILE_<NODE>_TEMPERATURE
+    LLM_PROFILE_<NODE>_STOP          a single stop sequence, or a JSON list of them
+
+Unset fields fall back to the built-in defaults below, then to the provider settings.
+"""
+
+import json
+import os
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+@dataclass(frozen=True)
+class ModelProfile:
+    """Overrides applied to the provider snapshot for one node; None keeps the provider setting."""
+    model: Optional[str] = None
+    local_model: Optional[str] = None
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+    stop: Tuple[str, ...] = ()
+
+
+# Built-in defaults: long-form nodes (including the HookHouse narrative and image prompt)
+# keep the provider settings, short JSON/verdict nodes get tight budgets
+DEFAULT_PROFILES: Dict[str, ModelProfile] = {
+    "draft": ModelProfile(),
+    "review": ModelProfile(),
+    "critic": ModelProfile(),
+    "revise": ModelProfile(),
+    "preflight": ModelProfile(max_tokens=2048),
+    "score": ModelProfile(max_tokens=256, temperature=0.0),
+    "triage": ModelProfile(max_tokens=1024, temperature=0.0),
+    "narrative": ModelProfile(),
+    "funksmith": ModelProfile(),
+    "metadata": ModelProfile(max_tokens=2048),
+    "image_prompt": ModelProfile(),
+    "captions": ModelProfile(max_tokens=1024),
+    "json_repair": ModelProfile(max_tokens=4096, temperature=0.0),
+}
+
+PROFILE_FIELDS = ("model", "local_model", "max_tokens", "temperature", "stop")
+
+
+def env_key(node: str, field_name: str) -> str:
+    return f"LLM_PROFILE_{node.upper()}_{field_name.upper()}"
+
+
+def _parse_stop(raw: str) -> Tuple[str, ...]:
+    raw = raw.strip()
+    if not raw:
+        return ()
+    if raw.startswith("["):
+        try:
+            return tuple(str(item) for item in json.loads(raw))
+        except json.JSONDecodeError:
+            pass
+    return (raw,)
+
+
+def get_profile(node: Optional[str]) -> ModelProfile:
+    """Return the effective profile for node (built-in default merged with env overrides)."""
+    if not node:
+        return ModelProfile()
+    if node not in DEFAULT_PROFILES:
+        raise ValueError(f"Unknown model profile node: {node}")
+    base = DEFAULT_PROFILES[node]
+
+    model = os.getenv(env_key(node, "model")) or base.model
+    local_model = os.getenv(env_key(node, "local_model")) or base.local_model
+    max_tokens = os.getenv(env_key(node, "max_tokens"))
+    temperature = os.getenv(env_key(node, "temperature"))
+    stop = os.getenv(env_key(node, "stop"))
+    return ModelProfile(
+        model=model,
+        local_model=local_model,
+        max_tokens=int(max_tokens) if max_tokens else base.max_tokens,
+        temperature=float(temperature) if temperature else base.temperature,
+        stop=_parse_stop(stop) if stop is not None else base.stop,
+    )
+
+
+def all_profiles() -> Dict[str, Dict[str, Any]]:
+    """Effective profile for every node, for the config API."""
+    profiles = {}
+    for node in DEFAULT_PROFILES:
+        profile = asdict(get_profile(node))
+        profile["stop"] = list(profile["stop"])
+        profiles[node] = profile
+    return profiles
@@ -0,0 +1,157 @@
+"""
+Process-wide registry of compiled prompt templates.
+
+ai_functions.build_prompts() reads every file in prompts/ and builds the
+LangChain PromptTemplates; doing that per job is wasted disk and parse work.
+get_prompts() builds the set once and hands the same objects to every job,
+rebuilding only when a prompt file's mtime changes (PROMPT_HOT_RELOAD, checked at
+most every PROMPT_RELOAD_CHECK_SECONDS) or when reload_prompts() is called
+(POST /api/config/prompts/reload).
+
+Templates are immutable once built: ai_functions parses each template into its
+static and per-call segments once (see ai_functions._template_segments) so the
+static text is not re-split or re-joined on every call.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Files read by ai_functions.build_prompts(), resolved like helpers.read_prompt (.txt, then .md)
+PROMPT_NAMES = (
+    "song_drafter",
+    "song_review",
+    "song_critic",
+    "song_preflight",
+    "narrative_development",
+    "hookhouse_draft",
+    "hookhouse_review",
+    "funksmith_critique",
+    "hookhouse_metadata",
+    "hookhouse_image",
+    "caption_generation",
+)
+
+
+class SongPrompts(NamedTuple):
+    """The compiled prompt set, in ai_functions.build_prompts() order (still unpacks like the tuple)."""
+    drafter: Any
+    review: Any
+    critic: Any
+    preflight: Any
+    revision: Any
+    scoring: Any
+    metadata: Any
+    preflight_triage: Any
+    # HookHouse prompts (raw strings)
+    narrative: Any
+    hookhouse_draft: Any
+    hookhouse_review: Any
+    funksmith: Any
+    hookhouse_metadata: Any
+    hookhouse_image: Any
+    caption: Any
+
+
+def _prompt_path(name: str) -> Optional[str]:
+    for ext in (".txt", ".md"):
+        path = f"prompts/{name}{ext}"
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _fingerprint() -> Tuple[Tuple[str, Optional[str], Optional[float]], ...]:
+    """(name, path, mtime) for every prompt file; any change means the set must be rebuilt."""
+    entries = []
+    for name in PROMPT_NAMES:
+        path = _prompt_path(name)
+        try:
+            mtime = os.path.getmtime(path) if path else None
+        except OSError:
+            mtime = None
+        entries.append((name, path, mtime))
+    return tuple(entries)
+
+
+class PromptRegistry:
+    """Holds the compiled prompt set and rebuilds it when the files on disk change."""
+
+    def __init__(self):
+        self._prompts: Optional[SongPrompts] = None
+        self._fingerprint: Optional[Tuple] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.version = 0
+        self.loaded_at: Optional[float] = None
+        self.reloads = 0
+
+    def _hot_reload(self) -> bool:
+        return os.getenv("PROMPT_HOT_RELOAD", "true").lower() in ("1", "true", "yes")
+
+    def _due_for_check(self) -> bool:
+        interval = float(os.getenv("PROMPT_RELOAD_CHECK_SECONDS", "2"))
+        return self._hot_reload() and time.monotonic() - self._checked_at >= interval
+
+    def _load_locked(self, fingerprint: Tuple) -> None:
+        from ai_functions import build_prompts
+
+        self._prompts = SongPrompts(*build_prompts())
+        self._fingerprint = fingerprint
+        self.version += 1
+        self.loaded_at = time.time()
+
+    def get(self) -> SongPrompts:
+        """The current prompt set."""
+        prompts = self._prompts
+        if prompts is not None and not self._due_for_check():
+            return prompts
+        with self._lock:
+            if self._prompts is None or self._due_for_check():
+                self._checked_at = time.monotonic()
+                fingerprint = _fingerprint()
+                if self._prompts is None or fingerprint != self._fingerprint:
+                    if self._prompts is not None:
+                        self.reloads += 1
+                    self._load_locked(fingerprint)
+            return self._prompts
+
+    def reload(self) -> Dict[str, Any]:
+        """Rebuild the prompt set from disk now."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            if self._prompts is not None:
+                self.reloads += 1
+            self._load_locked(_fingerprint())
+        return self.stats()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "hot_reload": self._hot_reload(),
+            "files": {name: path for name, path, _mtime in (self._fingerprint or ())},
+        }
+
+
+_registry = PromptRegistry()
+
+
+def get_prompts() -> SongPrompts:
+    """Compiled prompts shared by every job (same order as ai_functions.build_prompts())."""
+    return _registry.get()
+
+
+def reload_prompts() -> Dict[str, Any]:
+    """Force a rebuild from prompts/ and return the registry stats."""
+    return _registry.reload()
+
+
+def prompt_stats() -> Dict[str, Any]:
+    return _registry.stats()
@@ -0,0 +1,242 @@
+"""
+Provider health tracking, circuit breakers and failover across a provider chain.
+
+Each provider/model seen by FailoverLLM gets a ProviderHealth with a rolling
+window of recent calls (latency and outcome) and a circuit breaker:
+
+- closed: calls flow normally
+- open: the provider failed repeatedly; calls skip it until the cooldown ends
+- half_open: after the cooldown a single trial call is let through; success closes
+  the breaker, failure re-opens it
+
+FailoverLLM holds one client per provider in LLM_PROVIDER_CHAIN and, for every
+call, tries them in chain order ("ordered") or fastest-p50-first ("fastest",
+LLM_PROVIDER_ROUTING), skipping providers whose breaker is open. health_table()
+publishes latency percentiles, error rates and breaker states for /api/config.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from rate_limiter import error_status
+
+load_dotenv()
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Request-shaped errors: fail over (another provider may accept the request) but do not blame the provider
+_REQUEST_ERRORS = (400, 404, 413, 422)
+
+
+class ProviderUnavailable(RuntimeError):
+    """Every provider in the chain is failing or has an open breaker."""
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class ProviderHealth:
+    """Rolling latency/error window and circuit breaker for one provider/model."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.window = int(os.getenv("LLM_HEALTH_WINDOW", "50"))
+        self.error_rate_threshold = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+        self.min_calls = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+        self.consecutive_threshold = int(os.getenv("LLM_BREAKER_CONSECUTIVE_FAILURES", "3"))
+        self.cooldown = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+        self.samples: Deque[Tuple[float, bool]] = deque(maxlen=self.window)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.consecutive_failures = 0
+        self.trial_in_flight = False
+        self.calls = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go to this provider now (claims the half-open trial slot)."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                self.trial_in_flight = False
+            if self.state == HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record(self, latency: Optional[float], ok: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            self.samples.append((latency or 0.0, ok))
+            if ok:
+                self.consecutive_failures = 0
+                if self.state != CLOSED:
+                    self.state = CLOSED
+                    self.samples.clear()
+                    self.samples.append((latency or 0.0, ok))
+                self.trial_in_flight = False
+                return
+
+            self.failures += 1
+            self.consecutive_failures += 1
+            errors = sum(1 for _, sample_ok in self.samples if not sample_ok)
+            tripped = self.consecutive_failures >= self.consecutive_threshold or (
+                len(self.samples) >= self.min_calls and errors / len(self.samples) >= self.error_rate_threshold
+            )
+            if self.state == HALF_OPEN or tripped:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """Give back a half-open trial slot that ended without a verdict (request-shaped error, cancellation)."""
+        with self._lock:
+            self.trial_in_flight = False
+
+    def latency(self, fraction: float) -> Optional[float]:
+        with self._lock:
+            latencies = [latency for latency, ok in self.samples if ok]
+        return _percentile(latencies, fraction)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = list(self.samples)
+            state = self.state
+            if state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                state = HALF_OPEN
+        latencies = [latency for latency, ok in samples if ok]
+        errors = sum(1 for _, ok in samples if not ok)
+        p50 = _percentile(latencies, 0.5)
+        p95 = _percentile(latencies, 0.95)
+        return {
+            "provider": self.name,
+            "state": state,
+            "p50_seconds": round(p50, 3) if p50 is not None else None,
+            "p95_seconds": round(p95, 3) if p95 is not None else None,
+            "error_rate": round(errors / len(samples), 3) if samples else 0.0,
+            "window_calls": len(samples),
+            "consecutive_failures": self.consecutive_failures,
+            "calls": self.calls,
+            "failures": self.failures,
+        }
+
+
+_health: Dict[str, ProviderHealth] = {}
+_health_lock = threading.Lock()
+
+
+def get_health(name: str) -> ProviderHealth:
+    with _health_lock:
+        health = _health.get(name)
+        if health is None:
+            health = ProviderHealth(name)
+            _health[name] = health
+        return health
+
+
+def health_table() -> List[Dict[str, Any]]:
+    """Latency percentiles, error rate and breaker state for every provider seen so far."""
+    with _health_lock:
+        entries = list(_health.values())
+    return [health.stats() for health in entries]
+
+
+def routing_mode() -> str:
+    mode = os.getenv("LLM_PROVIDER_ROUTING", "ordered").lower()
+    return mode if mode in ("ordered", "fastest") else "ordered"
+
+
+class FailoverLLM:
+    """Routes each call to the first healthy client of a provider chain, failing over on errors."""
+
+    def __init__(self, clients: List[Tuple[str, Any]], routing: str = "ordered"):
+        self.clients = clients
+        self.routing = routing
+
+    def _candidates(self) -> List[Tuple[str, Any, ProviderHealth]]:
+        entries = [(name, client, get_health(name)) for name, client in self.clients]
+        if self.routing == "fastest":
+            # Providers without latency samples sort first so each gets measured
+            position = {name: index for index, (name, _, _) in enumerate(entries)}
+            entries.sort(key=lambda entry: (entry[2].latency(0.5) or 0.0, position[entry[0]]))
+        return entries
+
+    @staticmethod
+    def _settle(health: ProviderHealth, started: float, exc: Optional[BaseException]) -> None:
+        if exc is None:
+            health.record(time.monotonic() - started, True)
+        elif error_status(exc) in _REQUEST_ERRORS:
+            health.release_trial()
+        else:
+            health.record(None, False)
+
+    def _unavailable(self, errors: List[str]) -> ProviderUnavailable:
+        detail = "; ".join(errors) or "every breaker is open"
+        return ProviderUnavailable(f"No provider in the chain could serve the request ({detail})")
+
+    def invoke(self, prompt: str, **kwargs) -> str:
+        errors, last_exc = [], None
+        for name, client, health in self._candidates():
+            if not health.allow():
+                continue
+            started = time.monotonic()
+            try:
+                result = client.invoke(prompt, **kwargs)
+            except Exception as exc:
+                self._settle(health, started, exc)
+                errors.append(f"{name}: {exc}")
+                last_exc = exc
+                continue
+            except BaseException:
+                # Job cancelled (JobCancelled, CancelledError): no verdict on the provider
+                health.release_trial()
+                raise
+            self._settle(health, started, None)
+            return result
+        raise self._unavailable(errors) from last_exc
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        errors, last_exc = [], None
+        for name, client, health in self._candidates():
+            if not health.allow():
+                continue
+            started = time.monotonic()
+            emitted = False
+            try:
+                for token in client.stream(prompt, **kwargs):
+                    emitted = True
+                    yield token
+            except Exception as exc:
+                self._settle(health, started, exc)
+                if emitted:
+                    # Tokens already reached the caller; switching providers mid-answer would splice two responses
+                    raise
+                errors.append(f"{name}: {exc}")
+                last_exc = exc
+                continue
+            except BaseException:
+                # Job cancelled, or the caller closed the stream (GeneratorExit): no verdict on the provider
+                health.release_trial()
+                raise
+            self._settle(health, started, None)
+            return
+        raise self._unavailable(errors) from last_exc
+
+    def __getattr__(self, name):
+        # Attributes such as provider/model describe the primary (first) client in the chain
+        return getattr(self.clients[0][1], name)
@@ -0,0 +1,309 @@
+"""
+Process-wide rate limiting and adaptive concurrency for LLM providers.
+
+Every client built by ai_functions.get_llm() is wrapped in RateLimitedLLM, which
+shares one ProviderLimiter per (provider, model):
+
+- token buckets for requests/min and tokens/min (configured via env, 0 = unlimited)
+- an AIMD concurrency controller that halves its limit on 429/5xx responses and
+  grows it additively while latency stays healthy
+- bounded retries with backoff (honouring Retry-After) for throttled/transient errors
+
+limiter_stats() publishes current limits and queue depth for tuning.
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from cancellation import abortable, cancellable_sleep, check_cancelled
+
+load_dotenv()
+
+
+def _env_number(name: str, provider: str, default: str) -> float:
+    """Read NAME_<PROVIDER> with fallback to NAME."""
+    return float(os.getenv(f"{name}_{provider.upper().replace('-', '_')}", os.getenv(name, default)))
+
+
+class TokenBucket:
+    """Per-minute token bucket that allows debt, so oversized requests still go through eventually."""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.per_minute / 60.0)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take amount tokens and return how many seconds the caller must wait before proceeding."""
+        if self.per_minute <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens * 60.0 / self.per_minute
+
+    def charge(self, amount: float) -> None:
+        """Debit tokens after the fact (e.g. output tokens once a response is known)."""
+        if self.per_minute <= 0 or amount <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= amount
+
+    def available(self) -> Optional[float]:
+        if self.per_minute <= 0:
+            return None
+        with self._lock:
+            self._refill(time.monotonic())
+            return round(self.tokens, 1)
+
+
+class AdaptiveConcurrency:
+    """AIMD controller for the number of in-flight requests."""
+
+    def __init__(self, initial: float, minimum: float, maximum: float, latency_target: float):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self.waiting = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self) -> None:
+        with self._cond:
+            self.waiting += 1
+            try:
+                while self.in_flight >= int(self.limit):
+                    self._cond.wait(timeout=1.0)
+                    check_cancelled()
+                self.in_flight += 1
+            finally:
+                self.waiting -= 1
+
+    def release(self, latency: Optional[float], overloaded: bool) -> None:
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            now = time.monotonic()
+            if overloaded:
+                # Multiplicative decrease, at most once per latency window so a burst of 429s halves once
+                if now - self._last_decrease > min(self.latency_target, 5.0):
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self._last_decrease = now
+            elif latency is not None and latency <= self.latency_target:
+                # Additive increase: roughly +1 slot per `limit` healthy completions
+                self.limit = min(self.maximum, self.limit + 1.0 / max(self.limit, 1.0))
+            self._cond.notify_all()
+
+
+def error_status(exc: BaseException) -> Optional[int]:
+    """Find an HTTP status code anywhere in an exception chain."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        code = getattr(exc, "status_code", None)
+        if isinstance(code, int):
+            return code
+        message = str(exc).lower()
+        if "429" in message or "rate limit" in message or "ratelimit" in message:
+            return 429
+        exc = exc.__cause__ or exc.__context__
+    return None
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None) or getattr(exc.__cause__, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class ProviderLimiter:
+    """Shared limits for one provider/model pair."""
+
+    def __init__(self, provider: str, model: str):
+        self.provider = provider
+        self.model = model
+        self.requests = TokenBucket(_env_number("LLM_RATE_LIMIT_RPM", provider, "0"))
+        self.tokens = TokenBucket(_env_number("LLM_RATE_LIMIT_TPM", provider, "0"))
+        self.concurrency = AdaptiveConcurrency(
+            initial=_env_number("LLM_CONCURRENCY_INITIAL", provider, "8"),
+            minimum=_env_number("LLM_CONCURRENCY_MIN", provider, "1"),
+            maximum=_env_number("LLM_CONCURRENCY_MAX", provider, "32"),
+            latency_target=_env_number("LLM_LATENCY_TARGET_SECONDS", provider, "60"),
+        )
+        self.max_retries = int(_env_number("LLM_RATE_LIMIT_RETRIES", provider, "4"))
+        self.throttled = 0
+        self.retries = 0
+        # Guards the counters above, which every job thread updates
+        self._stats_lock = threading.Lock()
+
+    def _admission_wait(self, estimated_tokens: float) -> float:
+        return max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        retry_after = _retry_after(exc)
+        if retry_after is not None:
+            return retry_after
+        return min(60.0, 2 ** attempt) + random.uniform(0, 1)
+
+    def _classify(self, exc: BaseException) -> Tuple[bool, bool]:
+        """Return (overloaded, retryable) for a failed call."""
+        code = error_status(exc)
+        if code == 429:
+            with self._stats_lock:
+                self.throttled += 1
+            return True, True
+        if code is not None and code >= 500:
+            return True, True
+        return False, False
+
+    def call(self, fn: Callable[[], Any], estimated_tokens: float, max_retries: Optional[int] = None) -> Any:
+        """Run fn under the limits, retrying throttled/transient errors up to max_retries (default LLM_RATE_LIMIT_RETRIES)."""
+        max_retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            check_cancelled()
+            wait = self._admission_wait(estimated_tokens)
+            if wait > 0:
+                cancellable_sleep(wait)
+            self.concurrency.acquire()
+            started = time.monotonic()
+            try:
+                result = fn()
+            except Exception as exc:
+                overloaded, retryable = self._classify(exc)
+                self.concurrency.release(None, overloaded)
+                if not retryable or attempt >= max_retries:
+                    raise
+                attempt += 1
+                with self._stats_lock:
+                    self.retries += 1
+                cancellable_sleep(self._backoff(attempt, exc))
+                continue
+            except BaseException:
+                # Cancelled mid-call: give the slot back without judging the provider
+                self.concurrency.release(None, False)
+                raise
+            self.concurrency.release(time.monotonic() - started, False)
+            if isinstance(result, str):
+                self.tokens.charge(len(result) / 4)
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "provider": self.provider,
+            "model": self.model,
+            "requests_per_minute": self.requests.per_minute or None,
+            "requests_available": self.requests.available(),
+            "tokens_per_minute": self.tokens.per_minute or None,
+            "tokens_available": self.tokens.available(),
+            "concurrency_limit": int(self.concurrency.limit),
+            "concurrency_limit_exact": round(self.concurrency.limit, 2),
+            "in_flight": self.concurrency.in_flight,
+            "queue_depth": self.concurrency.waiting,
+            "throttled": self.throttled,
+            "retries": self.retries,
+        }
+
+
+_limiters: Dict[Tuple[str, str], ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider: str, model: str) -> ProviderLimiter:
+    key = (provider, model)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = ProviderLimiter(provider, model)
+            _limiters[key] = limiter
+        return limiter
+
+
+def limiter_stats() -> list:
+    """Current limits, in-flight counts and queue depth for every provider/model seen so far."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return [limiter.stats() for limiter in limiters]
+
+
+class RateLimitedLLM:
+    """
+    Routes a client's invoke/stream calls through the shared provider limiter.
+
+    max_retries overrides the limiter's retry budget for this client; members of a
+    failover chain use a small one so a degraded provider hands over quickly.
+    """
+
+    def __init__(self, llm, provider: str, model: str, max_retries: Optional[int] = None):
+        self.llm = llm
+        self.limiter = get_limiter(provider, model)
+        self.max_retries = max_retries
+
+    @staticmethod
+    def _estimate_tokens(prompt: str) -> float:
+        # ~4 characters per token; output tokens are charged once the response is known
+        return len(prompt) / 4
+
+    def invoke(self, prompt: str) -> str:
+        # abortable: a cancelled job stops waiting at once. The request itself runs until the provider
+        # answers (bounded by LLM_HTTP_TIMEOUT) and keeps its limiter slot, since it really is in flight
+        return abortable(lambda: self.limiter.call(lambda: self.llm.invoke(prompt), self._estimate_tokens(prompt), self.max_retries))
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        limiter = self.limiter
+        check_cancelled()
+        wait = limiter._admission_wait(self._estimate_tokens(prompt))
+        if wait > 0:
+            cancellable_sleep(wait)
+        limiter.concurrency.acquire()
+        started = time.monotonic()
+        emitted = 0
+        overloaded = False
+        try:
+            source = self.llm.stream(prompt) if hasattr(self.llm, "stream") else iter([self.llm.invoke(prompt)])
+            try:
+                for token in source:
+                    # Closing the source on cancel tears down the HTTP stream, so generation stops server-side too
+                    check_cancelled()
+                    emitted += len(token) if isinstance(token, str) else 0
+                    yield token
+            finally:
+                close = getattr(source, "close", None)
+                if close is not None:
+                    close()
+        except Exception as exc:
+            overloaded, _ = limiter._classify(exc)
+            raise
+        finally:
+            limiter.concurrency.release(None if overloaded else time.monotonic() - started, overloaded)
+            limiter.tokens.charge(emitted / 4)
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
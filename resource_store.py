@@ -0,0 +1,172 @@
+"""
+Versioned, read-only snapshot of the song resources on disk.
+
+load_resources() used to re-read styles/styles.json (and re-serialize its
+suno_genres), every file in tags/ and the persona file on every job, and
+generate_hookhouse_metadata re-read resources/excluded_styles.txt on every call.
+get_resource_snapshot() loads all of it once into an immutable ResourceSnapshot
+shared by every thread, together with the prompt-ready renderings of the full
+catalog (styles_text, tags_text) so nothing is str()-ed per call.
+
+When a tracked file changes (mtime fingerprint, checked at most every
+RESOURCE_RELOAD_CHECK_SECONDS) a complete new snapshot is built and swapped in
+with a single reference assignment; jobs that already hold the previous snapshot
+keep using it unchanged. reload_resources() forces a rebuild.
+"""
+
+import glob
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_TRACKED_GLOBS = (
+    "styles/styles.json",
+    "tags/*.txt",
+    "personas/*.md",
+    "resources/excluded_styles.txt",
+    "resources/banned_language.txt",
+)
+
+
+def render(mapping: Mapping[str, str]) -> str:
+    """Prompt rendering of a styles/tags mapping (identical to str() of the plain dict)."""
+    return str(dict(mapping))
+
+
+@dataclass(frozen=True)
+class ResourceSnapshot:
+    """Every static song resource at one point in time; never mutated after construction."""
+    version: int
+    styles: Mapping[str, str]
+    tags: Mapping[str, str]
+    styles_text: str
+    tags_text: str
+    personas: Mapping[str, str]  # persona file path -> "Persona styles" text
+    excluded_styles: Tuple[str, ...]
+    excluded_styles_sample: str  # first 50 excluded styles, as sent to the HookHouse metadata prompt
+    banned_language: Tuple[str, ...]
+    loaded_at: float = field(default_factory=time.time)
+
+    def persona_styles(self, persona_name: str) -> str:
+        """Persona styles for a persona name or path; files outside personas/ are read on demand."""
+        from helpers import read_persona, resolve_persona_file
+
+        persona_file = resolve_persona_file(persona_name)
+        if not persona_file:
+            return ""
+        cached = self.personas.get(os.path.normpath(persona_file))
+        return cached if cached is not None else read_persona(persona_name)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "style_categories": len(self.styles),
+            "tag_files": len(self.tags),
+            "personas": len(self.personas),
+            "excluded_styles": len(self.excluded_styles),
+            "banned_language": len(self.banned_language),
+            "styles_chars": len(self.styles_text),
+            "tags_chars": len(self.tags_text),
+        }
+
+
+def _fingerprint() -> Tuple[Tuple[str, float], ...]:
+    entries = []
+    for pattern in _TRACKED_GLOBS:
+        for path in sorted(glob.glob(pattern)):
+            try:
+                entries.append((path, os.path.getmtime(path)))
+            except OSError:
+                continue
+    return tuple(entries)
+
+
+def _build(version: int) -> ResourceSnapshot:
+    from helpers import read_banned_language, read_excluded_styles, read_persona, read_styles, read_tags
+
+    styles = read_styles()
+    tags = read_tags()
+    personas = {}
+    for path in sorted(glob.glob("personas/*.md")):
+        personas[os.path.normpath(path)] = read_persona(path)
+    excluded = tuple(read_excluded_styles())
+    return ResourceSnapshot(
+        version=version,
+        styles=MappingProxyType(styles),
+        tags=MappingProxyType(tags),
+        styles_text=render(styles),
+        tags_text=render(tags),
+        personas=MappingProxyType(personas),
+        excluded_styles=excluded,
+        excluded_styles_sample=", ".join(excluded[:50]),
+        banned_language=tuple(read_banned_language()),
+    )
+
+
+class ResourceStore:
+    """Holds the current snapshot and swaps in a rebuilt one when the files change."""
+
+    def __init__(self):
+        self._snapshot: Optional[ResourceSnapshot] = None
+        self._fingerprint: Optional[Tuple] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def _due_for_check(self) -> bool:
+        if os.getenv("RESOURCE_HOT_RELOAD", "true").lower() not in ("1", "true", "yes"):
+            return False
+        return time.monotonic() - self._checked_at >= float(os.getenv("RESOURCE_RELOAD_CHECK_SECONDS", "2"))
+
+    def _swap_locked(self, fingerprint: Tuple) -> None:
+        version = self._snapshot.version + 1 if self._snapshot is not None else 1
+        snapshot = _build(version)
+        if self._snapshot is not None:
+            self.reloads += 1
+        self._fingerprint = fingerprint
+        self._snapshot = snapshot
+
+    def get(self) -> ResourceSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and not self._due_for_check():
+            return snapshot
+        with self._lock:
+            if self._snapshot is None or self._due_for_check():
+                self._checked_at = time.monotonic()
+                fingerprint = _fingerprint()
+                if self._snapshot is None or fingerprint != self._fingerprint:
+                    self._swap_locked(fingerprint)
+            return self._snapshot
+
+    def reload(self) -> ResourceSnapshot:
+        with self._lock:
+            self._checked_at = time.monotonic()
+            self._swap_locked(_fingerprint())
+            return self._snapshot
+
+
+_store = ResourceStore()
+
+
+def get_resource_snapshot() -> ResourceSnapshot:
+    """The current resource snapshot; hold on to it for the duration of a job."""
+    return _store.get()
+
+
+def reload_resources() -> ResourceSnapshot:
+    """Rebuild the snapshot from disk now."""
+    return _store.reload()
+
+
+def resource_stats() -> Dict[str, Any]:
+    stats = get_resource_snapshot().stats()
+    stats["reloads"] = _store.reloads
+    return stats
@@ -6,25 +6,36 @@ It supports both local and remote LLM usage, with options for personas, album ar
 """
 
 import argparse
+import json
 import os
 import sys
-from typing import Callable, List, Optional
+import threading
+import uuid
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
 from langgraph.graph import END, StateGraph
 from tqdm import tqdm
 
 from ai_functions import (
-    build_prompts,
+    critic_feedback,
     critique_song,
     draft_song,
     generate_metadata_summary,
+    merge_critiques,
+    pin_provider,
     preflight_song,
+    resolve_provider_chain,
     revise_lyrics,
     run_parallel_reviews,
     score_lyrics,
+    stream_tokens,
     triage_preflight,
 )
+from batch_mode import BatchCoordinator, run_batch
+from cancellation import JobCancelled, cancellation_scope, get_cancel_token, release_cancel_token
+from checkpoints import checkpoint_metadata, delete_checkpoint, get_checkpointer, run_config
 from helpers import (
     SongResources,
     SongState,
@@ -37,476 +48,506 @@ from helpers import (
     parse_persona,
     save_song,
 )
+from job_context import JobContext, job_context, job_context_scope
+from llm_cache import cache_bypass
+from prompt_registry import get_prompts
 
 load_dotenv()
 
 
-def generate_song(
-    user_input: str,
-    use_local: bool = False,
-    song_name: Optional[str] = None,
-    persona: Optional[str] = None,
-    progress_callback: Optional[Callable[[str, int, str], None]] = None,
-    # HookHouse parameters
-    use_hookhouse: bool = True,
-    blend: Optional[List[str]] = None,
-    mood_style: str = "dark",
-    explicitness: str = "mature",
-    pov: Optional[str] = None,
-    setting: Optional[str] = None,
-    themes_include: Optional[List[str]] = None,
-    themes_avoid: Optional[List[str]] = None,
-    bpm: Optional[int] = None,
-    time_signature: Optional[str] = None,
-    key: Optional[str] = None,
-    groove_texture: Optional[str] = None,
-    choir_call_response: bool = False
-):
-    (
-        drafter_prompt,
-        review_prompt,
-        critic_prompt,
-        preflight_prompt,
-        revision_prompt,
-        scoring_prompt,
-        metadata_prompt,
-        preflight_triage_prompt,
-        # HookHouse prompts
-        narrative_prompt,
-        hookhouse_draft_prompt,
-        hookhouse_review_prompt,
-        funksmith_prompt,
-        hookhouse_metadata_prompt,
-        hookhouse_image_prompt,
-        caption_prompt,
-    ) = build_prompts()
-
-    persona_name = parse_persona(user_input, persona)
-    resources = load_resources(persona_name)
-    max_rounds = int(os.getenv("REVIEW_MAX_ROUNDS", "3"))
-    score_threshold = float(os.getenv("REVIEW_SCORE_THRESHOLD", "8.5"))  # Higher threshold for HookHouse
-
-    # Default blend if not provided (based on persona or generic)
-    if not blend:
-        if persona_name == "antidote":
-            blend = ["Southern Rock", "Americana"]
-        elif persona_name == "bleached_to_perfection":
-            blend = ["Gospel", "Soul"]
-        elif persona_name == "anagram":
-            blend = ["Americana", "Singer-Songwriter"]
-        else:
-            blend = ["Rock", "Americana"]  # Default blend
-
-    initial_state: SongState = {
-        # Original fields
-        "user_input": user_input,
-        "song_name": song_name,
-        "persona": persona,
-        "persona_name": persona_name,
-        "use_local": use_local,
-        "resources": resources,
-        "lyrics": "",
-        "feedback": "",
-        "score": 0.0,
-        "round": 0,
-        "max_rounds": max_rounds,
-        "score_threshold": score_threshold,
-        "preflight_passed": False,
-        "preflight_issues": [],
-        "metadata": {},
-        "filename": None,
-        "album_art": None,
-        # HookHouse fields
-        "blend": blend,
-        "mood_style": mood_style,
-        "explicitness": explicitness,
-        "pov": pov,
-        "setting": setting,
-        "themes_include": themes_include or [],
-        "themes_avoid": themes_avoid or [],
-        "bpm": bpm,
-        "time_signature": time_signature,
-        "key": key,
-        "groove_texture": groove_texture,
-        "choir_call_response": choir_call_response,
-        "narrative": None,
-        "section_map": None,
-        "groove_map": None,
-        "review_issues": None,
-        "style_block": None,
-        "excluded_styles": None,
-        "title_artist": None,
-        "summary": None,
-        "image_prompt_json": None,
-        "captions": None,
-    }
+# ============================================================================
+# Workflow Nodes (module level: every job shares the compiled graphs below)
+# ============================================================================
+
+def _token_stream(ctx: JobContext, step: str):
+    """Stream long-form LLM output (drafts, revisions, Funksmith) for a node to the job's token_callback."""
+    if not ctx.token_callback:
+        return nullcontext()
+    return stream_tokens(lambda token: ctx.token_callback(step, token))
 
-    def draft_node(state: SongState):
-        """Generate initial song draft using AI."""
-        enhanced_input = enhance_user_input(state["user_input"], state.get("song_name"))
+
+def draft_node(state: SongState):
+    """Generate initial song draft using AI."""
+    ctx = job_context(state)
+    enhanced_input = enhance_user_input(ctx.user_input, ctx.song_name)
+    with _token_stream(ctx, "draft"):
         lyrics = draft_song(
-            prompt_template=drafter_prompt,
+            prompt_template=ctx.prompts.drafter,
             enhanced_input=enhanced_input,
-            styles=state["resources"].styles,
-            tags=state["resources"].tags,
-            persona_styles=state["resources"].persona_styles,
-            default_params=state["resources"].default_params,
-            use_local=state["use_local"],
-        )
-        tqdm.write("[OK] Draft generated.")
-        if progress_callback:
-            progress_callback("draft", 2, "Draft generated")
-        return {"lyrics": lyrics}
-
-    def review_node(state: SongState):
-        feedback = run_parallel_reviews(review_prompt, state["lyrics"], state["use_local"])
-        revised_lyrics = revise_lyrics(revision_prompt, state["lyrics"], feedback, state["use_local"])
-        score = score_lyrics(scoring_prompt, revised_lyrics, state["use_local"])
-        tqdm.write(f"[OK] Review round {state['round'] + 1}: score {score:.2f}")
-        if progress_callback:
-            progress_callback("review", 3, f"Review round {state['round'] + 1}: score {score:.2f}")
-        return {"lyrics": revised_lyrics, "feedback": feedback, "score": score, "round": state["round"] + 1}
-
-    def review_router(state: SongState):
-        """Decide whether to continue reviewing or proceed to critic based on score and rounds."""
-        if state["score"] < state["score_threshold"] and state["round"] < state["max_rounds"]:
-            return "keep_reviewing"
-        return "go_critic"
-
-    def critic_node(state: SongState):
-        revised = critique_song(critic_prompt, revision_prompt, state["lyrics"], state["use_local"])
-        tqdm.write("[OK] Critic feedback applied.")
-        if progress_callback:
-            progress_callback("critic", 4, "Critic feedback applied")
-        return {"lyrics": revised}
-
-    def preflight_node(state: SongState):
-        raw = preflight_song(preflight_prompt, state["lyrics"], state["resources"].styles, state["resources"].tags, state["use_local"])
-        triaged = triage_preflight(preflight_triage_prompt, raw, state["use_local"])
-        passed = bool(triaged.get("pass", False))
-        issues = triaged.get("issues", [])
-        if passed:
-            tqdm.write("[OK] Preflight passed.")
-        else:
-            tqdm.write(f"[!] Preflight flagged {len(issues)} issue(s).")
-        if progress_callback:
-            progress_callback("preflight", 5, "Preflight checks completed")
-        return {"preflight_passed": passed, "preflight_issues": issues}
-
-    def preflight_router(state: SongState):
-        if not state["preflight_passed"] and state["round"] < state["max_rounds"]:
-            return "needs_fix"
-        return "ready_for_metadata"
-
-    def targeted_revise_node(state: SongState):
-        """Revise lyrics specifically to address preflight issues."""
-        issues = state.get("preflight_issues", [])
-        feedback = "Fix these preflight issues:\n" + "\n".join(f"- {issue}" for issue in issues)
-        revised = revise_lyrics(revision_prompt, state["lyrics"], feedback, state["use_local"])
-        tqdm.write("[OK] Applied targeted fixes from preflight.")
-        if progress_callback:
-            progress_callback("targeted_revise", 5, "Applied targeted fixes")
-        return {"lyrics": revised, "feedback": feedback, "round": state["round"] + 1}
-
-    def metadata_node(state: SongState):
-        metadata = generate_metadata_summary(
-            metadata_prompt,
-            state["lyrics"],
-            state["user_input"],
-            state["resources"].default_params,
-            state["resources"].persona_styles,
-            state["use_local"],
-        )
-        tqdm.write("[OK] Metadata summary generated.")
-        if progress_callback:
-            progress_callback("metadata", 6, "Metadata summary generated")
-        return {"metadata": metadata}
-
-    def album_art_node(state: SongState):
-        """Generate album artwork if not in local mode."""
-        if state["use_local"]:
-            tqdm.write("[OK] Album artwork skipped (local mode).")
-            if progress_callback:
-                progress_callback("album_art", 7, "Album artwork skipped (local mode)")
-            return {"album_art": None}
-        title = extract_title(state["lyrics"], state.get("song_name"))
-        artwork_path = generate_album_art(title, state["user_input"])
-        tqdm.write(f"[OK] Album artwork generated: {artwork_path}")
-        if progress_callback:
-            progress_callback("album_art", 7, "Album artwork generated")
-        return {"album_art": artwork_path}
-
-    def save_node(state: SongState):
-        # Use HookHouse title if available, otherwise extract from lyrics
-        if use_hookhouse and state.get("title_artist"):
-            title = state["title_artist"].get("title", "Untitled")
-        else:
-            title = extract_title(state["lyrics"], state.get("song_name"))
-
-        filename = save_song(title, state["user_input"], state["lyrics"], state["resources"].default_params, state["metadata"])
-        tqdm.write(f"[OK] Song saved to {filename}")
-
-        step_num = 8 if use_hookhouse else 8
-        if progress_callback:
-            progress_callback("save", step_num, f"Song saved to {filename}")
-        return {"filename": filename}
-
-    # ============================================================================
-    # HookHouse Workflow Nodes
-    # ============================================================================
-
-    def narrative_node(state: SongState):
-        """Develop narrative scaffold using Storysmith Muse."""
-        from ai_functions import develop_narrative
-
-        tqdm.write(f"[DEBUG] HookHouse workflow starting with blend: {state['blend']}")
-        tqdm.write(f"[DEBUG] Mood: {state['mood_style']}, Explicitness: {state['explicitness']}")
-
-        narrative = develop_narrative(
-            narrative_prompt,
-            state["user_input"],
-            state["blend"],
-            state["mood_style"],
-            state["explicitness"],
-            state.get("pov"),
-            state.get("setting"),
-            state.get("themes_include"),
-            state.get("themes_avoid"),
-            state.get("bpm"),
-            state.get("time_signature"),
-            state.get("key"),
-            state.get("groove_texture"),
-            state.get("choir_call_response", False),
-            state["use_local"]
+            styles=ctx.resources.styles_text,
+            tags=ctx.resources.tags_text,
+            persona_styles=ctx.resources.persona_styles,
+            default_params=ctx.resources.default_params,
+            use_local=ctx.use_local,
         )
+    tqdm.write("[OK] Draft generated.")
+    if ctx.progress_callback:
+        ctx.progress_callback("draft", 2, "Draft generated")
+    return {"lyrics": lyrics}
+
+
+def review_node(state: SongState):
+    ctx = job_context(state)
+    feedback = run_parallel_reviews(ctx.prompts.review, state["lyrics"], ctx.use_local)
+    with _token_stream(ctx, "review"):
+        revised_lyrics = revise_lyrics(ctx.prompts.revision, state["lyrics"], feedback, ctx.use_local)
+    score = score_lyrics(ctx.prompts.scoring, revised_lyrics, ctx.use_local)
+    tqdm.write(f"[OK] Review round {state['round'] + 1}: score {score:.2f}")
+    if ctx.progress_callback:
+        ctx.progress_callback("review", 3, f"Review round {state['round'] + 1}: score {score:.2f}")
+    return {"lyrics": revised_lyrics, "feedback": feedback, "score": score, "round": state["round"] + 1}
+
+
+def review_router(state: SongState):
+    """Decide whether to continue reviewing or proceed to critic based on score and rounds."""
+    ctx = job_context(state)
+    if state["score"] < ctx.score_threshold and state["round"] < ctx.max_rounds:
+        return "keep_reviewing"
+    return "go_critic"
+
+
+def critic_node(state: SongState):
+    ctx = job_context(state)
+    with _token_stream(ctx, "critic"):
+        revised = critique_song(ctx.prompts.critic, ctx.prompts.revision, state["lyrics"], ctx.use_local)
+    tqdm.write("[OK] Critic feedback applied.")
+    if ctx.progress_callback:
+        ctx.progress_callback("critic", 4, "Critic feedback applied")
+    return {"lyrics": revised}
+
+
+def preflight_node(state: SongState):
+    ctx = job_context(state)
+    raw = preflight_song(ctx.prompts.preflight, state["lyrics"], ctx.resources.styles_text, ctx.resources.tags_text, ctx.use_local)
+    triaged = triage_preflight(ctx.prompts.preflight_triage, raw, ctx.use_local)
+    passed = bool(triaged.get("pass", False))
+    issues = triaged.get("issues", [])
+    if passed:
+        tqdm.write("[OK] Preflight passed.")
+    else:
+        tqdm.write(f"[!] Preflight flagged {len(issues)} issue(s).")
+    if ctx.progress_callback:
+        ctx.progress_callback("preflight", 5, "Preflight checks completed")
+    return {"preflight_passed": passed, "preflight_issues": issues}
+
+
+def preflight_router(state: SongState):
+    if not state["preflight_passed"] and state["round"] < job_context(state).max_rounds:
+        return "needs_fix"
+    return "ready_for_metadata"
+
+
+def targeted_revise_node(state: SongState):
+    """Revise lyrics specifically to address preflight issues."""
+    ctx = job_context(state)
+    issues = state.get("preflight_issues", [])
+    feedback = "Fix these preflight issues:\n" + "\n".join(f"- {issue}" for issue in issues)
+    with _token_stream(ctx, "targeted_revise"):
+        revised = revise_lyrics(ctx.prompts.revision, state["lyrics"], feedback, ctx.use_local)
+    tqdm.write("[OK] Applied targeted fixes from preflight.")
+    if ctx.progress_callback:
+        ctx.progress_callback("targeted_revise", 5, "Applied targeted fixes")
+    return {"lyrics": revised, "feedback": feedback, "round": state["round"] + 1}
+
+
+def metadata_node(state: SongState):
+    ctx = job_context(state)
+    metadata = generate_metadata_summary(
+        ctx.prompts.metadata,
+        state["lyrics"],
+        ctx.user_input,
+        ctx.resources.default_params,
+        ctx.resources.persona_styles,
+        ctx.use_local,
+    )
+    tqdm.write("[OK] Metadata summary generated.")
+    if ctx.progress_callback:
+        ctx.progress_callback("metadata", 6, "Metadata summary generated")
+    return {"metadata": metadata}
+
+
+def album_art_node(state: SongState):
+    """Generate album artwork if not in local mode."""
+    ctx = job_context(state)
+    if ctx.use_local:
+        tqdm.write("[OK] Album artwork skipped (local mode).")
+        if ctx.progress_callback:
+            ctx.progress_callback("album_art", 7, "Album artwork skipped (local mode)")
+        return {"album_art": None}
+    # In HookHouse this runs right after the metadata node, so the Block 4 title is already known
+    if ctx.use_hookhouse and state.get("title_artist"):
+        title = state["title_artist"].get("title", "Untitled")
+    else:
+        title = extract_title(state["lyrics"], ctx.song_name)
+    artwork_path = generate_album_art(title, ctx.user_input)
+    tqdm.write(f"[OK] Album artwork generated: {artwork_path}")
+    if ctx.progress_callback:
+        ctx.progress_callback("album_art", 7, "Album artwork generated")
+    return {"album_art": artwork_path}
+
+
+def save_node(state: SongState):
+    ctx = job_context(state)
+    # Use HookHouse title if available, otherwise extract from lyrics
+    if ctx.use_hookhouse and state.get("title_artist"):
+        title = state["title_artist"].get("title", "Untitled")
+    else:
+        title = extract_title(state["lyrics"], ctx.song_name)
+
+    filename = save_song(
+        title,
+        ctx.user_input,
+        state["lyrics"],
+        ctx.resources.default_params,
+        state["metadata"],
+        image_prompt_json=state.get("image_prompt_json"),
+        captions=state.get("captions"),
+    )
+    tqdm.write(f"[OK] Song saved to {filename}")
+
+    step_num = 8 if ctx.use_hookhouse else 8
+    if ctx.progress_callback:
+        ctx.progress_callback("save", step_num, f"Song saved to {filename}")
+    return {"filename": filename}
+
+
+# ============================================================================
+# Parallel Critique Nodes (original workflow, REVIEW_MODE=parallel)
+# ============================================================================
+
+def panel_review_node(state: SongState):
+    """Reviewer panel feedback on the current lyrics (no revision)."""
+    ctx = job_context(state)
+    feedback = run_parallel_reviews(ctx.prompts.review, state["lyrics"], ctx.use_local)
+    return {"review_feedback": feedback}
+
+
+def critic_feedback_node(state: SongState):
+    """Critic feedback on the current lyrics (no revision)."""
+    ctx = job_context(state)
+    feedback = critic_feedback(ctx.prompts.critic, state["lyrics"], ctx.use_local)
+    if ctx.progress_callback:
+        ctx.progress_callback("critic", 4, "Critic feedback collected")
+    return {"critic_feedback": feedback}
+
+
+def preflight_feedback_node(state: SongState):
+    """Raw preflight findings on the current lyrics; the merged revision addresses them directly, so no triage."""
+    ctx = job_context(state)
+    findings = preflight_song(ctx.prompts.preflight, state["lyrics"], ctx.resources.styles_text, ctx.resources.tags_text, ctx.use_local)
+    if ctx.progress_callback:
+        ctx.progress_callback("preflight", 5, "Preflight checks collected")
+    return {"preflight_feedback": findings}
+
+
+def merged_revise_node(state: SongState):
+    """Apply every critique of this round in one revision, then score once."""
+    ctx = job_context(state)
+    feedback = merge_critiques(state.get("review_feedback", ""), state.get("critic_feedback", ""), state.get("preflight_feedback", ""))
+    with _token_stream(ctx, "review"):
+        revised_lyrics = revise_lyrics(ctx.prompts.revision, state["lyrics"], feedback, ctx.use_local)
+    score = score_lyrics(ctx.prompts.scoring, revised_lyrics, ctx.use_local)
+    tqdm.write(f"[OK] Critique round {state['round'] + 1}: score {score:.2f}")
+    if ctx.progress_callback:
+        ctx.progress_callback("review", 3, f"Review round {state['round'] + 1}: score {score:.2f}")
+    return {"lyrics": revised_lyrics, "feedback": feedback, "score": score, "round": state["round"] + 1}
+
+
+CRITIQUE_NODES = ["panel_review", "critic_feedback", "preflight_feedback"]
+
+
+def merged_revise_router(state: SongState):
+    """Run another round of all three critiques, or move on to metadata."""
+    ctx = job_context(state)
+    if state["score"] < ctx.score_threshold and state["round"] < ctx.max_rounds:
+        return CRITIQUE_NODES
+    return "metadata"
+
+
+# ============================================================================
+# HookHouse Workflow Nodes
+# ============================================================================
+
+
+def narrative_node(state: SongState):
+    """Develop narrative scaffold using Storysmith Muse."""
+    from ai_functions import develop_narrative
+
+    ctx = job_context(state)
+    tqdm.write(f"[DEBUG] HookHouse workflow starting with blend: {list(ctx.blend)}")
+    tqdm.write(f"[DEBUG] Mood: {ctx.mood_style}, Explicitness: {ctx.explicitness}")
+
+    narrative = develop_narrative(
+        ctx.prompts.narrative,
+        ctx.user_input,
+        list(ctx.blend),
+        ctx.mood_style,
+        ctx.explicitness,
+        ctx.pov,
+        ctx.setting,
+        list(ctx.themes_include),
+        list(ctx.themes_avoid),
+        ctx.bpm,
+        ctx.time_signature,
+        ctx.key,
+        ctx.groove_texture,
+        ctx.choir_call_response,
+        ctx.use_local
+    )
 
-        # Extract section map and groove map from best bet
-        best_bet = narrative.get("best_bet", {})
-        section_map = best_bet.get("section_prompts", {}).keys()
-        groove_map = best_bet.get("riff_groove_map", {})
+    # Extract section map and groove map from best bet
+    best_bet = narrative.get("best_bet", {})
+    section_map = best_bet.get("section_prompts", {}).keys()
+    groove_map = best_bet.get("riff_groove_map", {})
 
-        tqdm.write("[OK] Narrative development completed.")
-        tqdm.write(f"[DEBUG] Best bet title: {best_bet.get('title', 'N/A')}")
-        if progress_callback:
-            progress_callback("narrative", 1, "Narrative scaffold generated")
+    tqdm.write("[OK] Narrative development completed.")
+    tqdm.write(f"[DEBUG] Best bet title: {best_bet.get('title', 'N/A')}")
+    if ctx.progress_callback:
+        ctx.progress_callback("narrative", 1, "Narrative scaffold generated")
+
+    return {
+        "narrative": narrative,
+        "section_map": list(section_map) if section_map else [],
+        "groove_map": groove_map
+    }
 
-        return {
-            "narrative": narrative,
-            "section_map": list(section_map) if section_map else [],
-            "groove_map": groove_map
-        }
 
-    def hookhouse_draft_node(state: SongState):
-        """Generate HookHouse-compliant lyrics."""
-        from ai_functions import draft_hookhouse_lyrics
+def hookhouse_draft_node(state: SongState):
+    """Generate HookHouse-compliant lyrics."""
+    from ai_functions import draft_hookhouse_lyrics
 
+    ctx = job_context(state)
+    with _token_stream(ctx, "hookhouse_draft"):
         lyrics = draft_hookhouse_lyrics(
-            hookhouse_draft_prompt,
+            ctx.prompts.hookhouse_draft,
             state["narrative"],
-            state["blend"],
-            state.get("bpm"),
-            state.get("time_signature"),
-            state.get("key"),
-            state["user_input"],
-            state["use_local"]
+            list(ctx.blend),
+            ctx.bpm,
+            ctx.time_signature,
+            ctx.key,
+            ctx.user_input,
+            ctx.use_local
         )
 
-        tqdm.write("[OK] HookHouse lyrics drafted.")
-        if progress_callback:
-            progress_callback("hookhouse_draft", 2, "Lyrics drafted with HookHouse rules")
+    tqdm.write("[OK] HookHouse lyrics drafted.")
+    if ctx.progress_callback:
+        ctx.progress_callback("hookhouse_draft", 2, "Lyrics drafted with HookHouse rules")
 
-        return {"lyrics": lyrics}
+    return {"lyrics": lyrics}
 
-    def hookhouse_review_node(state: SongState):
-        """Review lyrics against HookHouse quality standards."""
-        from ai_functions import review_hookhouse_lyrics
 
-        review = review_hookhouse_lyrics(
-            hookhouse_review_prompt,
-            state["lyrics"],
-            state.get("bpm"),
-            state["blend"],
-            state["use_local"]
-        )
+def hookhouse_review_node(state: SongState):
+    """Review lyrics against HookHouse quality standards."""
+    from ai_functions import review_hookhouse_lyrics
 
-        score = review.get("overall_score", 0.0)
-        pass_threshold = review.get("pass_threshold", False)
+    ctx = job_context(state)
+    review = review_hookhouse_lyrics(
+        ctx.prompts.hookhouse_review,
+        state["lyrics"],
+        ctx.bpm,
+        list(ctx.blend),
+        ctx.use_local
+    )
 
-        tqdm.write(f"[OK] HookHouse review: score {score:.2f}, pass: {pass_threshold}")
-        if progress_callback:
-            progress_callback("hookhouse_review", 3, f"Review score: {score:.2f}")
+    score = review.get("overall_score", 0.0)
+    pass_threshold = review.get("pass_threshold", False)
 
-        return {
-            "review_issues": review,
-            "score": score,
-            "round": state["round"] + 1
-        }
+    tqdm.write(f"[OK] HookHouse review: score {score:.2f}, pass: {pass_threshold}")
+    if ctx.progress_callback:
+        ctx.progress_callback("hookhouse_review", 3, f"Review score: {score:.2f}")
+
+    return {
+        "review_issues": review,
+        "score": score,
+        "round": state["round"] + 1
+    }
+
+
+def hookhouse_review_router(state: SongState):
+    """Decide whether to continue reviewing or proceed to Funksmith."""
+    review = state.get("review_issues", {})
+    pass_threshold = review.get("pass_threshold", False)
+
+    if not pass_threshold and state["round"] < job_context(state).max_rounds:
+        return "needs_revision"
+    return "go_funksmith"
+
+
+def hookhouse_revise_node(state: SongState):
+    """Revise lyrics based on HookHouse review feedback."""
+    from ai_functions import revise_lyrics
+
+    ctx = job_context(state)
+    review = state.get("review_issues", {})
+    critical_issues = review.get("critical_issues", [])
+    moderate_issues = review.get("moderate_issues", [])
+    revision_priority = review.get("revision_priority", [])
+
+    # Build feedback from issues
+    feedback_parts = []
+    if revision_priority:
+        feedback_parts.append("Priority fixes:\n" + "\n".join(f"- {p}" for p in revision_priority))
+    if critical_issues:
+        feedback_parts.append("\nCritical issues:\n" + "\n".join(
+            f"- Line {issue.get('line_number', '?')}: {issue.get('issue', '')} → {issue.get('suggestion', '')}"
+            for issue in critical_issues
+        ))
+    if moderate_issues:
+        feedback_parts.append("\nModerate issues:\n" + "\n".join(
+            f"- Line {issue.get('line_number', '?')}: {issue.get('issue', '')}"
+            for issue in moderate_issues
+        ))
+
+    feedback = "\n".join(feedback_parts) if feedback_parts else "Improve based on review feedback."
+
+    with _token_stream(ctx, "hookhouse_revise"):
+        revised = revise_lyrics(ctx.prompts.revision, state["lyrics"], feedback, ctx.use_local)
 
-    def hookhouse_review_router(state: SongState):
-        """Decide whether to continue reviewing or proceed to Funksmith."""
-        review = state.get("review_issues", {})
-        pass_threshold = review.get("pass_threshold", False)
-
-        if not pass_threshold and state["round"] < state["max_rounds"]:
-            return "needs_revision"
-        return "go_funksmith"
-
-    def hookhouse_revise_node(state: SongState):
-        """Revise lyrics based on HookHouse review feedback."""
-        from ai_functions import revise_lyrics
-
-        review = state.get("review_issues", {})
-        critical_issues = review.get("critical_issues", [])
-        moderate_issues = review.get("moderate_issues", [])
-        revision_priority = review.get("revision_priority", [])
-
-        # Build feedback from issues
-        feedback_parts = []
-        if revision_priority:
-            feedback_parts.append("Priority fixes:\n" + "\n".join(f"- {p}" for p in revision_priority))
-        if critical_issues:
-            feedback_parts.append("\nCritical issues:\n" + "\n".join(
-                f"- Line {issue.get('line_number', '?')}: {issue.get('issue', '')} → {issue.get('suggestion', '')}"
-                for issue in critical_issues
-            ))
-        if moderate_issues:
-            feedback_parts.append("\nModerate issues:\n" + "\n".join(
-                f"- Line {issue.get('line_number', '?')}: {issue.get('issue', '')}"
-                for issue in moderate_issues
-            ))
-
-        feedback = "\n".join(feedback_parts) if feedback_parts else "Improve based on review feedback."
-
-        revised = revise_lyrics(revision_prompt, state["lyrics"], feedback, state["use_local"])
-
-        tqdm.write(f"[OK] HookHouse revision round {state['round']} applied.")
-        if progress_callback:
-            progress_callback("hookhouse_revise", 3, f"Revision round {state['round']} applied")
-
-        return {"lyrics": revised, "feedback": feedback}
-
-    def funksmith_node(state: SongState):
-        """Apply Sanctified Funksmith refinement."""
-        from ai_functions import funksmith_critique_lyrics
+    tqdm.write(f"[OK] HookHouse revision round {state['round']} applied.")
+    if ctx.progress_callback:
+        ctx.progress_callback("hookhouse_revise", 3, f"Revision round {state['round']} applied")
 
+    return {"lyrics": revised, "feedback": feedback}
+
+
+def funksmith_node(state: SongState):
+    """Apply Sanctified Funksmith refinement."""
+    from ai_functions import funksmith_critique_lyrics
+
+    ctx = job_context(state)
+    with _token_stream(ctx, "funksmith"):
         revised = funksmith_critique_lyrics(
-            funksmith_prompt,
+            ctx.prompts.funksmith,
             state["lyrics"],
-            state["blend"],
-            state.get("bpm"),
-            state["use_local"]
+            list(ctx.blend),
+            ctx.bpm,
+            ctx.use_local
         )
 
-        tqdm.write("[OK] Funksmith refinement applied.")
-        if progress_callback:
-            progress_callback("funksmith", 4, "Funksmith refinement complete")
+    tqdm.write("[OK] Funksmith refinement applied.")
+    if ctx.progress_callback:
+        ctx.progress_callback("funksmith", 4, "Funksmith refinement complete")
 
-        return {"lyrics": revised}
+    return {"lyrics": revised}
 
-    def hookhouse_metadata_node(state: SongState):
-        """Generate HookHouse Blocks 2-5 metadata."""
-        from ai_functions import generate_hookhouse_metadata
 
-        tqdm.write(f"[DEBUG] Generating metadata with blend: {state['blend']}")
+def hookhouse_metadata_node(state: SongState):
+    """Generate HookHouse Blocks 2-5 metadata."""
+    from ai_functions import generate_hookhouse_metadata
 
-        metadata_blocks = generate_hookhouse_metadata(
-            hookhouse_metadata_prompt,
-            state["lyrics"],
-            state["narrative"],
-            state["user_input"],
-            state["blend"],
-            state["mood_style"],
-            state.get("bpm"),
-            state.get("time_signature"),
-            state.get("key"),
-            state["use_local"]
-        )
+    ctx = job_context(state)
+    tqdm.write(f"[DEBUG] Generating metadata with blend: {list(ctx.blend)}")
 
-        # Store blocks in state
-        style_block = metadata_blocks.get("style_block", "")
-        excluded_styles = metadata_blocks.get("excluded_styles", [])
-        title_artist = metadata_blocks.get("title_artist", {"title": "Untitled", "artist": "Unknown"})
-        summary = metadata_blocks.get("summary", "")
-
-        tqdm.write(f"[DEBUG] Style block length: {len(style_block)} chars")
-        tqdm.write(f"[DEBUG] Style block preview: {style_block[:200] if style_block else 'EMPTY'}")
-        tqdm.write(f"[DEBUG] Excluded styles count: {len(excluded_styles)}")
-        tqdm.write(f"[DEBUG] Title/Artist: {title_artist}")
-        tqdm.write(f"[DEBUG] Summary length: {len(summary)} chars")
-
-        # Also update metadata for compatibility with save_song
-        metadata = {
-            "description": summary,
-            "suno_styles": style_block,
-            "suno_exclude_styles": excluded_styles,
-            "target_audience": state["narrative"].get("best_bet", {}).get("target_audience", "General audience"),
-            "commercial_potential": "Generated with HookHouse"
-        }
+    metadata_blocks = generate_hookhouse_metadata(
+        ctx.prompts.hookhouse_metadata,
+        state["lyrics"],
+        state["narrative"],
+        ctx.user_input,
+        list(ctx.blend),
+        ctx.mood_style,
+        ctx.bpm,
+        ctx.time_signature,
+        ctx.key,
+        ctx.use_local
+    )
 
-        tqdm.write("[OK] HookHouse metadata generated.")
-        if progress_callback:
-            progress_callback("hookhouse_metadata", 5, "Metadata (Blocks 2-5) generated")
+    # Store blocks in state
+    style_block = metadata_blocks.get("style_block", "")
+    excluded_styles = metadata_blocks.get("excluded_styles", [])
+    title_artist = metadata_blocks.get("title_artist", {"title": "Untitled", "artist": "Unknown"})
+    summary = metadata_blocks.get("summary", "")
+
+    tqdm.write(f"[DEBUG] Style block length: {len(style_block)} chars")
+    tqdm.write(f"[DEBUG] Style block preview: {style_block[:200] if style_block else 'EMPTY'}")
+    tqdm.write(f"[DEBUG] Excluded styles count: {len(excluded_styles)}")
+    tqdm.write(f"[DEBUG] Title/Artist: {title_artist}")
+    tqdm.write(f"[DEBUG] Summary length: {len(summary)} chars")
+
+    # Also update metadata for compatibility with save_song
+    metadata = {
+        "description": summary,
+        "suno_styles": style_block,
+        "suno_exclude_styles": excluded_styles,
+        "target_audience": state["narrative"].get("best_bet", {}).get("target_audience", "General audience"),
+        "commercial_potential": "Generated with HookHouse"
+    }
 
-        return {
-            "style_block": style_block,
-            "excluded_styles": excluded_styles,
-            "title_artist": title_artist,
-            "summary": summary,
-            "metadata": metadata
-        }
+    tqdm.write("[OK] HookHouse metadata generated.")
+    if ctx.progress_callback:
+        ctx.progress_callback("hookhouse_metadata", 5, "Metadata (Blocks 2-5) generated")
 
-    def hookhouse_image_node(state: SongState):
-        """Generate HookHouse Block 6: Image Prompt JSON."""
-        from ai_functions import generate_hookhouse_image_prompt
+    return {
+        "style_block": style_block,
+        "excluded_styles": excluded_styles,
+        "title_artist": title_artist,
+        "summary": summary,
+        "metadata": metadata
+    }
 
-        image_prompt_json = generate_hookhouse_image_prompt(
-            hookhouse_image_prompt,
-            state["lyrics"],
-            state["narrative"],
-            {
-                "title_artist": state.get("title_artist"),
-                "summary": state.get("summary"),
-                "style_block": state.get("style_block")
-            },
-            state["user_input"],
-            state["blend"],
-            state["mood_style"],
-            state["use_local"]
-        )
 
-        tqdm.write("[OK] Image prompt JSON generated.")
-        if progress_callback:
-            progress_callback("hookhouse_image", 6, "Image prompt (Block 6) generated")
+def hookhouse_image_node(state: SongState):
+    """Generate HookHouse Block 6: Image Prompt JSON."""
+    from ai_functions import generate_hookhouse_image_prompt
+
+    ctx = job_context(state)
+    image_prompt_json = generate_hookhouse_image_prompt(
+        ctx.prompts.hookhouse_image,
+        state["lyrics"],
+        state["narrative"],
+        {
+            "title_artist": state.get("title_artist"),
+            "summary": state.get("summary"),
+            "style_block": state.get("style_block")
+        },
+        ctx.user_input,
+        list(ctx.blend),
+        ctx.mood_style,
+        ctx.use_local
+    )
 
-        return {"image_prompt_json": image_prompt_json}
+    tqdm.write("[OK] Image prompt JSON generated.")
+    if ctx.progress_callback:
+        ctx.progress_callback("hookhouse_image", 6, "Image prompt (Block 6) generated")
 
-    def caption_node(state: SongState):
-        """Generate social media captions."""
-        from ai_functions import generate_captions
+    return {"image_prompt_json": image_prompt_json}
 
-        title_artist = state.get("title_artist", {"title": "Untitled", "artist": "Unknown"})
 
-        captions = generate_captions(
-            caption_prompt,
-            title_artist.get("title", "Untitled"),
-            title_artist.get("artist", "Unknown"),
-            state["lyrics"],
-            state.get("summary", ""),
-            state.get("style_block", ""),
-            state["narrative"],
-            state["use_local"]
-        )
+def caption_node(state: SongState):
+    """Generate social media captions."""
+    from ai_functions import generate_captions
+
+    ctx = job_context(state)
+    title_artist = state.get("title_artist", {"title": "Untitled", "artist": "Unknown"})
+
+    captions = generate_captions(
+        ctx.prompts.caption,
+        title_artist.get("title", "Untitled"),
+        title_artist.get("artist", "Unknown"),
+        state["lyrics"],
+        state.get("summary", ""),
+        state.get("style_block", ""),
+        state["narrative"],
+        ctx.use_local
+    )
+
+    tqdm.write(f"[OK] Generated {len(captions)} social media captions.")
+    if ctx.progress_callback:
+        ctx.progress_callback("captions", 7, f"Generated {len(captions)} captions")
 
-        tqdm.write(f"[OK] Generated {len(captions)} social media captions.")
-        if progress_callback:
-            progress_callback("captions", 7, f"Generated {len(captions)} captions")
+    return {"captions": captions}
 
-        return {"captions": captions}
 
-    # ============================================================================
-    # Graph Construction
-    # ============================================================================
+# ============================================================================
+# Graph Construction
+# ============================================================================
 
+def review_mode() -> str:
+    """REVIEW_MODE for the original workflow: "sequential" (default) or "parallel" critiques."""
+    mode = os.getenv("REVIEW_MODE", "sequential").lower()
+    return mode if mode in ("sequential", "parallel") else "sequential"
+
+
+def _build_workflow(use_hookhouse: bool, review_mode: str = "sequential"):
     graph = StateGraph(SongState)
 
     if use_hookhouse:
@@ -518,7 +559,9 @@ def generate_song(
         graph.add_node("funksmith", funksmith_node)
         graph.add_node("preflight", preflight_node)
         graph.add_node("hookhouse_metadata", hookhouse_metadata_node)
-        graph.add_node("album_art", album_art_node)  # Add actual image generation
+        graph.add_node("album_art", album_art_node)
+        graph.add_node("hookhouse_image", hookhouse_image_node)
+        graph.add_node("captions", caption_node)
         graph.add_node("save", save_node)
 
         # Wire HookHouse workflow
@@ -531,10 +574,35 @@ def generate_song(
             {"needs_revision": "hookhouse_revise", "go_funksmith": "funksmith"}
         )
         graph.add_edge("hookhouse_revise", "hookhouse_review")
+        # Post-processing fans out once the lyrics are final: preflight only reads them, so it runs
+        # alongside metadata; art, Block 6 and captions need the title/summary and start together after it
         graph.add_edge("funksmith", "preflight")
-        graph.add_edge("preflight", "hookhouse_metadata")
-        graph.add_edge("hookhouse_metadata", "album_art")  # Generate actual image
-        graph.add_edge("album_art", "save")  # Skip JSON prompt and captions for now
+        graph.add_edge("funksmith", "hookhouse_metadata")
+        graph.add_edge("hookhouse_metadata", "album_art")
+        graph.add_edge("hookhouse_metadata", "hookhouse_image")
+        graph.add_edge("hookhouse_metadata", "captions")
+        # save joins every branch
+        graph.add_edge(["preflight", "album_art", "hookhouse_image", "captions"], "save")
+        graph.add_edge("save", END)
+    elif review_mode == "parallel":
+        # Original workflow, critiques in parallel: reviewers, critic and preflight read the same lyrics,
+        # then one merged revision and one score per round
+        graph.add_node("draft", draft_node)
+        graph.add_node("panel_review", panel_review_node)
+        graph.add_node("critic_feedback", critic_feedback_node)
+        graph.add_node("preflight_feedback", preflight_feedback_node)
+        graph.add_node("merged_revise", merged_revise_node)
+        graph.add_node("metadata", metadata_node)
+        graph.add_node("album_art", album_art_node)
+        graph.add_node("save", save_node)
+
+        graph.set_entry_point("draft")
+        for node in CRITIQUE_NODES:
+            graph.add_edge("draft", node)
+        graph.add_edge(CRITIQUE_NODES, "merged_revise")
+        graph.add_conditional_edges("merged_revise", merged_revise_router, CRITIQUE_NODES + ["metadata"])
+        graph.add_edge("metadata", "album_art")
+        graph.add_edge("album_art", "save")
         graph.add_edge("save", END)
     else:
         # Original Workflow
@@ -558,10 +626,172 @@ def generate_song(
         graph.add_edge("album_art", "save")
         graph.add_edge("save", END)
 
-    # Compile and execute the graph
-    app = graph.compile()
-    with tqdm(total=None, desc="Creating your song (agentic)", unit="step") as _:
-        final_state = app.invoke(initial_state)
+    return graph.compile(checkpointer=get_checkpointer())
+
+
+# Each workflow is compiled once per process; per-job inputs reach the nodes through the JobContext
+_workflows: Dict[Tuple[bool, str], Any] = {}
+_workflows_lock = threading.Lock()
+
+
+def get_workflow(use_hookhouse: bool = True, mode: Optional[str] = None):
+    """The compiled HookHouse or original workflow graph (in the given review mode), shared by every job."""
+    # The review mode only shapes the original workflow
+    key = (use_hookhouse, "sequential" if use_hookhouse else (mode or review_mode()))
+    workflow = _workflows.get(key)
+    if workflow is None:
+        with _workflows_lock:
+            workflow = _workflows.get(key)
+            if workflow is None:
+                workflow = _build_workflow(*key)
+                _workflows[key] = workflow
+    return workflow
+
+
+def checkpointed_review_mode(job_id: str) -> Optional[str]:
+    """The review mode job_id's checkpointed run was started in, or None without a checkpoint."""
+    return checkpoint_metadata(job_id).get("review_mode")
+
+
+def resume_point(job_id: str, use_hookhouse: bool = True, mode: Optional[str] = None) -> Tuple[str, ...]:
+    """Nodes a resumed run of job_id would execute next; empty when there is nothing to resume."""
+    if get_checkpointer() is None:
+        return ()
+    mode = mode or checkpointed_review_mode(job_id)
+    return tuple(get_workflow(use_hookhouse, mode).get_state(run_config(job_id)).next)
+
+
+def generate_song(
+    user_input: str,
+    use_local: bool = False,
+    song_name: Optional[str] = None,
+    persona: Optional[str] = None,
+    progress_callback: Optional[Callable[[str, int, str], None]] = None,
+    token_callback: Optional[Callable[[str, str], None]] = None,
+    # HookHouse parameters
+    use_hookhouse: bool = True,
+    blend: Optional[List[str]] = None,
+    mood_style: str = "dark",
+    explicitness: str = "mature",
+    pov: Optional[str] = None,
+    setting: Optional[str] = None,
+    themes_include: Optional[List[str]] = None,
+    themes_avoid: Optional[List[str]] = None,
+    bpm: Optional[int] = None,
+    time_signature: Optional[str] = None,
+    key: Optional[str] = None,
+    groove_texture: Optional[str] = None,
+    choir_call_response: bool = False,
+    job_id: Optional[str] = None,
+    resume: bool = False,
+    bypass_cache: bool = False,
+):
+    job_id = job_id or uuid.uuid4().hex
+    try:
+        # The same token JobManager.cancel_job sets; a cancel that arrived while the job was queued stops it here
+        cancel_token = get_cancel_token(job_id)
+        cancel_token.raise_if_cancelled()
+
+        # Pin the provider (and its failover chain) for the whole job so config changes mid-run don't swap clients under it
+        provider_chain = resolve_provider_chain(use_local)
+        persona_name = parse_persona(user_input, persona)
+        # Only the catalog entries relevant to this request go into the drafter/preflight prompts
+        retrieval_query = "\n".join(
+            part for part in (song_name, user_input, ", ".join(blend or []), groove_texture, setting, ", ".join(themes_include or [])) if part
+        )
+        resources = load_resources(persona_name, query=retrieval_query)
+        max_rounds = int(os.getenv("REVIEW_MAX_ROUNDS", "3"))
+        score_threshold = float(os.getenv("REVIEW_SCORE_THRESHOLD", "8.5"))  # Higher threshold for HookHouse
+
+        # Default blend if not provided (based on persona or generic)
+        if not blend:
+            if persona_name == "antidote":
+                blend = ["Southern Rock", "Americana"]
+            elif persona_name == "bleached_to_perfection":
+                blend = ["Gospel", "Soul"]
+            elif persona_name == "anagram":
+                blend = ["Americana", "Singer-Songwriter"]
+            else:
+                blend = ["Rock", "Americana"]  # Default blend
+
+        # Read-only inputs stay in the side store; the graph state only carries the handle
+        context = JobContext(
+            job_id=job_id,
+            user_input=user_input,
+            use_local=use_local,
+            resources=resources,
+            song_name=song_name,
+            persona=persona,
+            persona_name=persona_name,
+            max_rounds=max_rounds,
+            score_threshold=score_threshold,
+            use_hookhouse=use_hookhouse,
+            blend=tuple(blend),
+            mood_style=mood_style,
+            explicitness=explicitness,
+            pov=pov,
+            setting=setting,
+            themes_include=tuple(themes_include or ()),
+            themes_avoid=tuple(themes_avoid or ()),
+            bpm=bpm,
+            time_signature=time_signature,
+            key=key,
+            groove_texture=groove_texture,
+            choir_call_response=choir_call_response,
+            prompts=get_prompts(),
+            progress_callback=progress_callback,
+            token_callback=token_callback,
+            cancel_token=cancel_token,
+        )
+
+        initial_state: SongState = {
+            "job_id": context.job_id,
+            "lyrics": "",
+            "feedback": "",
+            "score": 0.0,
+            "round": 0,
+            "preflight_passed": False,
+            "preflight_issues": [],
+            "metadata": {},
+            "filename": None,
+            "album_art": None,
+            # HookHouse fields
+            "narrative": None,
+            "section_map": None,
+            "groove_map": None,
+            "review_issues": None,
+            "style_block": None,
+            "excluded_styles": None,
+            "title_artist": None,
+            "summary": None,
+            "image_prompt_json": None,
+            "captions": None,
+        }
+
+        # A resumed run continues in the graph it was checkpointed with, whatever REVIEW_MODE says now
+        mode = (checkpointed_review_mode(context.job_id) if resume else None) or review_mode()
+        app = get_workflow(use_hookhouse, mode)
+        config = run_config(context.job_id, review_mode=mode)
+        # Resuming continues from the last completed node; without a checkpoint the job simply starts over
+        graph_input = initial_state
+        if resume:
+            pending = resume_point(context.job_id, use_hookhouse, mode)
+            if pending:
+                graph_input = None
+                tqdm.write(f"[OK] Resuming job {context.job_id} at: {', '.join(pending)}")
+        # Regenerated and resumed jobs want new output, not responses cached from an earlier run
+        with tqdm(total=None, desc="Creating your song (agentic)", unit="step") as _, pin_provider(provider_chain), \
+                job_context_scope(context), cancellation_scope(cancel_token), cache_bypass(bypass_cache or resume):
+            try:
+                final_state = app.invoke(graph_input, config)
+            except (Exception, JobCancelled):
+                if get_checkpointer() is not None:
+                    tqdm.write(f"[!] Generation stopped; completed steps are checkpointed under job id {context.job_id}")
+                raise
+    finally:
+        # Released only here, by the worker: the token must outlive a cancel that lands before the run starts
+        release_cancel_token(job_id)
+    delete_checkpoint(context.job_id)
 
     # Return the final state as a dict for API usage
     result = {
@@ -586,6 +816,63 @@ def generate_song(
     return result
 
 
+# JSONL keys accepted by --batch-file (API field names, plus CLI-style aliases)
+BATCH_FIELD_ALIASES = {"prompt": "user_input", "name": "song_name", "mood": "mood_style", "explicit": "explicitness",
+                       "time_sig": "time_signature", "groove": "groove_texture", "choir": "choir_call_response"}
+BATCH_FIELDS = {"user_input", "song_name", "persona", "use_local", "use_hookhouse", "blend", "mood_style", "explicitness",
+                "pov", "setting", "themes_include", "themes_avoid", "bpm", "time_signature", "key", "groove_texture",
+                "choir_call_response"}
+
+
+def run_batch_file(path: str, use_local: bool = False, use_hookhouse: bool = True) -> List[Dict[str, Any]]:
+    """
+    Generate every song request in a JSONL file through the provider batch API.
+
+    Each line is a JSON object with generate_song() arguments (e.g. {"user_input": "...", "blend": ["Soul", "Funk"]}).
+    All songs advance stage by stage together: their LLM calls are collected and submitted as one batch per stage.
+    """
+    expanded = os.path.expanduser(path)
+    if not os.path.isfile(expanded):
+        raise FileNotFoundError(f"Batch file not found: {path}")
+
+    jobs = []
+    with open(expanded, "r", encoding="utf-8") as file:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            raw = json.loads(line)
+            job = {"use_local": use_local, "use_hookhouse": use_hookhouse, "job_id": uuid.uuid4().hex}
+            for field_name, value in raw.items():
+                field_name = BATCH_FIELD_ALIASES.get(field_name, field_name)
+                if field_name not in BATCH_FIELDS:
+                    raise ValueError(f"{path}:{line_number}: unknown field {field_name!r}")
+                job[field_name] = value
+            if not job.get("user_input"):
+                raise ValueError(f"{path}:{line_number}: user_input is required")
+            jobs.append(job)
+
+    coordinator = BatchCoordinator()
+    tqdm.write(f"Submitting {len(jobs)} songs in batch mode")
+
+    def _report(index: int, outcome):
+        if isinstance(outcome, Exception):
+            tqdm.write(f"[FAIL] Song {index + 1} (job id {jobs[index]['job_id']}): {outcome}")
+        else:
+            tqdm.write(f"[OK] Song {index + 1}: {outcome.get('filename')}")
+
+    try:
+        results = run_batch(jobs, generate_song, coordinator=coordinator, on_done=_report)
+    finally:
+        coordinator.close()
+    stats = coordinator.stats()
+    failed = sum(1 for outcome in results if isinstance(outcome, Exception))
+    tqdm.write(
+        f"Batch complete: {len(results) - failed}/{len(results)} songs, "
+        f"{stats['requests_submitted']} LLM calls in {stats['batches_submitted']} provider batches"
+    )
+    return results
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate a song using AI")
     parser.add_argument("prompt", nargs="?", help="The song description or request")
@@ -692,6 +979,19 @@ if __name__ == "__main__":
         action="store_true",
         help="Include choir/call-response elements",
     )
+    parser.add_argument(
+        "--resume",
+        type=str,
+        default=None,
+        metavar="JOB_ID",
+        help="Resume a failed run from its last completed step (pass the same prompt and options again)",
+    )
+    parser.add_argument(
+        "--batch-file",
+        type=str,
+        default=None,
+        help="JSONL file with one song request per line; generates them all through the provider batch API",
+    )
 
     args = parser.parse_args()
 
@@ -705,6 +1005,10 @@ if __name__ == "__main__":
         print(f"Album art regenerated: {artwork_path}")
         sys.exit(0)
 
+    if args.batch_file:
+        run_batch_file(args.batch_file, use_local=args.local, use_hookhouse=not args.no_hookhouse)
+        sys.exit(0)
+
     # Load prompt from file or argument
     try:
         prompt_text = load_prompt_from_file(args.prompt_file) if args.prompt_file else args.prompt
@@ -735,4 +1039,6 @@ if __name__ == "__main__":
         key=args.key,
         groove_texture=args.groove,
         choir_call_response=args.choir,
+        job_id=args.resume,
+        resume=bool(args.resume),
     )
@@ -0,0 +1,254 @@
+"""
+Lexical retrieval over the style and tag catalogs.
+
+The drafter and preflight prompts used to embed every entry from styles.json and
+tags/*.txt (~120 KB). A small BM25 index, built once per process, picks the
+entries most relevant to the request (user input, blend, persona styles and the
+default song params) so prompts shrink by an order of magnitude and fit the
+context window of small local models.
+
+select_resources() returns dicts shaped exactly like helpers.read_styles() and
+helpers.read_tags(), so prompt formatting is unchanged. Set STYLE_RETRIEVAL_TOP_K=0
+to send the full catalog; the full catalog is also used whenever the query has no
+lexical overlap with it.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in into is it its of on or so that the this to was "
+    "were will with about song songs music prompt suno example make write".split()
+)
+_BANNER_RE = re.compile(r"^#\s*=+\s*$")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords dropped and a light plural strip."""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        parts = [token] + (token.split("-") if "-" in token else [])
+        for part in parts:
+            if part in _STOPWORDS or (len(part) < 2 and not part.isdigit()):
+                continue
+            if len(part) > 4 and part.endswith("s") and not part.endswith("ss"):
+                part = part[:-1]
+            tokens.append(part)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of short documents."""
+
+    def __init__(self, documents: Sequence[str], k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_terms = [Counter(tokenize(doc)) for doc in documents]
+        self.doc_lengths = [sum(terms.values()) for terms in self.doc_terms]
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+        doc_freq: Counter = Counter()
+        for terms in self.doc_terms:
+            doc_freq.update(terms.keys())
+        total = len(self.doc_terms)
+        self.idf = {term: math.log(1 + (total - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+
+    def scores(self, query_terms: Sequence[str]) -> List[float]:
+        terms = [term for term in set(query_terms) if term in self.idf]
+        results = []
+        for terms_in_doc, length in zip(self.doc_terms, self.doc_lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_length) if self.avg_length else self.k1
+            for term in terms:
+                freq = terms_in_doc.get(term)
+                if freq:
+                    score += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            results.append(score)
+        return results
+
+    def top(self, query_terms: Sequence[str], k: int) -> Tuple[List[int], int]:
+        """
+        Return (indices, hits): the k best documents in catalog order, and how many scored above zero.
+
+        When fewer than k documents match, the remainder is filled from the head of the
+        catalog so every category still offers the drafter some vocabulary.
+        """
+        scores = self.scores(query_terms)
+        ranked = sorted((i for i, score in enumerate(scores) if score > 0), key=lambda i: -scores[i])
+        hits = len(ranked)
+        chosen = ranked[:k]
+        if len(chosen) < k:
+            taken = set(chosen)
+            chosen.extend(i for i in range(len(scores)) if i not in taken)
+            chosen = chosen[:k]
+        return sorted(chosen), hits
+
+
+class _TagSection:
+    def __init__(self, title: str, header: List[str]):
+        self.title = title
+        self.header = header
+        self.body: List[str] = []
+
+    @property
+    def tag_lines(self) -> List[str]:
+        return [line for line in self.body if line.strip() and not line.lstrip().startswith("#")]
+
+
+def _split_tag_file(text: str) -> Tuple[List[str], List[_TagSection]]:
+    """Split a tags file into its preamble and "# ===" banner-delimited sections."""
+    lines = text.splitlines()
+    preamble: List[str] = []
+    sections: List[_TagSection] = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if _BANNER_RE.match(line) and i + 2 < len(lines) and _BANNER_RE.match(lines[i + 2]):
+            title = lines[i + 1].lstrip("#").strip()
+            sections.append(_TagSection(title, lines[i:i + 3]))
+            i += 3
+            continue
+        if sections:
+            sections[-1].body.append(line)
+        else:
+            preamble.append(line)
+        i += 1
+    while preamble and not preamble[-1].strip():
+        preamble.pop()
+    return preamble, sections
+
+
+def _pinned_sections() -> List[str]:
+    raw = os.getenv("STYLE_RETRIEVAL_PINNED_TAG_SECTIONS", "SONG STRUCTURE,EXAMPLE COMBINATIONS")
+    return [part.strip().upper() for part in raw.split(",") if part.strip()]
+
+
+class StyleIndex:
+    """BM25 indexes for each style category and each tag file section."""
+
+    STYLE_LISTS = ("artist_styles", "core_styles", "example_styles")
+
+    def __init__(self, styles: Mapping[str, str], tags: Mapping[str, str]):
+        self.full_styles = styles
+        self.full_tags = tags
+
+        self.style_entries: Dict[str, List[str]] = {}
+        self.style_indexes: Dict[str, BM25Index] = {}
+        for key in self.STYLE_LISTS:
+            entries = [entry for entry in styles.get(key, "").split("\n") if entry.strip()]
+            self.style_entries[key] = entries
+            self.style_indexes[key] = BM25Index(entries)
+
+        genres = json.loads(styles.get("suno_genres", "{}") or "{}")
+        self.genre_names: List[str] = list(genres.get("default_styles", []))
+        self.co_existing: Dict[str, Dict[str, int]] = genres.get("co_existing_styles_dict", {})
+        # Weight the genre name over its neighbours so "rock" favours rock genres over everything rock co-occurs with
+        self.genre_index = BM25Index(
+            [f"{name} {name} {' '.join(self.co_existing.get(name, {}))}" for name in self.genre_names]
+        )
+
+        self.tag_files: Dict[str, Tuple[List[str], List[_TagSection]]] = {}
+        self.tag_indexes: Dict[Tuple[str, int], BM25Index] = {}
+        for filename, text in tags.items():
+            preamble, sections = _split_tag_file(text)
+            self.tag_files[filename] = (preamble, sections)
+            for position, section in enumerate(sections):
+                self.tag_indexes[(filename, position)] = BM25Index(section.tag_lines)
+
+    def select_styles(self, query_terms: Sequence[str], k: int) -> Tuple[Dict[str, str], int]:
+        selected: Dict[str, str] = {}
+        hits = 0
+        for key in self.STYLE_LISTS:
+            entries = self.style_entries[key]
+            indices, matched = self.style_indexes[key].top(query_terms, k)
+            hits += matched
+            selected[key] = "\n".join(entries[i] for i in indices)
+
+        indices, matched = self.genre_index.top(query_terms, k)
+        hits += matched
+        names = [self.genre_names[i] for i in indices]
+        selected["suno_genres"] = json.dumps(
+            {
+                "default_styles": names,
+                "co_existing_styles_dict": {name: self.co_existing[name] for name in names if name in self.co_existing},
+            },
+            separators=(",", ":"),
+        )
+        return selected, hits
+
+    def select_tags(self, query_terms: Sequence[str], per_section: int) -> Tuple[Dict[str, str], int]:
+        pinned = _pinned_sections()
+        selected: Dict[str, str] = {}
+        hits = 0
+        for filename, (preamble, sections) in self.tag_files.items():
+            out = list(preamble)
+            for position, section in enumerate(sections):
+                out.append("")
+                out.extend(section.header)
+                if any(title in section.title.upper() for title in pinned):
+                    out.extend(line for line in section.body if line.strip())
+                    continue
+                lines = section.tag_lines
+                indices, matched = self.tag_indexes[(filename, position)].top(query_terms, per_section)
+                hits += matched
+                out.extend(lines[i] for i in indices)
+            selected[filename] = "\n".join(out) + "\n"
+        return selected, hits
+
+
+_index: Optional[StyleIndex] = None
+_index_version: Optional[int] = None
+_index_lock = threading.Lock()
+
+
+def get_style_index() -> StyleIndex:
+    """Return the process-wide style/tag index, rebuilt whenever the resource snapshot changes."""
+    global _index, _index_version
+    from resource_store import get_resource_snapshot
+
+    snapshot = get_resource_snapshot()
+    with _index_lock:
+        if _index is None or _index_version != snapshot.version:
+            _index = StyleIndex(snapshot.styles, snapshot.tags)
+            _index_version = snapshot.version
+        return _index
+
+
+def retrieval_top_k() -> int:
+    return int(os.getenv("STYLE_RETRIEVAL_TOP_K", "20"))
+
+
+def select_resources(query: str, k: Optional[int] = None) -> Tuple[Mapping[str, str], Mapping[str, str]]:
+    """
+    Return (styles, tags) narrowed to the entries relevant to query.
+
+    Args:
+        query: Free text describing the song (user input, blend, persona styles, defaults)
+        k: Entries kept per style category; defaults to STYLE_RETRIEVAL_TOP_K. 0 returns the full catalog.
+    """
+    index = get_style_index()
+    k = retrieval_top_k() if k is None else k
+    terms = tokenize(query or "")
+    if k <= 0 or not terms:
+        return index.full_styles, index.full_tags
+
+    styles, style_hits = index.select_styles(terms, k)
+    per_section = int(os.getenv("STYLE_RETRIEVAL_TAGS_PER_SECTION", "8"))
+    if per_section > 0:
+        tags, _ = index.select_tags(terms, per_section)
+    else:
+        tags = index.full_tags
+
+    if style_hits < int(os.getenv("STYLE_RETRIEVAL_MIN_HITS", "1")):
+        # Nothing in the catalog resembles the request; let the model see everything
+        return index.full_styles, index.full_tags
+    return styles, tags
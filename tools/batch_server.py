@@ -0,0 +1,230 @@
+"""
+Local stand-in for the OpenAI Batch API, for testing batch mode offline.
+
+Implements the subset of endpoints OpenAIBatchBackend uses:
+
+    POST /v1/files                 (multipart upload, purpose=batch)
+    GET  /v1/files/{id}/content
+    POST /v1/batches
+    GET  /v1/batches/{id}
+
+Each batch is processed in a background thread by forwarding every line to an
+OpenAI-compatible chat completions endpoint (--upstream, e.g. LM Studio), or with
+--echo by returning a short placeholder so the plumbing can be exercised without
+any model at all.
+
+Usage:
+    python tools/batch_server.py --port 8765 --upstream http://localhost:1234/v1
+    LLM_BATCH_BACKEND=openai LLM_BATCH_BASE_URL=http://127.0.0.1:8765/v1 python song_master.py --batch-file songs.jsonl
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+import httpx
+
+_files: Dict[str, Dict[str, Any]] = {}
+_batches: Dict[str, Dict[str, Any]] = {}
+_lock = threading.Lock()
+
+
+def _store_file(content: bytes, filename: str, purpose: str) -> Dict[str, Any]:
+    file_id = f"file-{uuid.uuid4().hex[:24]}"
+    record = {
+        "id": file_id,
+        "object": "file",
+        "bytes": len(content),
+        "created_at": int(time.time()),
+        "filename": filename,
+        "purpose": purpose,
+        "status": "processed",
+    }
+    with _lock:
+        _files[file_id] = {"meta": record, "content": content}
+    return record
+
+
+def _complete(body: Dict[str, Any], upstream: Optional[str], api_key: str, delay: float) -> Dict[str, Any]:
+    if upstream is None:
+        time.sleep(delay)
+        prompt = body["messages"][-1]["content"] if body.get("messages") else ""
+        text = f"[batch stand-in] {len(prompt)} character prompt received"
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stand-in"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        }
+    response = httpx.post(
+        f"{upstream.rstrip('/')}/chat/completions",
+        json=body,
+        headers={"Authorization": f"Bearer {api_key}"},
+        timeout=600,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def _process_batch(batch_id: str, upstream: Optional[str], api_key: str, workers: int, delay: float) -> None:
+    with _lock:
+        batch = _batches[batch_id]
+        batch["status"] = "in_progress"
+        batch["in_progress_at"] = int(time.time())
+        lines = [line for line in _files[batch["input_file_id"]]["content"].decode("utf-8").splitlines() if line.strip()]
+    batch["request_counts"]["total"] = len(lines)
+
+    def _run(line: str) -> Dict[str, Any]:
+        request = json.loads(line)
+        try:
+            body = _complete(request["body"], upstream, api_key, delay)
+            with _lock:
+                batch["request_counts"]["completed"] += 1
+            return {"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": request["custom_id"],
+                    "response": {"status_code": 200, "body": body}, "error": None}
+        except Exception as exc:
+            with _lock:
+                batch["request_counts"]["failed"] += 1
+            return {"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": request["custom_id"],
+                    "response": None, "error": {"code": "upstream_error", "message": str(exc)}}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outputs = list(pool.map(_run, lines))
+
+    succeeded = [json.dumps(record) for record in outputs if record["error"] is None]
+    failed = [json.dumps(record) for record in outputs if record["error"] is not None]
+    output_file = _store_file("\n".join(succeeded).encode("utf-8"), f"{batch_id}_output.jsonl", "batch_output")
+    error_file = _store_file("\n".join(failed).encode("utf-8"), f"{batch_id}_errors.jsonl", "batch_output") if failed else None
+    with _lock:
+        batch["output_file_id"] = output_file["id"]
+        batch["error_file_id"] = error_file["id"] if error_file else None
+        batch["status"] = "completed"
+        batch["completed_at"] = int(time.time())
+
+
+class BatchHandler(BaseHTTPRequestHandler):
+    upstream: Optional[str] = None
+    api_key: str = "batch-stand-in"
+    workers: int = 4
+    delay: float = 0.0
+
+    def _send_json(self, payload: Dict[str, Any], status: int = 200) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", "0") or 0))
+
+    def do_POST(self):
+        if self.path.rstrip("/") == "/v1/files":
+            body = self._read_body()
+            message = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("utf-8") + body
+            )
+            content, filename, purpose = b"", "upload.jsonl", "batch"
+            for part in message.iter_parts():
+                name = part.get_param("name", header="content-disposition")
+                if name == "file":
+                    content = part.get_payload(decode=True) or b""
+                    filename = part.get_filename() or filename
+                elif name == "purpose":
+                    purpose = (part.get_payload(decode=True) or b"batch").decode("utf-8")
+            return self._send_json(_store_file(content, filename, purpose))
+
+        if self.path.rstrip("/") == "/v1/batches":
+            request = json.loads(self._read_body() or b"{}")
+            if request.get("input_file_id") not in _files:
+                return self._send_json({"error": {"message": "input_file_id not found"}}, 404)
+            batch_id = f"batch_{uuid.uuid4().hex[:24]}"
+            batch = {
+                "id": batch_id,
+                "object": "batch",
+                "endpoint": request.get("endpoint", "/v1/chat/completions"),
+                "input_file_id": request["input_file_id"],
+                "completion_window": request.get("completion_window", "24h"),
+                "status": "validating",
+                "created_at": int(time.time()),
+                "output_file_id": None,
+                "error_file_id": None,
+                "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            }
+            with _lock:
+                _batches[batch_id] = batch
+            threading.Thread(
+                target=_process_batch, args=(batch_id, self.upstream, self.api_key, self.workers, self.delay), daemon=True
+            ).start()
+            return self._send_json(batch)
+
+        self._send_json({"error": {"message": f"Unknown endpoint {self.path}"}}, 404)
+
+    def do_GET(self):
+        match = re.fullmatch(r"/v1/batches/([\w-]+)", self.path)
+        if match:
+            with _lock:
+                batch = _batches.get(match.group(1))
+                payload = json.loads(json.dumps(batch)) if batch else None
+            if payload is None:
+                return self._send_json({"error": {"message": "batch not found"}}, 404)
+            return self._send_json(payload)
+
+        match = re.fullmatch(r"/v1/files/([\w-]+)/content", self.path)
+        if match and match.group(1) in _files:
+            data = _files[match.group(1)]["content"]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        self._send_json({"error": {"message": f"Unknown endpoint {self.path}"}}, 404)
+
+    def log_message(self, format, *args):
+        if os.getenv("BATCH_SERVER_VERBOSE"):
+            super().log_message(format, *args)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI Batch API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--upstream",
+        default=os.getenv("LMSTUDIO_BASE_URL", "http://localhost:1234/v1"),
+        help="OpenAI-compatible base URL that actually answers the requests (default: LM Studio)",
+    )
+    parser.add_argument("--echo", action="store_true", help="Answer with placeholders instead of calling an upstream model")
+    parser.add_argument("--workers", type=int, default=4, help="Requests processed concurrently per batch")
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds per request in --echo mode")
+    args = parser.parse_args()
+
+    BatchHandler.upstream = None if args.echo else args.upstream
+    BatchHandler.api_key = os.getenv("LMSTUDIO_API_KEY") or "lm-studio"
+    BatchHandler.workers = args.workers
+    BatchHandler.delay = args.delay
+    server = ThreadingHTTPServer((args.host, args.port), BatchHandler)
+    print(f"Batch stand-in listening on http://{args.host}:{args.port}/v1 (upstream: {BatchHandler.upstream or 'echo'})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -96,6 +96,17 @@ def generate_with_openrouter(prompt: str, output_file: str, model: str = "google
         f.write(base64.b64decode(base64_data))
 
 
+def generate_with_fake(prompt: str, output_file: str) -> None:
+    """Write a placeholder cover (no API call) for offline runs and load tests with LLM_PROVIDER=fake."""
+    import hashlib
+    import time
+    from PIL import Image
+
+    time.sleep(float(os.environ.get("FAKE_IMAGE_LATENCY_MS", "0")) / 1000.0)
+    digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+    Image.new("RGB", (576, 1024), tuple(digest[:3])).save(output_file, "JPEG")
+
+
 def generate_album_art_image(prompt: str, output_file: str) -> None:
     """
     Generate album cover art based on a textual prompt and save to a file.
@@ -118,6 +129,8 @@ def generate_album_art_image(prompt: str, output_file: str) -> None:
         generate_with_google(prompt, output_file)
     elif provider == "openrouter":
         generate_with_openrouter(prompt, output_file, model)
+    elif provider == "fake":
+        generate_with_fake(prompt, output_file)
     else:
         # Default fallback to OpenAI
         try:
@@ -0,0 +1,155 @@
+"""
+OpenAI-compatible HTTP stand-in backed by the fake LLM provider.
+
+Serves /v1/chat/completions (with SSE streaming), /v1/completions and /v1/models,
+answering every prompt with fake_llm.fake_response() and the same latency/error
+injection knobs (FAKE_LLM_* env vars). Use it to load-test the real HTTP path:
+
+    python tools/fake_llm_server.py --port 1234
+    LMSTUDIO_BASE_URL=http://127.0.0.1:1234/v1 python song_master.py "..." --local
+    # or for the remote path: LLM_PROVIDER=openai OPENAI_API_KEY=x LITELLM_API_BASE / OPENROUTER_BASE_URL=...
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_llm import FakeLLMError, fake_response, injector, split_tokens  # noqa: E402
+
+
+def _prompt_from_messages(messages) -> str:
+    parts = []
+    for message in messages or []:
+        content = message.get("content")
+        if isinstance(content, list):
+            parts.extend(block.get("text", "") for block in content if isinstance(block, dict))
+        elif content:
+            parts.append(str(content))
+    return "\n".join(parts)
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    endpoints = ("chat", "completions")
+    context_length = 32768
+
+    def _send_json(self, payload: Dict[str, Any], status: int = 200) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_event(self, payload: Any) -> None:
+        data = payload if isinstance(payload, str) else json.dumps(payload)
+        chunk = f"data: {data}\n\n".encode("utf-8")
+        self.wfile.write(f"{len(chunk):x}\r\n".encode("ascii") + chunk + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/v1/models":
+            return self._send_json({"object": "list", "data": [
+                {"id": "fake-songwriter", "object": "model", "owned_by": "fake", "context_length": self.context_length}
+            ]})
+        self._send_json({"error": {"message": f"Unknown endpoint {self.path}"}}, 404)
+
+    def do_POST(self):
+        # Always drain the body so a rejected request does not corrupt the keep-alive connection
+        body = self.rfile.read(int(self.headers.get("Content-Length", "0") or 0))
+        path = self.path.rstrip("/")
+        served = {"chat": "/v1/chat/completions", "completions": "/v1/completions"}
+        if path not in (served[endpoint] for endpoint in self.endpoints):
+            return self._send_json({"error": {"message": f"Unknown endpoint {self.path}"}}, 404)
+
+        request = json.loads(body or b"{}")
+        chat = path == "/v1/chat/completions"
+        prompt = _prompt_from_messages(request.get("messages")) if chat else str(request.get("prompt", ""))
+        model = request.get("model", "fake-songwriter")
+        text = fake_response(prompt)
+
+        time.sleep(injector.first_token_delay())
+        try:
+            injector.maybe_fail()
+        except FakeLLMError as exc:
+            return self._send_json({"error": {"message": str(exc), "type": "server_error"}}, exc.status_code)
+
+        completion_id = f"{'chatcmpl' if chat else 'cmpl'}-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        if not request.get("stream"):
+            time.sleep(injector.token_delay() * len(split_tokens(text)))
+            choices = []
+            for index in range(max(1, int(request.get("n") or 1))):
+                choice = {"index": index, "finish_reason": "stop"}
+                choice.update({"message": {"role": "assistant", "content": text}} if chat else {"text": text})
+                choices.append(choice)
+            return self._send_json({
+                "id": completion_id,
+                "object": "chat.completion" if chat else "text_completion",
+                "created": created,
+                "model": model,
+                "choices": choices,
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4,
+                          "total_tokens": (len(prompt) + len(text)) // 4},
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        delay = injector.token_delay()
+        for token in split_tokens(text):
+            if delay:
+                time.sleep(delay)
+            choice = {"index": 0, "finish_reason": None}
+            choice.update({"delta": {"content": token}} if chat else {"text": token})
+            self._send_event({"id": completion_id, "object": "chat.completion.chunk" if chat else "text_completion",
+                              "created": created, "model": model, "choices": [choice]})
+        final = {"index": 0, "finish_reason": "stop"}
+        final.update({"delta": {}} if chat else {"text": ""})
+        self._send_event({"id": completion_id, "object": "chat.completion.chunk" if chat else "text_completion",
+                          "created": created, "model": model, "choices": [final]})
+        self._send_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args):
+        if os.getenv("FAKE_LLM_SERVER_VERBOSE"):
+            super().log_message(format, *args)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="OpenAI-compatible fake LLM server for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--latency-ms", type=float, default=None, help="Overrides FAKE_LLM_LATENCY_MS")
+    parser.add_argument("--tokens-per-second", type=float, default=None, help="Overrides FAKE_LLM_TOKENS_PER_SECOND")
+    parser.add_argument("--error-rate", type=float, default=None, help="Overrides FAKE_LLM_ERROR_RATE")
+    parser.add_argument("--endpoints", default="chat,completions",
+                        help="Comma-separated endpoints to serve (chat, completions); others return 404")
+    parser.add_argument("--context-length", type=int, default=32768, help="Context window reported by /v1/models")
+    args = parser.parse_args()
+
+    for name, value in (("FAKE_LLM_LATENCY_MS", args.latency_ms), ("FAKE_LLM_TOKENS_PER_SECOND", args.tokens_per_second),
+                        ("FAKE_LLM_ERROR_RATE", args.error_rate)):
+        if value is not None:
+            os.environ[name] = str(value)
+
+    FakeLLMHandler.endpoints = tuple(endpoint.strip() for endpoint in args.endpoints.split(",") if endpoint.strip())
+    FakeLLMHandler.context_length = args.context_length
+    server = ThreadingHTTPServer((args.host, args.port), FakeLLMHandler)
+    print(f"Fake LLM server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()